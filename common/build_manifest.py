@@ -0,0 +1,120 @@
+"""Skips the build step of native modules at import time when nothing changed.
+
+Modules with a native part used to run make on every import, so every daemon start paid
+for a few make invocations that stat hundreds of files. ensure_built only runs the build
+when the sources of a directory differ from the ones recorded in the manifest after its
+last successful build, or when one of its artifacts is missing.
+
+Every source is recorded with its size, mtime and sha1. A file whose size and mtime match
+the manifest isn't read again, a touched file is only rebuilt for if its content changed.
+"""
+import os
+import glob
+import json
+import fcntl
+import hashlib
+import tempfile
+import subprocess
+
+from common.basedir import BASEDIR
+
+MANIFEST_PATH = os.getenv("BUILD_MANIFEST", os.path.join(BASEDIR, ".build_manifest.json"))
+DEFAULT_SOURCES = ["Makefile", "*.c", "*.cc", "*.h", "*.pyx", "*.pxd"]
+
+# directory:target keys already checked by this process
+_checked = set()
+
+
+def _load_manifest():
+  try:
+    with open(MANIFEST_PATH) as f:
+      return json.load(f)
+  except (IOError, OSError, ValueError):
+    return {}
+
+
+def _sha1(path):
+  with open(path, "rb") as f:
+    return hashlib.sha1(f.read()).hexdigest()
+
+
+def _source_files(directory, sources):
+  files = set()
+  for pattern in sources:
+    files.update(glob.glob(os.path.join(directory, pattern)))
+  return sorted(files)
+
+
+def _fingerprint(files, old=None):
+  """Returns {path: [size, mtime, sha1]}, reusing the hashes of unchanged files in old."""
+  old = old or {}
+  ret = {}
+  for fn in files:
+    st = os.stat(fn)
+    prev = old.get(fn)
+    if prev is not None and prev[0] == st.st_size and prev[1] == st.st_mtime:
+      ret[fn] = prev
+    else:
+      ret[fn] = [st.st_size, st.st_mtime, _sha1(fn)]
+  return ret
+
+
+def _same_sources(recorded, current):
+  return sorted(recorded) == sorted(current) and all(recorded[fn][2] == current[fn][2] for fn in current)
+
+
+def _artifacts_exist(directory, artifacts):
+  return all(glob.glob(os.path.join(directory, a)) for a in artifacts)
+
+
+def _key(directory, target):
+  return "%s:%s" % (os.path.abspath(directory), target)
+
+
+def is_built(directory, artifacts, sources=DEFAULT_SOURCES, target="all"):
+  directory = os.path.abspath(directory)
+  entry = _load_manifest().get(_key(directory, target))
+  if entry is None or entry.get("artifacts") != sorted(artifacts) or not _artifacts_exist(directory, artifacts):
+    return False
+  files = _source_files(directory, sources)
+  return _same_sources(entry["sources"], _fingerprint(files, entry["sources"]))
+
+
+def record_built(directory, artifacts, sources=DEFAULT_SOURCES, target="all"):
+  directory = os.path.abspath(directory)
+  key = _key(directory, target)
+  files = _source_files(directory, sources)
+
+  # several daemons can finish a build at the same time
+  with open(MANIFEST_PATH + ".lock", "w") as lock:
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    manifest = _load_manifest()
+    old = manifest.get(key, {}).get("sources")
+    manifest[key] = {
+      "artifacts": sorted(artifacts),
+      "sources": _fingerprint(files, old),
+    }
+
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(MANIFEST_PATH) + ".", dir=os.path.dirname(MANIFEST_PATH))
+    with os.fdopen(fd, "w") as f:
+      json.dump(manifest, f, indent=1, sort_keys=True)
+    os.rename(tmp_path, MANIFEST_PATH)
+
+
+def ensure_built(directory, artifacts, sources=DEFAULT_SOURCES, target="all", build=None):
+  """Builds target in directory unless the manifest says its artifacts are up to date.
+
+  artifacts and sources are glob patterns relative to directory, a source may also point
+  outside of it (e.g. the dbc files). build defaults to running make target in directory,
+  it can also be a function.
+  """
+  key = _key(directory, target)
+  if key in _checked:
+    return
+  if not is_built(directory, artifacts, sources, target):
+    if build is None:
+      subprocess.check_call(["make", target], cwd=directory)
+    else:
+      build()
+    record_built(directory, artifacts, sources, target)
+  _checked.add(key)
@@ -2,9 +2,17 @@ import re
 import os
 import struct
 import sys
+import pickle
+import hashlib
 import numbers
+import tempfile
 from collections import namedtuple, defaultdict
 
+import numpy as np
+
+# parsed dbcs are cached here, keyed by a hash of the .dbc and of this file
+DBC_CACHE_DIR = os.getenv("DBC_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "dbc"))
+
 def int_or_float(s):
   # return number, trying to maintain int format
   if s.isdigit():
@@ -16,14 +24,74 @@ DBCSignal = namedtuple(
   "DBCSignal", ["name", "start_bit", "size", "is_little_endian", "is_signed",
                 "factor", "offset", "tmin", "tmax", "units"])
 
+_parser_hash = None
+
+def parser_hash():
+  """Hash of this file, any change to the parser invalidates the cache."""
+  global _parser_hash
+  if _parser_hash is None:
+    with open(os.path.splitext(__file__)[0] + ".py", "rb") as f:
+      _parser_hash = hashlib.sha1(f.read()).hexdigest()
+  return _parser_hash
+
+def dbc_hash(contents):
+  return hashlib.sha1(contents + parser_hash().encode()).hexdigest()
+
+def cache_path(name, h):
+  return os.path.join(DBC_CACHE_DIR, "%s_%s.pkl" % (name, h))
+
 
 class dbc(object):
-  def __init__(self, fn):
+  def __init__(self, fn, use_cache=True):
     self.name, _ = os.path.splitext(os.path.basename(fn))
-    with open(fn) as f:
-      self.txt = f.readlines()
+    with open(fn, "rb") as f:
+      contents = f.read()
+    self.hash = dbc_hash(contents)
+    if not isinstance(contents, str):
+      contents = contents.decode("latin-1")
+    self.txt = contents.splitlines(True)
     self._warned_addresses = set()
 
+    # lookup to bit reverse each byte
+    self.bits_index = [(i & ~0b111) + ((-i-1) & 0b111) for i in range(64)]
+
+    if not (use_cache and self._load_cache()):
+      self._parse()
+      if use_cache:
+        self._save_cache()
+
+    self.msg_name_to_address = {}
+    for address, m in self.msgs.items():
+      name = m[0][0]
+      self.msg_name_to_address[name] = address
+
+  def _load_cache(self):
+    try:
+      with open(cache_path(self.name, self.hash), "rb") as f:
+        self.msgs, self.def_vals = pickle.load(f)
+      return True
+    except Exception:
+      return False
+
+  def _save_cache(self):
+    try:
+      if not os.path.isdir(DBC_CACHE_DIR):
+        os.makedirs(DBC_CACHE_DIR)
+      # remove the entries of older versions of this dbc
+      for fn in os.listdir(DBC_CACHE_DIR):
+        h = fn[len(self.name) + 1:-len(".pkl")]
+        if fn.startswith(self.name + "_") and fn.endswith(".pkl") and len(h) == 40:
+          os.remove(os.path.join(DBC_CACHE_DIR, fn))
+
+      fd, tmp_path = tempfile.mkstemp(dir=DBC_CACHE_DIR)
+      with os.fdopen(fd, "wb") as f:
+        pickle.dump((self.msgs, self.def_vals), f, protocol=2)
+      os.rename(tmp_path, cache_path(self.name, self.hash))
+    except (IOError, OSError):
+      # a read only home only costs the parse on the next start
+      pass
+
+  def _parse(self):
     # regexps from https://github.com/ebroecker/canmatrix/blob/master/canmatrix/importdbc.py
     bo_regexp = re.compile(r"^BO\_ (\w+) (\w+) *: (\w+) (\w+)")
     sg_regexp = re.compile(r"^SG\_ (\w+) : (\d+)\|(\d+)@(\d+)([\+|\-]) \(([0-9.+\-eE]+),([0-9.+\-eE]+)\) \[([0-9.+\-eE]+)\|([0-9.+\-eE]+)\] \"(.*)\" (.*)")
@@ -40,9 +108,6 @@ class dbc(object):
     # A dictionary which maps message ids to a list of tuples (signal name, definition value pairs)
     self.def_vals = defaultdict(list)
 
-    # lookup to bit reverse each byte
-    self.bits_index = [(i & ~0b111) + ((-i-1) & 0b111) for i in xrange(64)]
-
     for l in self.txt:
       l = l.strip()
 
@@ -115,11 +180,6 @@ class dbc(object):
     for msg in self.msgs.values():
       msg[1].sort(key=lambda x: x.start_bit)
 
-    self.msg_name_to_address = {}
-    for address, m in self.msgs.items():
-      name = m[0][0]
-      self.msg_name_to_address[name] = address
-
   def lookup_msg_id(self, msg_id):
     if not isinstance(msg_id, numbers.Number):
       msg_id = self.msg_name_to_address[msg_id]
@@ -213,7 +273,7 @@ class dbc(object):
     if debug:
       print(name)
 
-    st = x[2].ljust(8, '\x00')
+    st = x[2].ljust(8, b'\x00')
     le, be = None, None
 
     for s in msg[1]:
@@ -263,6 +323,106 @@ class dbc(object):
         out[arr.index(s[0])] = tmp
     return name, out
 
+  def _signal_shift(self, s):
+    if s.is_little_endian:
+      return s.start_bit
+    b1 = (s.start_bit // 8) * 8 + (-s.start_bit - 1) % 8
+    return 64 - (b1 + s.size)
+
+  def decode_batch(self, addresses, dat, arr=None):
+    """Decode many CAN messages at once using the dbc, the batch version of decode.
+
+       Inputs:
+        addresses: An array of CAN addresses.
+        dat: The CAN data of every message, either an (n, 8) uint8 array zero
+             padded to 8 bytes or an array of uint64 read big endian.
+        arr: Optional list of signals which should be decoded and returned.
+
+       Returns:
+        A dict mapping the address of every known message found to a tuple
+        (idx, data), where idx are the indices of its frames in addresses and
+        data is a dict mapping signal name to an array of decoded values. Use
+        msg_name_to_address to look messages up by name. Values are float64, so
+        signals wider than 53 bits lose their lowest bits.
+    """
+    addresses = np.asarray(addresses)
+    dat = np.asarray(dat)
+    if dat.dtype == np.uint8:
+      be = np.ascontiguousarray(dat).reshape(-1, 8).view('>u8').ravel().astype(np.uint64)
+    else:
+      be = dat.astype(np.uint64)
+    le = be.byteswap()
+
+    out = {}
+    for address in np.unique(addresses):
+      address = int(address)
+      msg = self.msgs.get(address)
+      if msg is None:
+        continue
+      idx = np.nonzero(addresses == address)[0]
+      be_msg, le_msg = be[idx], le[idx]
+
+      data = {}
+      for s in msg[1]:
+        if arr is not None and s.name not in arr:
+          continue
+        shift = self._signal_shift(s)
+        if shift < 0:
+          continue
+
+        tmp = ((le_msg if s.is_little_endian else be_msg) >> np.uint64(shift)) & np.uint64((1 << s.size) - 1)
+        if s.is_signed:
+          tmp = tmp.view(np.int64) - ((tmp >> np.uint64(s.size - 1)) << np.uint64(s.size)).view(np.int64)
+        data[s.name] = tmp * s.factor + s.offset
+      out[address] = (idx, data)
+    return out
+
+  def encode_batch(self, msg_id, dd):
+    """Encode many CAN messages of one type at once, the batch version of encode.
+
+       Inputs:
+        msg_id: The message ID.
+        dd: A dictionary mapping signal name to an array of signal data, one
+            entry per message.
+
+       Returns:
+        An (n, size) uint8 array with the data of every message.
+    """
+    msg_id = self.lookup_msg_id(msg_id)
+
+    msg_def = self.msgs[msg_id]
+    size = msg_def[0][1]
+    n = len(next(iter(dd.values()))) if dd else 0
+
+    result = np.zeros(n, dtype=np.uint64)
+    for s in msg_def[1]:
+      ival = dd.get(s.name)
+      if ival is None:
+        continue
+
+      ival = (np.asarray(ival, dtype=np.float64) / s.factor) - s.offset
+      # round half away from zero like python 2's round
+      trunc = np.trunc(ival)
+      ival = np.where(np.abs(ival - trunc) == 0.5, trunc + np.sign(ival), np.round(ival))
+      neg = ival < 0
+      ival_u = np.zeros(n, dtype=np.uint64)
+      ival_u[~neg] = ival[~neg].astype(np.uint64)
+      ival_u[neg] = ival[neg].astype(np.int64).view(np.uint64)
+      ival = ival_u
+
+      shift = np.uint64(self._signal_shift(s))
+      mask = np.uint64((1 << s.size) - 1) << shift
+      dat = (ival << shift) & mask
+
+      if s.is_little_endian:
+        mask = mask.byteswap()
+        dat = dat.byteswap()
+
+      result &= ~mask
+      result |= dat
+
+    return result.astype('>u8').view(np.uint8).reshape(n, 8)[:, :size]
+
   def get_signals(self, msg):
     msg = self.lookup_msg_id(msg)
     return [sgs.name for sgs in self.msgs[msg][1]]
@@ -270,7 +430,6 @@ class dbc(object):
 
 if __name__ == "__main__":
    from opendbc import DBC_PATH
-   import numpy as np
 
    dbc_test = dbc(os.path.join(DBC_PATH, 'toyota_prius_2017_pt_generated.dbc'))
    msg = ('STEER_ANGLE_SENSOR', {'STEER_ANGLE': -6.0, 'STEER_RATE': 4, 'STEER_FRACTION': -0.2})
@@ -0,0 +1,88 @@
+"""Minimal inotify bindings, enough to watch a few directories from a thread.
+
+available is False where the kernel or libc don't have inotify (e.g. macOS), callers are
+expected to fall back to polling then.
+"""
+import os
+import errno
+import select
+import struct
+from cffi import FFI
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("iIII")
+
+ffi = FFI()
+ffi.cdef("""
+int inotify_init1(int flags);
+int inotify_add_watch(int fd, const char *pathname, uint32_t mask);
+int inotify_rm_watch(int fd, int wd);
+""")
+try:
+  libc = ffi.dlopen(None)
+  available = hasattr(libc, "inotify_init1")
+except (OSError, AttributeError):
+  libc = None
+  available = False
+
+
+def _check(ret):
+  if ret < 0:
+    err = ffi.errno
+    raise OSError(err, os.strerror(err))
+  return ret
+
+
+class Inotify(object):
+  def __init__(self):
+    if not available:
+      raise OSError(errno.ENOSYS, "inotify is not available")
+    self.fd = _check(libc.inotify_init1(IN_CLOEXEC))
+
+  def add_watch(self, path, mask):
+    """Returns the watch descriptor, watching the same inode twice returns the same one."""
+    if not isinstance(path, bytes):
+      path = path.encode()
+    return _check(libc.inotify_add_watch(self.fd, path, mask))
+
+  def rm_watch(self, wd):
+    libc.inotify_rm_watch(self.fd, wd)
+
+  def read(self, timeout=None):
+    """Blocks until there are events, returns them as a list of (wd, mask, cookie, name). With a
+    timeout in seconds it returns an empty list if there were none by then."""
+    while 1:
+      try:
+        if timeout is not None and not select.select([self.fd], [], [], timeout)[0]:
+          return []
+        buf = os.read(self.fd, 64 * 1024)
+        break
+      except (OSError, select.error) as e:
+        if e.args[0] != errno.EINTR:
+          raise
+
+    events = []
+    i = 0
+    while i < len(buf):
+      wd, mask, cookie, name_len = _EVENT.unpack_from(buf, i)
+      i += _EVENT.size
+      name = buf[i:i + name_len].rstrip(b"\0").decode()
+      i += name_len
+      events.append((wd, mask, cookie, name))
+    return events
+
+  def close(self):
+    if self.fd is not None:
+      os.close(self.fd)
+      self.fd = None
@@ -1,7 +1,15 @@
 # pylint: skip-file
 from __future__ import print_function
+import os
 import abc
 import numpy as np
+
+from common.build_manifest import ensure_built
+
+kalman_dir = os.path.dirname(os.path.abspath(__file__))
+ensure_built(kalman_dir, ["ekf_impl*.so"], ["Makefile", "ekf_impl.pyx", "ekf_setup.py"], "ekf_impl.so")
+
+from common.kalman import ekf_impl
 # The EKF class contains the framework for an Extended Kalman Filter, but must be subclassed to use.
 # A subclass must implement:
 #   1) calc_transfer_fun(); see bottom of file for more info.
@@ -42,6 +50,7 @@ class SimpleSensor:
   #   a full covariance matrix
   #   a float or tuple of individual covars for each component of the sensor reading
   # dims is the number of states in the EKF
+  # obs_model and covar are kept as float64 arrays, read() only writes into them
   def __init__(self, obs_model, covar, dims):
     # Allow for integer covar/obs_model
     if not hasattr(obs_model, "__len__"):
@@ -51,22 +60,24 @@ class SimpleSensor:
 
     # Full observation model passed
     if dims in np.array(obs_model).shape:
-      self.obs_model = np.asmatrix(obs_model)
-      self.covar = np.asmatrix(covar)
+      self.obs_model = np.array(obs_model, dtype=np.float64, ndmin=2)
+      self.covar = np.array(covar, dtype=np.float64, ndmin=2)
     # Indices of unit observations passed
     else:
-      self.obs_model = np.matlib.zeros((len(obs_model), dims))
+      self.obs_model = np.zeros((len(obs_model), dims))
       self.obs_model[:, list(obs_model)] = np.identity(len(obs_model))
       if np.asarray(covar).ndim == 2:
-        self.covar = np.asmatrix(covar)
+        self.covar = np.array(covar, dtype=np.float64)
       elif len(covar) == len(obs_model):
-        self.covar = np.matlib.diag(covar)
+        self.covar = np.diag(np.asarray(covar, dtype=np.float64))
       else:
-        self.covar = np.matlib.identity(len(obs_model)) * covar
+        self.covar = np.identity(len(obs_model)) * np.asarray(covar, dtype=np.float64)
 
   def read(self, data, covar=None):
-    if covar:
-      self.covar = covar
+    # covar (a scalar or an array of the same shape) is copied into the sensor's covar, which
+    # every reading shares
+    if covar is not None:
+      self.covar[:] = covar
     return SensorReading(data, self.covar, self.obs_model)
 
 
@@ -193,6 +204,64 @@ class EKF:
     """
 
 
+def _scalar(x):
+  # the value of a float or a one element array, without wrapping floats in an array first
+  return x.item(0) if hasattr(x, "item") else float(x)
+
+
+class InPlaceEKF(EKF):
+  """EKF for small fixed state sizes that never allocates its state, covariance or intermediates.
+
+  state is a (dims, 1) and covar a (dims, dims) array, they are updated in place so assign to
+  them with ekf.state[:] = ... to keep the buffers. Scalar updates and predict run in the ekf_impl
+  kernels. calc_transfer_fun should return the same arrays on every call, e.g. by writing dt into
+  a matrix kept on the subclass.
+  """
+
+  def __init__(self, dims, var_init, process_noise, debug=False):
+    super(InPlaceEKF, self).__init__(debug)
+    self.identity = np.identity(dims)
+    self.state = np.zeros((dims, 1))
+    self.covar = self.identity * var_init
+    self.var_init = var_init
+    process_noise = np.asarray(process_noise, dtype=np.float64)
+    self.process_noise = np.diag(process_noise) if process_noise.ndim == 1 else process_noise.copy()
+
+    self._k = np.zeros(dims)
+    self._x = np.zeros(dims)
+    self._aux = np.zeros((dims, dims))
+    self._tmp = np.zeros((dims, dims))
+
+  def update(self, reading):
+    obs_model = np.asarray(reading.obs_model, dtype=np.float64)
+    if obs_model.shape[0] == 1:
+      return self.update_scalar(reading)
+
+    # vector readings are rare, they go through numpy
+    covar = np.asarray(reading.covar, dtype=np.float64)
+    innovation = np.asarray(reading.data, dtype=np.float64).reshape(-1, 1) - obs_model.dot(self.state)
+    innovation_covar = obs_model.dot(self.covar).dot(obs_model.T) + covar
+    kalman_gain = self.covar.dot(obs_model.T).dot(np.linalg.inv(innovation_covar))
+    self.state += kalman_gain.dot(innovation)
+    aux_mtrx = self.identity - kalman_gain.dot(obs_model)
+    self.covar[:] = aux_mtrx.dot(self.covar).dot(aux_mtrx.T) + kalman_gain.dot(covar).dot(kalman_gain.T)
+
+  def update_scalar(self, reading):
+    ekf_impl.update_scalar(self.state, self.covar,
+                           np.asarray(reading.obs_model, dtype=np.float64).reshape(-1),
+                           _scalar(reading.data), _scalar(reading.covar),
+                           self._k, self._aux, self._tmp)
+
+  def predict(self, dt):
+    transfer_fun, transfer_fun_jacobian = self.calc_transfer_fun(dt)
+    ekf_impl.predict(self.state, self.covar, transfer_fun, transfer_fun_jacobian, self.process_noise,
+                     dt, self._x, self._tmp)
+
+  @abc.abstractmethod
+  def calc_transfer_fun(self, dt):
+    """Like EKF.calc_transfer_fun, with float64 arrays instead of matrices."""
+
+
 class FastEKF1D(EKF):
   """Fast version of EKF for 1D problems with scalar readings."""
 
@@ -0,0 +1,72 @@
+# cython: boundscheck=False, wraparound=False, cdivision=True
+"""In place kernels of InPlaceEKF, the state has a handful of dimensions so plain loops win."""
+
+
+def update_scalar(double[:, ::1] x, double[:, ::1] P, double[::1] h, double z, double r,
+                  double[::1] k, double[:, ::1] aux, double[:, ::1] tmp):
+  cdef int n = x.shape[0]
+  cdef int i, j, l
+  cdef double s = r
+  cdef double innovation = z
+  cdef double acc
+
+  # k = P*H', S = H*P*H' + R
+  for i in range(n):
+    acc = 0.
+    for j in range(n):
+      acc += P[i, j] * h[j]
+    k[i] = acc
+    s += h[i] * acc
+    innovation -= h[i] * x[i, 0]
+
+  # K = P*H'/S, x = x + K*y
+  for i in range(n):
+    k[i] /= s
+    x[i, 0] += k[i] * innovation
+
+  # Joseph form: P = (I-K*H)*P*(I-K*H)' + K*R*K'
+  for i in range(n):
+    for j in range(n):
+      aux[i, j] = (1. if i == j else 0.) - k[i] * h[j]
+  for i in range(n):
+    for j in range(n):
+      acc = 0.
+      for l in range(n):
+        acc += aux[i, l] * P[l, j]
+      tmp[i, j] = acc
+  for i in range(n):
+    for j in range(n):
+      acc = r * k[i] * k[j]
+      for l in range(n):
+        acc += tmp[i, l] * aux[j, l]
+      P[i, j] = acc
+
+
+def predict(double[:, ::1] x, double[:, ::1] P, double[:, ::1] F, double[:, ::1] J, double[:, ::1] Q,
+            double dt, double[::1] xtmp, double[:, ::1] tmp):
+  cdef int n = x.shape[0]
+  cdef int i, j, l
+  cdef double acc
+
+  # x = F*x
+  for i in range(n):
+    acc = 0.
+    for j in range(n):
+      acc += F[i, j] * x[j, 0]
+    xtmp[i] = acc
+  for i in range(n):
+    x[i, 0] = xtmp[i]
+
+  # P = J*P*J' + Q*dt, clipped to avoid explosions
+  for i in range(n):
+    for j in range(n):
+      acc = 0.
+      for l in range(n):
+        acc += J[i, l] * P[l, j]
+      tmp[i, j] = acc
+  for i in range(n):
+    for j in range(n):
+      acc = Q[i, j] * dt
+      for l in range(n):
+        acc += tmp[i, l] * J[j, l]
+      P[i, j] = min(max(acc, -1e10), 1e10)
@@ -0,0 +1,5 @@
+from distutils.core import setup, Extension
+from Cython.Build import cythonize
+
+setup(name='EKF Implementation',
+      ext_modules=cythonize(Extension("ekf_impl", ["ekf_impl.pyx"])))
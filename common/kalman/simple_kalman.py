@@ -1,10 +1,68 @@
 # pylint: skip-file
 import os
-import subprocess
+import numpy as np
+
+from common.build_manifest import ensure_built
 
 kalman_dir = os.path.dirname(os.path.abspath(__file__))
-subprocess.check_call(["make", "simple_kalman_impl.so"], cwd=kalman_dir)
+ensure_built(kalman_dir, ["simple_kalman_impl*.so"], ["Makefile", "*.pyx", "*.pxd", "*_setup.py"], "simple_kalman_impl.so")
 
 from simple_kalman_impl import KF1D as KF1D
 # Silence pyflakes
 assert KF1D
+
+
+class KF1DBank(object):
+  """N independent KF1D sharing the same A, C and K, kept in one (N, 2) state array.
+
+  Filters are added and removed by id, predict and update run on all of them, or on the given
+  ids, in a single numpy operation. x is ordered by id.
+  """
+  def __init__(self, A, C, K):
+    self.A = np.asarray(A, dtype=np.float64)
+    self.K = np.ravel(K).astype(np.float64)
+    self.A_K = self.A - np.outer(self.K, C)
+    self.ids = np.zeros(0, dtype=np.int64)
+    self.x = np.zeros((0, 2))
+
+  def __len__(self):
+    return len(self.ids)
+
+  def index(self, ids):
+    """Rows of ids in x, raises KeyError for ids that have no filter."""
+    ids = np.asarray(ids, dtype=np.int64)
+    rows = np.minimum(np.searchsorted(self.ids, ids), max(len(self.ids) - 1, 0))
+    if len(ids) and (len(self.ids) == 0 or not np.array_equal(self.ids[rows], ids)):
+      raise KeyError("no filter for ids %s" % (np.setdiff1d(ids, self.ids).tolist(),))
+    return rows
+
+  def add(self, ids, x0):
+    """Adds a filter for every id, x0 is an (n, 2) array of initial states."""
+    ids = np.asarray(ids, dtype=np.int64)
+    if np.intersect1d(ids, self.ids).size or len(np.unique(ids)) != len(ids):
+      raise ValueError("filters for ids %s already exist" % (ids.tolist(),))
+    ids = np.concatenate([self.ids, ids])
+    order = np.argsort(ids, kind='mergesort')
+    self.ids = ids[order]
+    self.x = np.concatenate([self.x, np.reshape(x0, (-1, 2))])[order]
+
+  def remove(self, ids):
+    keep = ~np.isin(self.ids, ids)
+    self.ids = self.ids[keep]
+    self.x = self.x[keep]
+
+  def predict(self, ids=None):
+    if ids is None:
+      self.x = self.x.dot(self.A.T)
+    else:
+      rows = self.index(ids)
+      self.x[rows] = self.x[rows].dot(self.A.T)
+
+  def update(self, meas, ids=None):
+    """Runs one step of the filters of ids, all of them by default, with one measurement each."""
+    if ids is None:
+      self.x = self.x.dot(self.A_K.T) + np.outer(meas, self.K)
+    else:
+      rows = self.index(ids)
+      self.x[rows] = self.x[rows].dot(self.A_K.T) + np.outer(meas, self.K)
+    return self.x
@@ -3,7 +3,7 @@ import numpy.matlib
 import unittest
 import timeit
 
-from common.kalman.ekf import EKF, SimpleSensor, FastEKF1D
+from common.kalman.ekf import EKF, SimpleSensor, FastEKF1D, InPlaceEKF
 
 class TestEKF(EKF):
   def __init__(self, var_init, Q):
@@ -20,6 +20,16 @@ class TestEKF(EKF):
     return tf, tf
 
 
+class TestInPlaceEKF(InPlaceEKF):
+  def __init__(self, var_init, Q):
+    super(TestInPlaceEKF, self).__init__(2, var_init, Q)
+    self.tf = np.identity(2)
+
+  def calc_transfer_fun(self, dt):
+    self.tf[0, 1] = dt
+    return self.tf, self.tf
+
+
 class EKFTest(unittest.TestCase):
   def test_update_scalar(self):
     ekf = TestEKF(1e3, [0.1, 1])
@@ -112,5 +122,76 @@ fast_ekf.predict(dt)
 
     assert fast_ekf_speed < ekf_speed / 4
 
+class InPlaceEKFTest(unittest.TestCase):
+  def test_matches_ekf(self):
+    dt = 1. / 100
+    ekf = TestEKF(1e3, [0.1, 1])
+    inplace_ekf = TestInPlaceEKF(1e3, [0.1, 1])
+    state, covar = inplace_ekf.state, inplace_ekf.covar
+
+    sensor = SimpleSensor(0, 1, 2)
+    for data in np.arange(100, 300):
+      reading = sensor.read(data)
+      ekf.update_scalar(reading)
+      ekf.predict(dt)
+      inplace_ekf.update_scalar(reading)
+      inplace_ekf.predict(dt)
+      np.testing.assert_allclose(inplace_ekf.state, ekf.state)
+      np.testing.assert_allclose(inplace_ekf.covar, ekf.covar)
+
+    # nothing was reallocated
+    self.assertIs(inplace_ekf.state, state)
+    self.assertIs(inplace_ekf.covar, covar)
+
+  def test_sensor_covar_in_place(self):
+    ekf = TestEKF(1e3, [0.1, 1])
+    inplace_ekf = TestInPlaceEKF(1e3, [0.1, 1])
+    sensor = SimpleSensor(0, 1, 2)
+    covar = sensor.covar
+    for data, var in zip(np.arange(100, 150), np.linspace(0.5, 5., 50)):
+      reading = sensor.read(data, covar=var)
+      ekf.update_scalar(reading)
+      inplace_ekf.update_scalar(reading)
+      np.testing.assert_allclose(inplace_ekf.state, ekf.state)
+      np.testing.assert_allclose(inplace_ekf.covar, ekf.covar)
+    self.assertIs(sensor.covar, covar)
+    self.assertEqual(sensor.covar[0, 0], 5.)
+
+  def test_vector_update(self):
+    ekf = TestEKF(1e3, [0.1, 1])
+    inplace_ekf = TestInPlaceEKF(1e3, [0.1, 1])
+    reading = SimpleSensor(np.identity(2), np.diag([1., 2.]), 2).read(np.matrix([[10.], [3.]]))
+    ekf.update(reading)
+    inplace_ekf.update(reading)
+    np.testing.assert_allclose(inplace_ekf.state, ekf.state)
+    np.testing.assert_allclose(inplace_ekf.covar, ekf.covar)
+
+  def test_speed(self):
+    setup = """
+import numpy as np
+from common.kalman.tests.test_ekf import TestEKF, TestInPlaceEKF
+from common.kalman.ekf import SimpleSensor
+
+dt = 1. / 100
+reading = SimpleSensor(0, 1, 2).read(100)
+
+var_init, Q = 1e3, [0.1, 1]
+ekf = TestEKF(var_init, Q)
+inplace_ekf = TestInPlaceEKF(var_init, Q)
+    """
+
+    ekf_speed = timeit.timeit("""
+ekf.update_scalar(reading)
+ekf.predict(dt)
+    """, setup=setup, number=20000)
+
+    inplace_ekf_speed = timeit.timeit("""
+inplace_ekf.update_scalar(reading)
+inplace_ekf.predict(dt)
+    """, setup=setup, number=20000)
+
+    print("EKF %.1f us, InPlaceEKF %.1f us per update and predict" % (ekf_speed / 20000 * 1e6, inplace_ekf_speed / 20000 * 1e6))
+    assert inplace_ekf_speed < ekf_speed / 4
+
 if __name__ == "__main__":
   unittest.main()
@@ -3,7 +3,7 @@ import random
 import timeit
 import numpy as np
 
-from common.kalman.simple_kalman import KF1D
+from common.kalman.simple_kalman import KF1D, KF1DBank
 from common.kalman.simple_kalman_old import KF1D as KF1D_old
 
 
@@ -83,3 +83,53 @@ kf = KF1D(x0=[[x0_0], [x1_0]],
     kf_speed = timeit.timeit("kf.update(1234)", setup=setup, number=10000)
     kf_old_speed = timeit.timeit("kf_old.update(1234)", setup=setup, number=10000)
     self.assertTrue(kf_speed < kf_old_speed / 4)
+
+
+
+class TestKF1DBank(unittest.TestCase):
+  A = [[1.0, 0.01], [0.0, 1.0]]
+  C = [1.0, 0.0]
+  K = [[0.12287673], [0.29666309]]
+
+  def _kf(self, x0):
+    return KF1D(x0=[[x0], [0.0]], A=self.A, C=self.C, K=self.K)
+
+  def test_matches_kf1d(self):
+    bank = KF1DBank(self.A, self.C, self.K)
+    kfs = {}
+    for step in range(100):
+      # a filter comes and goes every few steps
+      if step % 7 == 0:
+        kfs[step] = self._kf(step)
+        bank.add([step], [[step, 0.0]])
+      if step % 11 == 0 and len(kfs) > 1:
+        del_id = min(kfs)
+        del kfs[del_id]
+        bank.remove([del_id])
+
+      ids = sorted(kfs)
+      meas = np.array([random.uniform(0, 50) for _ in ids])
+      bank.update(meas)
+      for i, meas_i in zip(ids, meas):
+        kfs[i].update(meas_i)
+
+      np.testing.assert_array_equal(bank.ids, ids)
+      np.testing.assert_allclose(bank.x, [np.ravel(kfs[i].x) for i in ids])
+
+  def test_update_some(self):
+    bank = KF1DBank(self.A, self.C, self.K)
+    bank.add([5, 2, 9], [[1., 0.], [2., 0.], [3., 0.]])
+    kf = self._kf(3.)
+    bank.update([10.], ids=[9])
+    kf.update(10.)
+    np.testing.assert_array_equal(bank.ids, [2, 5, 9])
+    np.testing.assert_allclose(bank.x[:2], [[2., 0.], [1., 0.]])
+    np.testing.assert_allclose(bank.x[2], np.ravel(kf.x))
+
+    bank.predict()
+    np.testing.assert_allclose(bank.x[2], np.dot(self.A, np.ravel(kf.x)))
+
+    with self.assertRaises(KeyError):
+      bank.update([1.], ids=[3])
+    with self.assertRaises(ValueError):
+      bank.add([2], [[0., 0.]])
@@ -19,6 +19,21 @@ before deleting the old <params_dir>/<d> directory.
 
 Writers that only modify a single key can simply take the lock, then swap the corresponding value
 file in place without messing with <params_dir>/d.
+
+Values are never modified in place, so the new directory hard links the files of the keys a
+transaction didn't change instead of copying them, only the changed keys are written and synced.
+
+Writers of several keys that don't need the directory swap (Params.put_many) take the lock once,
+write and sync all the values, swap them in and sync <params_dir>/d once for all of them. Every key
+is still replaced atomically and readers that take the lock see all of the new values or none.
+
+Params.get keeps the values it read in a per process cache. An inotify watch on <params_dir> and
+on the directory <params_dir>/d points to drops a key when its file is replaced and everything when
+the symlink is swapped, so a cached read is a dict lookup. A get(..., block=True) sleeps until
+the watch reports a change instead of polling. Without inotify every get reads the file.
+
+Params(db=...) also takes a store object instead of a directory, e.g. common.params_mmap.MmapDB
+which keeps all keys in one memory mapped file.
 """
 import time
 import os
@@ -27,8 +42,11 @@ import sys
 import shutil
 import fcntl
 import tempfile
+import threading
 from enum import Enum
 
+from common import inotify
+
 
 def mkdirs_exists_ok(path):
   try:
@@ -175,12 +193,15 @@ class DBWriter(DBAccessor):
     super(DBWriter, self).__init__(path)
     self._lock = None
     self._prev_umask = None
+    self._changed = set()
 
   def put(self, key, value):
     self._vals[key] = value
+    self._changed.add(key)
 
   def delete(self, key):
-    self._vals.pop(key, None)
+    if self._vals.pop(key, None) is not None:
+      self._changed.add(key)
 
   def __enter__(self):
     mkdirs_exists_ok(self._path)
@@ -216,21 +237,31 @@ class DBWriter(DBAccessor):
       #   new_data_path -> tempdir_path
       # Then atomically overwrite data_path with new_data_path
       #   data_path -> tempdir_path
+      data_path = self._data_path()
+      if not self._changed and os.path.isdir(data_path):
+        return
+
       old_data_path = None
       new_data_path = None
       tempdir_path = tempfile.mkdtemp(prefix=".tmp", dir=self._path)
 
       try:
-        # Write back all keys.
+        # Link the unchanged keys, write back the others.
         os.chmod(tempdir_path, 0o777)
         for k, v in self._vals.items():
-          with open(os.path.join(tempdir_path, k), "wb") as f:
+          path = os.path.join(tempdir_path, k)
+          if k not in self._changed:
+            try:
+              os.link(os.path.join(data_path, k), path)
+              continue
+            except OSError:
+              pass
+          with open(path, "wb") as f:
             f.write(v)
             f.flush()
             os.fsync(f.fileno())
         fsync_dir(tempdir_path)
 
-        data_path = self._data_path()
         try:
           old_data_path = os.path.join(self._path, os.readlink(data_path))
         except (OSError, IOError):
@@ -263,6 +294,7 @@ class DBWriter(DBAccessor):
       # Always release the lock.
       self._lock.release()
       self._lock = None
+      self._changed = set()
 
 
 def read_db(params_path, key):
@@ -274,34 +306,152 @@ def read_db(params_path, key):
     return None
 
 def write_db(params_path, key, value):
+  write_db_many(params_path, {key: value})
+
+def write_db_many(params_path, vals):
   prev_umask = os.umask(0)
   lock = FileLock(params_path+"/.lock", True)
   lock.acquire()
 
+  tmp_paths = {}
   try:
-    tmp_path = tempfile.mktemp(prefix=".tmp", dir=params_path)
-    with open(tmp_path, "wb") as f:
-      f.write(value)
-      f.flush()
-      os.fsync(f.fileno())
-
-    path = "%s/d/%s" % (params_path, key)
-    os.rename(tmp_path, path)
-    fsync_dir(os.path.dirname(path))
+    # every value is on disk before the first one is swapped in
+    for key, value in vals.items():
+      tmp_paths[key] = tempfile.mktemp(prefix=".tmp", dir=params_path)
+      with open(tmp_paths[key], "wb") as f:
+        f.write(value)
+        f.flush()
+        os.fsync(f.fileno())
+
+    data_path = "%s/d" % params_path
+    for key, tmp_path in tmp_paths.items():
+      os.rename(tmp_path, os.path.join(data_path, key))
+    if tmp_paths:
+      fsync_dir(data_path)
+    tmp_paths = {}
   finally:
+    for tmp_path in tmp_paths.values():
+      if os.path.exists(tmp_path):
+        os.remove(tmp_path)
     os.umask(prev_umask)
     lock.release()
 
+# events in <params_dir>/d that change a value
+DATA_EVENTS = inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO | inotify.IN_MOVED_FROM | inotify.IN_DELETE | \
+              inotify.IN_DELETE_SELF
+# how long a blocking get sleeps at most, in case an event got lost
+BLOCK_TIMEOUT = 1.
+
+
+class ParamsCache(object):
+  """Values read from one params directory, invalidated from a thread reading its inotify events."""
+  def __init__(self, path):
+    self.path = path
+    self.pid = os.getpid()
+    self.vals = {}
+    # bumped on every invalidation, a read that raced with one isn't cached
+    self.generation = 0
+    self.cv = threading.Condition()
+
+    self._inotify = inotify.Inotify()
+    self._root_wd = self._inotify.add_watch(path, inotify.IN_CREATE | inotify.IN_MOVED_TO)
+    self._data_wd = None
+    self._watch_data_dir()
+
+    self._thread = threading.Thread(target=self._run, name="params_cache")
+    self._thread.daemon = True
+    self._thread.start()
+
+  def _watch_data_dir(self):
+    try:
+      self._data_wd = self._inotify.add_watch(os.path.join(self.path, "d"), DATA_EVENTS)
+    except OSError:
+      self._data_wd = None
+    # the watch is in place before anything is read from the new directory
+    self.invalidate()
+
+  def _run(self):
+    while 1:
+      for wd, mask, _, name in self._inotify.read():
+        if mask & inotify.IN_Q_OVERFLOW:
+          self.invalidate()
+        elif wd == self._root_wd:
+          if name == "d":
+            self._watch_data_dir()
+        elif wd == self._data_wd:
+          self.invalidate(None if mask & inotify.IN_DELETE_SELF else name)
+
+  def invalidate(self, key=None):
+    with self.cv:
+      self.generation += 1
+      if key is None:
+        self.vals.clear()
+      else:
+        self.vals.pop(key, None)
+      self.cv.notify_all()
+
+  def get(self, key):
+    try:
+      return self.vals[key]
+    except KeyError:
+      pass
+
+    generation = self.generation
+    ret = read_db(self.path, key)
+    with self.cv:
+      if generation == self.generation:
+        self.vals[key] = ret
+    return ret
+
+  def wait(self, generation, timeout):
+    """Sleeps until there was an invalidation after generation or timeout passed."""
+    with self.cv:
+      if self.generation == generation:
+        self.cv.wait(timeout)
+
+  def close(self):
+    self._inotify.close()
+
+
+_caches = {}
+
+def get_cache(params_path):
+  """Returns the cache of params_path for this process, None without inotify."""
+  path = os.path.realpath(params_path)
+  cache = _caches.get(path)
+  if cache is not None and cache.pid != os.getpid():
+    # the watching thread doesn't survive a fork
+    cache.close()
+    cache = None
+  if cache is None and inotify.available:
+    try:
+      cache = ParamsCache(path)
+    except OSError:
+      # e.g. out of watches, reads go to the files then
+      cache = None
+    _caches[path] = cache
+  return cache
+
+
 class Params(object):
   def __init__(self, db='/data/params'):
     self.db = db
+    # a params directory or a store with the transaction, get and put_many of MmapDB
+    self.store = db if hasattr(db, "transaction") else None
+    if self.store is not None:
+      self.cache = None
+      return
 
     # create the database if it doesn't exist...
     if not os.path.exists(self.db+"/d"):
       with self.transaction(write=True):
         pass
 
+    self.cache = get_cache(self.db)
+
   def transaction(self, write=False):
+    if self.store is not None:
+      return self.store.transaction(write)
     if write:
       return DBWriter(self.db)
     else:
@@ -312,6 +462,7 @@ class Params(object):
       for key in keys:
         if tx_type in keys[key]:
           txn.delete(key)
+    self._invalidate()
 
   def manager_start(self):
     self._clear_keys_with_type(TxType.CLEAR_ON_MANAGER_START)
@@ -322,24 +473,54 @@ class Params(object):
   def delete(self, key):
     with self.transaction(write=True) as txn:
       txn.delete(key)
+    self._invalidate(key)
+
+  def _invalidate(self, key=None):
+    # our own writes are seen right away, not only once the watch reports them
+    if self.cache is not None:
+      self.cache.invalidate(key)
 
   def get(self, key, block=False):
     if key not in keys:
       raise UnknownKeyName(key)
 
+    if self.cache is None:
+      while 1:
+        ret = read_db(self.db, key) if self.store is None else self.store.get(key)
+        if not block or ret is not None:
+          break
+        time.sleep(0.05)
+      return ret
+
     while 1:
-      ret = read_db(self.db, key)
+      generation = self.cache.generation
+      ret = self.cache.get(key)
       if not block or ret is not None:
-        break
-      # is polling really the best we can do?
-      time.sleep(0.05)
-    return ret
+        return ret
+      self.cache.wait(generation, BLOCK_TIMEOUT)
 
   def put(self, key, dat):
     if key not in keys:
       raise UnknownKeyName(key)
 
-    write_db(self.db, key, dat)
+    if self.store is not None:
+      self.store.put_many({key: dat})
+    else:
+      write_db(self.db, key, dat)
+    self._invalidate(key)
+
+  def put_many(self, vals):
+    """Writes a dict of keys and values with one lock and one directory fsync."""
+    for key in vals:
+      if key not in keys:
+        raise UnknownKeyName(key)
+
+    if self.store is not None:
+      self.store.put_many(vals)
+    else:
+      write_db_many(self.db, vals)
+    for key in vals:
+      self._invalidate(key)
 
 if __name__ == "__main__":
   params = Params()
@@ -0,0 +1,302 @@
+"""Params store in a single memory mapped, append only file.
+
+  Params(db=MmapDB("/data/params.mm", import_dir="/data/params"))
+
+The file starts with a header holding a seqlock counter and the end of the published log, followed
+by the log of records. A record is a key and its value, or a key and DELETED. Writers take the lock
+file "<path>.lock", append their records past the end, msync them and only then publish the new
+end, the counter is odd while the end is being written. Everything before the published end never
+changes, so a reader only needs a consistent (counter, end) pair to parse the records it didn't see
+yet. Reads take no lock and no syscall, every end a reader sees is a consistent snapshot, and a
+transaction is published at once.
+
+When the log grows to COMPACT_RATIO times the size of the live records, the writer copies the live
+records into a new file, renames it over the old one and sets MOVED in the old header, which makes
+readers reopen the path.
+
+The directory layout of common.params stays the interface for everything else (e.g. the C++
+readers), import_dir seeds a new file from it and export writes a snapshot back into it.
+"""
+import os
+import mmap
+import struct
+import threading
+
+from common.params import FileLock, DBReader, DBWriter, fsync_dir
+
+MAGIC = b"OPPARAMS"
+VERSION = 1
+# magic, version, flags, seqlock counter, end of the published log
+HEADER = struct.Struct("<8sIIQQ")
+HEADER_STATE = struct.Struct("<IIQQ")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 16
+END_OFFSET = 24
+HEADER_SIZE = 64
+FLAG_MOVED = 1
+
+RECORD = struct.Struct("<II")
+DELETED = 0xffffffff
+
+INITIAL_SIZE = 16 * 1024
+COMPACT_RATIO = 4
+COMPACT_MIN_SIZE = 64 * 1024
+MAX_SPINS = 10000
+
+
+def _encode(key):
+  return key if isinstance(key, bytes) else key.encode()
+
+
+def _records(vals):
+  out = []
+  for key, value in vals.items():
+    k = _encode(key)
+    if value is None:
+      out.append(RECORD.pack(len(k), DELETED) + k)
+    else:
+      out.append(RECORD.pack(len(k), len(value)) + k + value)
+  return b"".join(out)
+
+
+def _parse(buf, start, end, vals):
+  i = start
+  while i < end:
+    key_len, val_len = RECORD.unpack_from(buf, i)
+    i += RECORD.size
+    key = buf[i:i + key_len].decode()
+    i += key_len
+    if val_len == DELETED:
+      vals.pop(key, None)
+    else:
+      vals[key] = buf[i:i + val_len]
+      i += val_len
+
+
+class MmapTransaction(object):
+  """Same interface as DBReader and DBWriter, a write transaction is published on exit."""
+  def __init__(self, db, write):
+    self._db = db
+    self._write = write
+    self._lock = None
+    self._vals = None
+    self._changed = {}
+
+  def __enter__(self):
+    if self._write:
+      self._lock = self._db._lock()
+    try:
+      self._vals = self._db.snapshot(locked=self._write)
+    except:
+      if self._lock is not None:
+        self._lock.release()
+      raise
+    return self
+
+  def __exit__(self, type, value, traceback):
+    if not self._write:
+      return
+    try:
+      if self._changed:
+        self._db._append_locked(self._changed)
+    finally:
+      self._lock.release()
+      self._lock = None
+
+  def keys(self):
+    return self._vals.keys()
+
+  def get(self, key):
+    return self._vals.get(key)
+
+  def put(self, key, value):
+    self._vals[key] = value
+    self._changed[key] = value
+
+  def delete(self, key):
+    if self._vals.pop(key, None) is not None:
+      self._changed[key] = None
+
+
+class MmapDB(object):
+  def __init__(self, path, import_dir=None):
+    self.path = path
+    self._mutex = threading.Lock()
+    self._fd = None
+    self._mm = None
+
+    if not os.path.exists(path):
+      self._create(import_dir)
+    self._open()
+
+  def _lock(self):
+    lock = FileLock(self.path + ".lock", True)
+    lock.acquire()
+    return lock
+
+  def _write_file(self, path, vals):
+    records = _records(vals)
+    size = max(INITIAL_SIZE, HEADER_SIZE + 2 * len(records))
+    prev_umask = os.umask(0)
+    try:
+      fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o666)
+    finally:
+      os.umask(prev_umask)
+    try:
+      os.ftruncate(fd, size)
+      header = HEADER.pack(MAGIC, VERSION, 0, 0, HEADER_SIZE + len(records))
+      os.write(fd, header + b"\0" * (HEADER_SIZE - len(header)) + records)
+      os.fsync(fd)
+    finally:
+      os.close(fd)
+
+  def _create(self, import_dir):
+    prev_umask = os.umask(0)
+    try:
+      lock = self._lock()
+    finally:
+      os.umask(prev_umask)
+    try:
+      if os.path.exists(self.path):
+        return
+      vals = {}
+      if import_dir is not None:
+        with DBReader(import_dir) as txn:
+          vals = {k: txn.get(k) for k in txn.keys()}
+      tmp_path = self.path + ".tmp"
+      self._write_file(tmp_path, vals)
+      os.rename(tmp_path, self.path)
+      fsync_dir(os.path.dirname(os.path.abspath(self.path)))
+    finally:
+      lock.release()
+
+  def _open(self):
+    self.close()
+    self._fd = os.open(self.path, os.O_RDWR)
+    self._mm = mmap.mmap(self._fd, os.fstat(self._fd).st_size)
+    if self._mm[:len(MAGIC)] != MAGIC or HEADER.unpack_from(self._mm)[1] != VERSION:
+      self.close()
+      raise ValueError("%s is not a params file" % self.path)
+    self._vals = {}
+    self._scanned = HEADER_SIZE
+
+  def _remap(self):
+    self._mm.close()
+    self._mm = mmap.mmap(self._fd, os.fstat(self._fd).st_size)
+
+  def close(self):
+    if self._mm is not None:
+      self._mm.close()
+      self._mm = None
+    if self._fd is not None:
+      os.close(self._fd)
+      self._fd = None
+
+  def _repair(self, locked):
+    """Makes the counter even again if a writer died while publishing."""
+    lock = None if locked else self._lock()
+    try:
+      seq = SEQ.unpack_from(self._mm, SEQ_OFFSET)[0]
+      if seq & 1:
+        SEQ.pack_into(self._mm, SEQ_OFFSET, seq + 1)
+        self._mm.flush(0, mmap.PAGESIZE)
+    finally:
+      if lock is not None:
+        lock.release()
+
+  def _refresh(self, locked=False):
+    """Parses the records published since the last call, callers hold _mutex. With locked the
+    caller holds the lock file as well, nobody else can be publishing then."""
+    spins = 0
+    while 1:
+      _, flags, seq, end = HEADER_STATE.unpack_from(self._mm, 8)
+      if flags & FLAG_MOVED:
+        self._open()
+      elif seq & 1 or SEQ.unpack_from(self._mm, SEQ_OFFSET)[0] != seq:
+        # a writer is publishing, publishing only takes a few stores
+        spins += 1
+        if locked or spins == MAX_SPINS:
+          self._repair(locked)
+          spins = 0
+      elif end > len(self._mm):
+        self._remap()
+      else:
+        break
+
+    if end > self._scanned:
+      _parse(self._mm, self._scanned, end, self._vals)
+      self._scanned = end
+
+  def get(self, key):
+    with self._mutex:
+      self._refresh()
+      return self._vals.get(key)
+
+  def snapshot(self, locked=False):
+    with self._mutex:
+      self._refresh(locked)
+      return dict(self._vals)
+
+  def transaction(self, write=False):
+    return MmapTransaction(self, write)
+
+  def put_many(self, vals):
+    with self.transaction(write=True) as txn:
+      for key, value in vals.items():
+        txn.put(key, value)
+
+  def _append_locked(self, changed):
+    """Appends and publishes the records of changed, a None value deletes. Callers hold the lock."""
+    with self._mutex:
+      self._refresh(locked=True)
+      records = _records(changed)
+      start = self._scanned
+      end = start + len(records)
+
+      if end > len(self._mm):
+        size = max(len(self._mm), os.fstat(self._fd).st_size)
+        while size < end:
+          size *= 2
+        os.ftruncate(self._fd, size)
+        self._remap()
+
+      self._mm[start:end] = records
+      page = start - start % mmap.PAGESIZE
+      self._mm.flush(page, end - page)
+
+      seq = SEQ.unpack_from(self._mm, SEQ_OFFSET)[0]
+      SEQ.pack_into(self._mm, SEQ_OFFSET, seq + 1)
+      SEQ.pack_into(self._mm, END_OFFSET, end)
+      SEQ.pack_into(self._mm, SEQ_OFFSET, seq + 2)
+      self._mm.flush(0, mmap.PAGESIZE)
+
+      _parse(self._mm, start, end, self._vals)
+      self._scanned = end
+
+      live = sum(RECORD.size + len(_encode(k)) + len(v) for k, v in self._vals.items())
+      if end > COMPACT_MIN_SIZE and end - HEADER_SIZE > COMPACT_RATIO * live:
+        self._compact_locked()
+
+  def _compact_locked(self):
+    tmp_path = self.path + ".tmp"
+    self._write_file(tmp_path, self._vals)
+    os.rename(tmp_path, self.path)
+    fsync_dir(os.path.dirname(os.path.abspath(self.path)))
+
+    # readers of the old file reopen the path
+    flags = HEADER.unpack_from(self._mm)[2]
+    struct.pack_into("<I", self._mm, 12, flags | FLAG_MOVED)
+    self._mm.flush(0, mmap.PAGESIZE)
+    self._open()
+    self._refresh(locked=True)
+
+  def export(self, params_dir):
+    """Writes a snapshot into the directory layout of common.params."""
+    vals = self.snapshot()
+    with DBWriter(params_dir) as txn:
+      for key in list(txn.keys()):
+        if key not in vals:
+          txn.delete(key)
+      for key, value in vals.items():
+        if txn.get(key) != value:
+          txn.put(key, value)
@@ -2,15 +2,24 @@
 import os
 import time
 import platform
+import importlib
 import subprocess
 import multiprocessing
 from cffi import FFI
 
+from common import startup_time
+from common.build_manifest import ensure_built
+
+
+def _build_clock():
+  import pyximport
+  installer = pyximport.install(inplace=True, build_dir='/tmp')
+  importlib.import_module("common.clock")
+  pyximport.uninstall(*installer)
+
 # Build and load cython module
-import pyximport
-installer = pyximport.install(inplace=True, build_dir='/tmp')
+ensure_built(os.path.dirname(os.path.abspath(__file__)), ["clock*.so"], ["clock.pyx"], "clock", _build_clock)
 from common.clock import monotonic_time, sec_since_boot  # pylint: disable=no-name-in-module, import-error
-pyximport.uninstall(*installer)
 assert monotonic_time
 assert sec_since_boot
 
@@ -69,6 +78,8 @@ class Ratekeeper(object):
 
   # this only monitor the cumulative lag, but does not enforce a rate
   def monitor_time(self):
+    if self._frame == 0:
+      startup_time.mark_first_iteration()
     lagged = False
     remaining = self._next_frame_time - sec_since_boot()
     self._next_frame_time += self._interval
@@ -0,0 +1,53 @@
+"""Records how long every python daemon takes from launch until its first loop iteration.
+
+The manager times the preimport of each process, its launcher marks the start and the end of the
+import in the child, and the first Ratekeeper.monitor_time or SubMaster.update marks the first
+iteration. At that point the process writes its times to STARTUP_DIR/<name>.json, which
+selfdrive/debug/startup_report.py prints as a table. Processes that weren't started by the
+manager never write anything.
+"""
+import os
+import json
+import time
+import tempfile
+import multiprocessing
+
+STARTUP_DIR = os.getenv("STARTUP_TIME_DIR", "/tmp/op_startup")
+
+# process name -> seconds spent importing it in the manager, inherited by the forked children
+preimport_times = {}
+
+_marks = {}
+_reported = False
+
+
+def record_preimport(name, seconds):
+  preimport_times[name] = seconds
+
+
+def mark_start():
+  _marks['start'] = time.time()
+
+
+def mark_imported():
+  _marks['imported'] = time.time()
+
+
+def mark_first_iteration():
+  global _reported
+  if _reported or 'start' not in _marks:
+    return
+  _reported = True
+  _marks['first_iteration'] = time.time()
+
+  name = multiprocessing.current_process().name
+  report = dict(_marks, name=name, pid=os.getpid(), preimport=preimport_times.get(name))
+  try:
+    if not os.path.isdir(STARTUP_DIR):
+      os.makedirs(STARTUP_DIR)
+    fd, tmp_path = tempfile.mkstemp(dir=STARTUP_DIR)
+    with os.fdopen(fd, "w") as f:
+      json.dump(report, f)
+    os.rename(tmp_path, os.path.join(STARTUP_DIR, name + ".json"))
+  except OSError:
+    pass
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import common.build_manifest as build_manifest
+
+
+class TestBuildManifest(unittest.TestCase):
+  def setUp(self):
+    self.dir = tempfile.mkdtemp()
+    self.orig_manifest_path = build_manifest.MANIFEST_PATH
+    build_manifest.MANIFEST_PATH = os.path.join(self.dir, ".build_manifest.json")
+    build_manifest._checked.clear()
+
+    self.src = os.path.join(self.dir, "test.c")
+    with open(self.src, "w") as f:
+      f.write("int x;\n")
+    self.builds = 0
+
+  def tearDown(self):
+    build_manifest.MANIFEST_PATH = self.orig_manifest_path
+    build_manifest._checked.clear()
+    shutil.rmtree(self.dir)
+
+  def _build(self):
+    self.builds += 1
+    open(os.path.join(self.dir, "test.so"), "w").close()
+
+  def _ensure_built(self):
+    # a fresh process every time
+    build_manifest._checked.clear()
+    build_manifest.ensure_built(self.dir, ["test.so"], ["*.c"], build=self._build)
+
+  def test_skips_unchanged(self):
+    self._ensure_built()
+    self._ensure_built()
+    self.assertEqual(self.builds, 1)
+
+    # same content with a new mtime
+    os.utime(self.src, (0, 0))
+    self._ensure_built()
+    self.assertEqual(self.builds, 1)
+
+  def test_rebuilds_on_change(self):
+    self._ensure_built()
+    with open(self.src, "a") as f:
+      f.write("int y;\n")
+    self._ensure_built()
+    self.assertEqual(self.builds, 2)
+
+    open(os.path.join(self.dir, "new.c"), "w").close()
+    self._ensure_built()
+    self.assertEqual(self.builds, 3)
+
+  def test_rebuilds_missing_artifact(self):
+    self._ensure_built()
+    os.remove(os.path.join(self.dir, "test.so"))
+    self._ensure_built()
+    self.assertEqual(self.builds, 2)
+
+  def test_checked_once_per_process(self):
+    build_manifest.ensure_built(self.dir, ["test.so"], ["*.c"], build=self._build)
+    os.remove(os.path.join(self.dir, "test.so"))
+    build_manifest.ensure_built(self.dir, ["test.so"], ["*.c"], build=self._build)
+    self.assertEqual(self.builds, 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
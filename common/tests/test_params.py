@@ -0,0 +1,125 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+from common import inotify
+from common.params import Params, UnknownKeyName, write_db
+
+
+class TestParams(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.params = Params(self.tmpdir)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _wait_for_invalidation(self, key):
+    cache = self.params.cache
+    for _ in range(100):
+      if key not in cache.vals:
+        return
+      time.sleep(0.01)
+    self.fail("%s is still cached" % key)
+
+  def test_params_put_and_get(self):
+    self.params.put("DongleId", b"cb38263377b873ee")
+    self.assertEqual(self.params.get("DongleId"), b"cb38263377b873ee")
+    self.assertIsNone(self.params.get("AccessToken"))
+
+  def test_params_unknown_key(self):
+    with self.assertRaises(UnknownKeyName):
+      self.params.get("swag")
+    with self.assertRaises(UnknownKeyName):
+      self.params.put("swag", b"abc")
+
+  def test_delete_and_clear(self):
+    self.params.put("CarParams", b"test")
+    self.params.put("DongleId", b"cb38263377b873ee")
+    self.assertEqual(self.params.get("CarParams"), b"test")
+    self.params.manager_start()
+    self.assertIsNone(self.params.get("CarParams"))
+    self.assertEqual(self.params.get("DongleId"), b"cb38263377b873ee")
+    self.params.delete("DongleId")
+    self.assertIsNone(self.params.get("DongleId"))
+
+  def test_put_many(self):
+    self.params.put("IsMetric", b"0")
+    self.params.put_many({"IsMetric": b"1", "RecordFront": b"1", "Passive": b"0"})
+    self.assertEqual(self.params.get("IsMetric"), b"1")
+    self.assertEqual(self.params.get("RecordFront"), b"1")
+    with self.params.transaction() as txn:
+      self.assertEqual(sorted(txn.keys()), ["IsMetric", "Passive", "RecordFront"])
+    # no temp files are left behind
+    tmp_files = [f for f in os.listdir(self.tmpdir) if os.path.isfile(os.path.join(self.tmpdir, f)) and f.startswith(".tmp")]
+    self.assertEqual(tmp_files, [])
+
+    with self.assertRaises(UnknownKeyName):
+      self.params.put_many({"IsMetric": b"0", "swag": b"abc"})
+    self.assertEqual(self.params.get("IsMetric"), b"1")
+
+  def test_transaction_links_unchanged_keys(self):
+    self.params.put_many({"IsMetric": b"0", "DongleId": b"cb38263377b873ee"})
+    data_path = os.path.join(self.tmpdir, "d")
+    ino = os.stat(os.path.join(data_path, "DongleId")).st_ino
+    with self.params.transaction(write=True) as txn:
+      txn.put("IsMetric", b"1")
+    self.assertEqual(os.stat(os.path.join(data_path, "DongleId")).st_ino, ino)
+    self.assertEqual(self.params.get("IsMetric"), b"1")
+    self.assertEqual(self.params.get("DongleId"), b"cb38263377b873ee")
+
+    # a transaction without changes keeps the directory
+    link = os.readlink(data_path)
+    with self.params.transaction(write=True) as txn:
+      txn.delete("Passive")
+    self.assertEqual(os.readlink(data_path), link)
+
+  @unittest.skipIf(not inotify.available, "no inotify")
+  def test_cache_invalidated_by_other_writers(self):
+    self.params.put("IsMetric", b"0")
+    self.assertEqual(self.params.get("IsMetric"), b"0")
+    self.assertEqual(self.params.cache.vals["IsMetric"], b"0")
+
+    # another process replacing the file
+    write_db(self.tmpdir, "IsMetric", b"1")
+    self._wait_for_invalidation("IsMetric")
+    self.assertEqual(self.params.get("IsMetric"), b"1")
+
+    # or swapping the data directory
+    with self.params.transaction(write=True) as txn:
+      txn.put("IsMetric", b"2")
+    self._wait_for_invalidation("IsMetric")
+    self.assertEqual(self.params.get("IsMetric"), b"2")
+
+    # the new directory is watched as well
+    write_db(self.tmpdir, "IsMetric", b"3")
+    self._wait_for_invalidation("IsMetric")
+    self.assertEqual(self.params.get("IsMetric"), b"3")
+
+  def test_get_block(self):
+    def _delayed_writer():
+      time.sleep(0.1)
+      write_db(self.tmpdir, "CarParams", b"test")
+    threading.Thread(target=_delayed_writer).start()
+    t = time.time()
+    self.assertEqual(self.params.get("CarParams", block=True), b"test")
+    self.assertLess(time.time() - t, 0.5)
+
+  def test_instances_share_cache(self):
+    other = Params(self.tmpdir)
+    self.assertIs(other.cache, self.params.cache)
+    other.put("Passive", b"1")
+    self.assertEqual(self.params.get("Passive"), b"1")
+
+  def test_fallback_without_cache(self):
+    self.params.cache = None
+    self.params.put("Passive", b"0")
+    self.assertEqual(self.params.get("Passive"), b"0")
+    self.assertEqual(Params(self.tmpdir).get("Passive"), b"0")
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+import multiprocessing
+
+import common.params_mmap as params_mmap
+from common.params import Params, UnknownKeyName
+from common.params_mmap import MmapDB
+
+
+def _write_pairs(path, n):
+  db = MmapDB(path)
+  for i in range(n):
+    v = str(i).encode()
+    db.put_many({"IsMetric": v, "RecordFront": v})
+
+
+class TestMmapDB(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmpdir, "params.mm")
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def test_put_get_delete(self):
+    params = Params(MmapDB(self.path))
+    self.assertIsNone(params.get("DongleId"))
+    params.put("DongleId", b"cb38263377b873ee")
+    params.put_many({"IsMetric": b"1", "CarParams": b"test"})
+    self.assertEqual(params.get("DongleId"), b"cb38263377b873ee")
+    params.manager_start()
+    self.assertIsNone(params.get("CarParams"))
+    params.delete("DongleId")
+    self.assertIsNone(params.get("DongleId"))
+    self.assertEqual(params.get("IsMetric"), b"1")
+    with self.assertRaises(UnknownKeyName):
+      params.put("swag", b"abc")
+
+    # another reader of the same file
+    with MmapDB(self.path).transaction() as txn:
+      self.assertEqual(list(txn.keys()), ["IsMetric"])
+
+  def test_readers_see_new_records(self):
+    writer, reader = MmapDB(self.path), MmapDB(self.path)
+    self.assertIsNone(reader.get("IsMetric"))
+    with writer.transaction(write=True) as txn:
+      txn.put("IsMetric", b"1")
+      # not published before the transaction ends
+      self.assertIsNone(reader.get("IsMetric"))
+    self.assertEqual(reader.get("IsMetric"), b"1")
+
+  def test_grow_and_compact(self):
+    writer, reader = MmapDB(self.path), MmapDB(self.path)
+    reader.get("CarParams")
+    value = b"x" * 3000
+    for i in range(100):
+      writer.put_many({"CarParams": value + str(i).encode()})
+      if i % 10 == 0:
+        self.assertEqual(reader.get("CarParams"), value + str(i).encode())
+    # the log was compacted into a new file the reader moved to
+    self.assertLess(os.path.getsize(self.path), params_mmap.COMPACT_RATIO * params_mmap.COMPACT_MIN_SIZE)
+    self.assertEqual(reader.get("CarParams"), value + b"99")
+    self.assertEqual(MmapDB(self.path).get("CarParams"), value + b"99")
+
+  def test_consistent_snapshots(self):
+    reader = MmapDB(self.path)
+    proc = multiprocessing.Process(target=_write_pairs, args=(self.path, 2000))
+    proc.start()
+    while proc.is_alive():
+      snapshot = reader.snapshot()
+      self.assertEqual(snapshot.get("IsMetric"), snapshot.get("RecordFront"))
+    proc.join()
+    self.assertEqual(reader.get("IsMetric"), b"1999")
+
+  def test_migration(self):
+    params_dir = os.path.join(self.tmpdir, "params")
+    params = Params(params_dir)
+    params.put_many({"DongleId": b"cb38263377b873ee", "IsMetric": b"1"})
+
+    mm_params = Params(MmapDB(self.path, import_dir=params_dir))
+    self.assertEqual(mm_params.get("DongleId"), b"cb38263377b873ee")
+    mm_params.put("IsMetric", b"0")
+    mm_params.delete("DongleId")
+
+    mm_params.store.export(params_dir)
+    self.assertEqual(params.get("IsMetric"), b"0")
+    self.assertIsNone(params.get("DongleId"))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -85,11 +85,8 @@ def is_vin_response_valid(can_dat, step, cnt):
 
 
 if __name__ == "__main__":
-  import zmq
-  from selfdrive.services import service_list
-  context = zmq.Context()
-  logcan = messaging.sub_sock(context, service_list['can'].port)
-  sendcan = messaging.pub_sock(context, service_list['sendcan'].port)
+  logcan = messaging.sub_sock('can')
+  sendcan = messaging.pub_sock('sendcan')
   time.sleep(1.)   # give time to sendcan socket to start
 
   print get_vin(logcan, sendcan)
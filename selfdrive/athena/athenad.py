@@ -67,7 +67,7 @@ def jsonrpc_handler(end_event):
 def getMessage(service=None, timeout=1000):
   if service is None or service not in service_list:
     raise Exception("invalid service")
-  socket = messaging.sub_sock(service_list[service].port)
+  socket = messaging.sub_sock(service)
   socket.setsockopt(zmq.RCVTIMEO, timeout)
   ret = messaging.recv_one(socket)
   return ret.to_dict()
@@ -1,10 +1,13 @@
 # pylint: skip-file
 import os
-import subprocess
+
+from common.build_manifest import ensure_built
 
 # Cython
 boardd_api_dir = os.path.dirname(os.path.abspath(__file__))
-subprocess.check_call(["make", "boardd_api_impl.so"], cwd=boardd_api_dir)
+ensure_built(boardd_api_dir, ["boardd_api_impl*.so"],
+             ["Makefile", "boardd_api_impl.pyx", "boardd_setup.py", "can_list_to_can_capnp.cc", "../../cereal/*.capnp"],
+             "boardd_api_impl.so")
 from selfdrive.boardd.boardd_api_impl import can_list_to_can_capnp
 assert can_list_to_can_capnp
 
@@ -12,7 +12,6 @@ import time
 
 import selfdrive.messaging as messaging
 from common.realtime import Ratekeeper
-from selfdrive.services import service_list
 from selfdrive.swaglog import cloudlog
 from selfdrive.boardd.boardd import can_capnp_to_can_list
 
@@ -115,8 +114,8 @@ def boardd_mock_loop():
   can_init()
   handle.controlWrite(0x40, 0xdc, SAFETY_ALLOUTPUT, 0, b'')
 
-  logcan = messaging.sub_sock(service_list['can'].port)
-  sendcan = messaging.pub_sock(service_list['sendcan'].port)
+  logcan = messaging.sub_sock('can')
+  sendcan = messaging.pub_sock('sendcan')
 
   while 1:
     tsc = messaging.drain_sock(logcan, wait_for_one=True)
@@ -160,11 +159,11 @@ def boardd_loop(rate=200):
   can_init()
 
   # *** publishes can and health
-  logcan = messaging.pub_sock(service_list['can'].port)
-  health_sock = messaging.pub_sock(service_list['health'].port)
+  logcan = messaging.pub_sock('can')
+  health_sock = messaging.pub_sock('health')
 
   # *** subscribes to can send
-  sendcan = messaging.sub_sock(service_list['sendcan'].port)
+  sendcan = messaging.sub_sock('sendcan')
 
   # drain sendcan to delete any stale messages from previous runs
   messaging.drain_sock(sendcan)
@@ -207,9 +206,9 @@ def boardd_proxy_loop(rate=200, address="192.168.2.251"):
   can_init()
 
   # *** subscribes can
-  logcan = messaging.sub_sock(service_list['can'].port, addr=address)
+  logcan = messaging.sub_sock('can', addr=address)
   # *** publishes to can send
-  sendcan = messaging.pub_sock(service_list['sendcan'].port)
+  sendcan = messaging.pub_sock('sendcan')
 
   # drain sendcan to delete any stale messages from previous runs
   messaging.drain_sock(sendcan)
@@ -6,7 +6,6 @@ from panda import Panda
 from multiprocessing import Pool
 
 import selfdrive.messaging as messaging
-from selfdrive.services import service_list
 from selfdrive.boardd.boardd import can_capnp_to_can_list
 
 def initializer():
@@ -19,7 +18,7 @@ def send_thread(serial):
   panda.set_safety_mode(Panda.SAFETY_ALLOUTPUT)
   panda.set_can_loopback(False)
 
-  can_sock = messaging.sub_sock(service_list['can'].port)
+  can_sock = messaging.sub_sock('can')
 
   while True:
     # Send messages one bus 0 and 1
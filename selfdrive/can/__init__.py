@@ -0,0 +1,16 @@
+import os
+
+from common.build_manifest import ensure_built
+
+can_dir = os.path.dirname(os.path.abspath(__file__))
+
+CAN_SOURCES = ["Makefile", "*.cc", "*.h", "*.pyx", "*.pxd", "*_setup.py", "process_dbc.py",
+               "../common/cereal.mk", "../../cereal/*.capnp", "../../opendbc/*.dbc"]
+CAN_ARTIFACTS = {
+  "all": ["libdbc.so", "dbc_lib/libdbc_*.so", "parser_pyx*.so"],
+  "packer_impl.so": ["packer_impl*.so"],
+}
+
+
+def build(target="all"):
+  ensure_built(can_dir, CAN_ARTIFACTS[target], CAN_SOURCES, target)
@@ -4,6 +4,7 @@
 #include <cstddef>
 #include <cstdint>
 #include <string>
+#include <vector>
 
 #define ARRAYSIZE(x) (sizeof(x)/sizeof(x[0]))
 
@@ -36,6 +37,16 @@ struct SignalValue {
   double value;
 };
 
+// all frames of one message decoded by can_decode_bulk, vals holds one row of names.size() per frame
+struct BulkMessage {
+  uint32_t address;
+  std::vector<const char*> names;
+  std::vector<uint64_t> t;
+  std::vector<uint16_t> ts;
+  std::vector<uint8_t> valid;
+  std::vector<double> vals;
+};
+
 
 enum SignalType {
   DEFAULT,
@@ -82,9 +93,11 @@ const DBC* dbc_lookup(const std::string& dbc_name);
 
 void dbc_register(const DBC* dbc);
 
+// every generated dbc is built into its own dbc_lib/libdbc_<name>.so, dbc_lookup
+// dlopens it the first time the dbc is looked up and gets the tables from dbc_table
 #define dbc_init(dbc) \
-static void __attribute__((constructor)) do_dbc_init_ ## dbc(void) { \
-  dbc_register(&dbc); \
+extern "C" const DBC* dbc_table(void) { \
+  return &dbc; \
 }
 
 #endif
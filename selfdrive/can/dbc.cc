@@ -1,5 +1,9 @@
+#include <cstdio>
 #include <string>
 #include <vector>
+#include <mutex>
+
+#include <dlfcn.h>
 
 #include "common.h"
 
@@ -10,18 +14,56 @@ std::vector<const DBC*>& get_dbcs() {
   return vec;
 }
 
+std::mutex dbcs_lock;
+
+// the dbc libraries are installed next to libdbc.so
+std::string dbc_lib_dir() {
+  Dl_info info;
+  if (dladdr((void*)&dbc_register, &info) && info.dli_fname) {
+    std::string fn(info.dli_fname);
+    size_t slash = fn.rfind('/');
+    if (slash != std::string::npos) {
+      return fn.substr(0, slash) + "/dbc_lib";
+    }
+  }
+  return "dbc_lib";
+}
+
+const DBC* dbc_load(const std::string& dbc_name) {
+  std::string fn = dbc_lib_dir() + "/libdbc_" + dbc_name + ".so";
+  void *handle = dlopen(fn.c_str(), RTLD_NOW | RTLD_LOCAL);
+  if (!handle) {
+    fprintf(stderr, "dbc_lookup: could not load %s: %s\n", fn.c_str(), dlerror());
+    return NULL;
+  }
+
+  auto dbc_table = (const DBC* (*)(void))dlsym(handle, "dbc_table");
+  if (!dbc_table) {
+    fprintf(stderr, "dbc_lookup: no tables in %s\n", fn.c_str());
+    dlclose(handle);
+    return NULL;
+  }
+
+  // the library stays loaded, the tables are used for the lifetime of the process
+  const DBC* dbc = dbc_table();
+  get_dbcs().push_back(dbc);
+  return dbc;
+}
+
 }
 
 const DBC* dbc_lookup(const std::string& dbc_name) {
+  std::lock_guard<std::mutex> guard(dbcs_lock);
   for (const auto& dbci : get_dbcs()) {
     if (dbc_name == dbci->name) {
       return dbci;
     }
   }
-  return NULL;
+  return dbc_load(dbc_name);
 }
 
 void dbc_register(const DBC* dbc) {
+  std::lock_guard<std::mutex> guard(dbcs_lock);
   get_dbcs().push_back(dbc);
 }
 
@@ -1,11 +1,11 @@
 import os
-import subprocess
 
 from cffi import FFI
 
-can_dir = os.path.dirname(os.path.abspath(__file__))
+from selfdrive.can import can_dir, build
+
 libdbc_fn = os.path.join(can_dir, "libdbc.so")
-subprocess.check_call(["make"], cwd=can_dir)
+build()
 
 ffi = FFI()
 ffi.cdef("""
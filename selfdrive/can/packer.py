@@ -1,9 +1,7 @@
 # pylint: skip-file
-import os
-import subprocess
+from selfdrive.can import build
 
-can_dir = os.path.dirname(os.path.abspath(__file__))
-subprocess.check_call(["make", "packer_impl.so"], cwd=can_dir)
+build("packer_impl.so")
 
 from selfdrive.can.packer_impl import CANPacker
 assert CANPacker
@@ -114,48 +114,58 @@ struct MessageState {
   uint8_t counter;
   uint8_t counter_fail;
 
-  bool parse(uint64_t sec, uint16_t ts_, uint64_t dat) {
-    for (int i=0; i < parse_sigs.size(); i++) {
-      auto& sig = parse_sigs[i];
-      int64_t tmp;
+  int64_t extract(const Signal& sig, uint64_t dat) {
+    int64_t tmp;
 
-      if (sig.is_little_endian){
-        tmp = (dat >> sig.b1) & ((1ULL << sig.b2)-1);
-      } else {
-        tmp = (dat >> sig.bo) & ((1ULL << sig.b2)-1);
-      }
+    if (sig.is_little_endian){
+      tmp = (dat >> sig.b1) & ((1ULL << sig.b2)-1);
+    } else {
+      tmp = (dat >> sig.bo) & ((1ULL << sig.b2)-1);
+    }
 
-      if (sig.is_signed) {
-        tmp -= (tmp >> (sig.b2-1)) ? (1ULL << sig.b2) : 0; //signed
-      }
+    if (sig.is_signed) {
+      tmp -= (tmp >> (sig.b2-1)) ? (1ULL << sig.b2) : 0; //signed
+    }
 
-      DEBUG("parse %X %s -> %lld\n", address, sig.name, tmp);
+    DEBUG("parse %X %s -> %lld\n", address, sig.name, tmp);
+    return tmp;
+  }
 
-      if (sig.type == SignalType::HONDA_CHECKSUM) {
-        if (honda_checksum(address, dat, size) != tmp) {
-          INFO("%X CHECKSUM FAIL\n", address);
-          return false;
-        }
-      } else if (sig.type == SignalType::HONDA_COUNTER) {
-        if (!update_counter_generic(tmp, sig.b2)) {
-          return false;
-        }
-      } else if (sig.type == SignalType::TOYOTA_CHECKSUM) {
-        if (toyota_checksum(address, dat, size) != tmp) {
-          INFO("%X CHECKSUM FAIL\n", address);
-          return false;
-        }
-      } else if (sig.type == SignalType::PEDAL_CHECKSUM) {
-        if (pedal_checksum(address, dat, size) != tmp) {
-          INFO("%X PEDAL CHECKSUM FAIL\n", address);
-          return false;
-        }
-      } else if (sig.type == SignalType::PEDAL_COUNTER) {
-        if (!update_counter_generic(tmp, sig.b2)) {
-          return false;
-        }
+  bool check(const Signal& sig, int64_t tmp, uint64_t dat) {
+    if (sig.type == SignalType::HONDA_CHECKSUM) {
+      if (honda_checksum(address, dat, size) != tmp) {
+        INFO("%X CHECKSUM FAIL\n", address);
+        return false;
+      }
+    } else if (sig.type == SignalType::HONDA_COUNTER) {
+      if (!update_counter_generic(tmp, sig.b2)) {
+        return false;
       }
+    } else if (sig.type == SignalType::TOYOTA_CHECKSUM) {
+      if (toyota_checksum(address, dat, size) != tmp) {
+        INFO("%X CHECKSUM FAIL\n", address);
+        return false;
+      }
+    } else if (sig.type == SignalType::PEDAL_CHECKSUM) {
+      if (pedal_checksum(address, dat, size) != tmp) {
+        INFO("%X PEDAL CHECKSUM FAIL\n", address);
+        return false;
+      }
+    } else if (sig.type == SignalType::PEDAL_COUNTER) {
+      if (!update_counter_generic(tmp, sig.b2)) {
+        return false;
+      }
+    }
+    return true;
+  }
 
+  bool parse(uint64_t sec, uint16_t ts_, uint64_t dat) {
+    for (int i=0; i < parse_sigs.size(); i++) {
+      auto& sig = parse_sigs[i];
+      int64_t tmp = extract(sig, dat);
+      if (!check(sig, tmp, dat)) {
+        return false;
+      }
       vals[i] = tmp * sig.factor + sig.offset;
     }
     ts = ts_;
@@ -164,6 +174,32 @@ struct MessageState {
     return true;
   }
 
+  // like parse, but decodes every signal of the frame into out and only reports the checks
+  bool decode(uint64_t dat, double* out) {
+    bool valid = true;
+    for (int i=0; i < parse_sigs.size(); i++) {
+      auto& sig = parse_sigs[i];
+      int64_t tmp = extract(sig, dat);
+      if (!check(sig, tmp, dat)) {
+        valid = false;
+      }
+      out[i] = tmp * sig.factor + sig.offset;
+    }
+    return valid;
+  }
+
+  uint64_t read_dat(const uint8_t* d, size_t len) {
+    uint8_t dat[8] = {0};
+    memcpy(dat, d, std::min(len, sizeof(dat)));
+
+    // Assumes all signals in the message are of the same type (little or big endian)
+    // TODO: allow signals within the same message to have different endianess
+    if (parse_sigs[0].is_little_endian) {
+      return read_u64_le(dat);
+    } else {
+      return read_u64_be(dat);
+    }
+  }
 
   bool update_counter_generic(int64_t v, int cnt_size) {
     uint8_t old_counter = counter;
@@ -192,29 +228,32 @@ class CANParser {
             const std::vector<SignalParseOptions> &sigoptions,
             bool sendcan, const std::string& tcp_addr, int timeout=-1)
     : bus(abus) {
-    // connect to can on 8006
-    context = zmq_ctx_new();
-    subscriber = zmq_socket(context, ZMQ_SUB);
-    zmq_setsockopt(subscriber, ZMQ_SUBSCRIBE, "", 0);
-    zmq_setsockopt(subscriber, ZMQ_RCVTIMEO, &timeout, sizeof(int));
-
-    std::string tcp_addr_str;
-
-    if (sendcan) {
-      tcp_addr_str = "tcp://" + tcp_addr + ":8017";
-    } else {
-      tcp_addr_str = "tcp://" + tcp_addr + ":8006";
-    }
-    const char *tcp_addr_char = tcp_addr_str.c_str();
+    // without an address the parser is fed with update_strings by its owner
+    if (!tcp_addr.empty()) {
+      // connect to can on 8006
+      context = zmq_ctx_new();
+      subscriber = zmq_socket(context, ZMQ_SUB);
+      zmq_setsockopt(subscriber, ZMQ_SUBSCRIBE, "", 0);
+      zmq_setsockopt(subscriber, ZMQ_RCVTIMEO, &timeout, sizeof(int));
+
+      std::string tcp_addr_str;
+
+      if (sendcan) {
+        tcp_addr_str = "tcp://" + tcp_addr + ":8017";
+      } else {
+        tcp_addr_str = "tcp://" + tcp_addr + ":8006";
+      }
+      const char *tcp_addr_char = tcp_addr_str.c_str();
 
-    zmq_connect(subscriber, tcp_addr_char);
+      zmq_connect(subscriber, tcp_addr_char);
 
-    // drain sendcan to delete any stale messages from previous runs
-    zmq_msg_t msgDrain;
-    zmq_msg_init(&msgDrain);
-    int err = 0;
-    while(err >= 0) {
-      err = zmq_msg_recv(&msgDrain, subscriber, ZMQ_DONTWAIT);
+      // drain sendcan to delete any stale messages from previous runs
+      zmq_msg_t msgDrain;
+      zmq_msg_init(&msgDrain);
+      int err = 0;
+      while(err >= 0) {
+        err = zmq_msg_recv(&msgDrain, subscriber, ZMQ_DONTWAIT);
+      }
     }
 
     dbc = dbc_lookup(dbc_name);
@@ -295,17 +334,7 @@ class CANParser {
         }
 
         if (cmsg.getDat().size() > 8) continue; //shouldnt ever happen
-        uint8_t dat[8] = {0};
-        memcpy(dat, cmsg.getDat().begin(), cmsg.getDat().size());
-
-        // Assumes all signals in the message are of the same type (little or big endian)
-        // TODO: allow signals within the same message to have different endianess
-        auto& sig = message_states[cmsg.getAddress()].parse_sigs[0];
-        if (sig.is_little_endian) {
-            p = read_u64_le(dat);
-        } else {
-            p = read_u64_be(dat);
-        }
+        p = state_it->second.read_dat(cmsg.getDat().begin(), cmsg.getDat().size());
 
         DEBUG("  proc %X: %llx\n", cmsg.getAddress(), p);
 
@@ -330,6 +359,11 @@ class CANParser {
     int err;
     int result = 0;
 
+    if (subscriber == NULL) {
+      UpdateValid(sec);
+      return wait ? -1 : 0;
+    }
+
     // recv from can
     zmq_msg_t msg;
     zmq_msg_init(&msg);
@@ -388,6 +422,43 @@ class CANParser {
     return ret;
   }
 
+  // Decodes a whole log of frames at once into one BulkMessage per tracked message. Counter
+  // tracking runs on a copy of the message states, so this doesn't disturb live updates.
+  void decode_bulk(size_t n, const uint64_t* t, const uint32_t* address, const uint16_t* bus_time,
+                   const uint8_t* src, const uint8_t* dat, std::vector<BulkMessage> &out) {
+    std::unordered_map<uint32_t, MessageState> states = message_states;
+    std::unordered_map<uint32_t, size_t> index;
+
+    out.clear();
+    for (const auto& kv : states) {
+      const auto& state = kv.second;
+      index[state.address] = out.size();
+
+      BulkMessage bm;
+      bm.address = state.address;
+      for (const auto& sig : state.parse_sigs) {
+        bm.names.push_back(sig.name);
+      }
+      out.push_back(bm);
+    }
+
+    for (size_t i = 0; i < n; i++) {
+      if (src && src[i] != bus) continue;
+      auto state_it = states.find(address[i]);
+      if (state_it == states.end()) continue;
+
+      auto& state = state_it->second;
+      auto& bm = out[index[address[i]]];
+      uint64_t p = state.read_dat(&dat[i*8], 8);
+
+      size_t row = bm.t.size();
+      bm.t.push_back(t[i]);
+      bm.ts.push_back(bus_time[i]);
+      bm.vals.resize((row+1) * state.parse_sigs.size());
+      bm.valid.push_back(state.decode(p, &bm.vals[row * state.parse_sigs.size()]));
+    }
+  }
+
   bool can_valid = false;
 
  private:
@@ -454,6 +525,32 @@ void can_query_vector(void* can, uint64_t sec, bool *out_can_valid, std::vector<
   values = cp->query(sec);
 };
 
+// deserializes every can packet once and feeds its frames to all of the parsers
+void can_update_strings(void** cans, size_t num_cans, uint64_t sec, const std::vector<std::string> &strings) {
+  for (const auto& dat : strings) {
+    // make copy due to alignment issues, will be freed on out of scope
+    auto amsg = kj::heapArray<capnp::word>((dat.size() / sizeof(capnp::word)) + 1);
+    memcpy(amsg.begin(), dat.data(), dat.size());
+
+    capnp::FlatArrayMessageReader cmsg(amsg);
+    cereal::Event::Reader event = cmsg.getRoot<cereal::Event>();
+    auto can_list = event.getCan();
+    for (size_t i = 0; i < num_cans; i++) {
+      ((CANParser*)cans[i])->UpdateCans(sec, can_list);
+    }
+  }
+
+  for (size_t i = 0; i < num_cans; i++) {
+    ((CANParser*)cans[i])->UpdateValid(sec);
+  }
+};
+
+void can_decode_bulk(void* can, size_t n, const uint64_t* t, const uint32_t* address, const uint16_t* bus_time,
+                     const uint8_t* src, const uint8_t* dat, std::vector<BulkMessage> &out) {
+  CANParser* cp = (CANParser*)can;
+  cp->decode_bulk(n, t, address, bus_time, src, dat, out);
+};
+
 }
 
 #ifdef TEST
@@ -1,9 +1,23 @@
 import os
-import subprocess
 
-can_dir = os.path.dirname(os.path.abspath(__file__))
+import numpy as np
+
+from selfdrive.can import can_dir, build
+
 libdbc_fn = os.path.join(can_dir, "libdbc.so")
-subprocess.check_call(["make"], cwd=can_dir)
+build()
 
-from selfdrive.can.parser_pyx import CANParser # pylint: disable=no-name-in-module, import-error
+from selfdrive.can.parser_pyx import CANParser, CANDispatcher # pylint: disable=no-name-in-module, import-error
 assert CANParser
+assert CANDispatcher
+
+
+def can_log_to_arrays(msgs):
+  """Flattens the frames of can events into the arrays CANParser.decode_bulk takes."""
+  frames = [(msg.logMonoTime, c.address, c.busTime, c.src, c.dat) for msg in msgs if msg.which() == 'can' for c in msg.can]
+  t = np.array([f[0] for f in frames], dtype=np.uint64)
+  address = np.array([f[1] for f in frames], dtype=np.uint32)
+  bus_time = np.array([f[2] for f in frames], dtype=np.uint16)
+  src = np.array([f[3] for f in frames], dtype=np.uint8)
+  dat = np.frombuffer(b"".join(f[4][:8].ljust(8, b"\0") for f in frames), dtype=np.uint8).reshape(-1, 8)
+  return t, address, bus_time, dat, src
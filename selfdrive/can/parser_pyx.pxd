@@ -1,9 +1,10 @@
 # distutils: language = c++
-from libc.stdint cimport uint32_t, uint64_t, uint16_t
+from libc.stdint cimport uint32_t, uint64_t, uint16_t, uint8_t, uintptr_t
 from libcpp.vector cimport vector
 from libcpp.map cimport map
 from libcpp.string cimport string
 from libcpp.unordered_set cimport unordered_set
+from libcpp.unordered_map cimport unordered_map
 from libcpp cimport bool
 
 ctypedef enum SignalType:
@@ -59,6 +60,14 @@ cdef struct SignalValue:
   const char* name
   double value
 
+cdef struct BulkMessage:
+  uint32_t address
+  vector[const char*] names
+  vector[uint64_t] t
+  vector[uint16_t] ts
+  vector[uint8_t] valid
+  vector[double] vals
+
 ctypedef const DBC * (*dbc_lookup_func)(const char* dbc_name)
 ctypedef void* (*can_init_with_vectors_func)(int bus, const char* dbc_name,
                 vector[MessageParseOptions] message_options,
@@ -69,6 +78,9 @@ ctypedef void* (*can_init_with_vectors_func)(int bus, const char* dbc_name,
 ctypedef int (*can_update_func)(void* can, uint64_t sec, bool wait);
 ctypedef size_t (*can_query_func)(void* can, uint64_t sec, bool *out_can_valid, size_t out_values_size, SignalValue* out_values);
 ctypedef void (*can_query_vector_func)(void* can, uint64_t sec, bool *out_can_valid,  vector[SignalValue] &values)
+ctypedef void (*can_update_strings_func)(void** cans, size_t num_cans, uint64_t sec, const vector[string] &strings)
+ctypedef void (*can_decode_bulk_func)(void* can, size_t n, const uint64_t* t, const uint32_t* address, const uint16_t* bus_time,
+                                      const uint8_t* src, const uint8_t* dat, vector[BulkMessage] &out)
 
 cdef class CANParser:
   cdef:
@@ -78,15 +90,32 @@ cdef class CANParser:
     can_init_with_vectors_func can_init_with_vectors
     can_update_func can_update
     can_query_vector_func can_query_vector
+    can_update_strings_func can_update_strings
+    can_decode_bulk_func can_decode_bulk
     map[string, uint32_t] msg_name_to_address
     map[uint32_t, string] address_to_msg_name
     vector[SignalValue] can_values
     bool test_mode_enabled
+    # compact mode: address -> signal name pointer -> index into values
+    unordered_map[uint32_t, unordered_map[uintptr_t, size_t]] sig_idx
+    double[::1] values_view
+    uint16_t[::1] ts_view
   cdef public:
     string dbc_name
     dict vl
     dict ts
     bool can_valid
     int can_invalid_cnt
+    bool compact
+    object values
+    object ts_values
+    dict sig_index
 
+  cdef void init_compact(self)
   cdef unordered_set[uint32_t] update_vl(self, uint64_t sec)
+
+cdef class CANDispatcher:
+  cdef:
+    vector[void*] cans
+    list parsers
+    can_update_strings_func can_update_strings
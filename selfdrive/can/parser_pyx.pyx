@@ -2,14 +2,20 @@
 from posix.dlfcn cimport dlopen, dlsym, RTLD_LAZY
 
 from libcpp cimport bool
+from libc.string cimport memcpy
 import os
 import numbers
+import numpy as np
 
 cdef int CAN_INVALID_CNT = 5
 
 cdef class CANParser:
-  def __init__(self, dbc_name, signals, checks=None, bus=0, sendcan=False, tcp_addr="127.0.0.1", timeout=-1):
+  def __init__(self, dbc_name, signals, checks=None, bus=0, sendcan=False, tcp_addr="127.0.0.1", timeout=-1, compact=False):
+    """With tcp_addr None the parser doesn't subscribe to can itself, it's fed with
+    update_strings or by a CANDispatcher. compact stores the signals in the values and ts_values arrays instead of the vl and ts
+    dicts, sig_index maps (message name or address, signal name) to their index."""
     self.test_mode_enabled = False
+    self.compact = compact
     can_dir = os.path.dirname(os.path.abspath(__file__))
     libdbc_fn = os.path.join(can_dir, "libdbc.so")
 
@@ -18,6 +24,8 @@ cdef class CANParser:
     self.dbc_lookup = <dbc_lookup_func>dlsym(libdbc, 'dbc_lookup')
     self.can_update = <can_update_func>dlsym(libdbc, 'can_update')
     self.can_query_vector = <can_query_vector_func>dlsym(libdbc, 'can_query_vector')
+    self.can_update_strings = <can_update_strings_func>dlsym(libdbc, 'can_update_strings')
+    self.can_decode_bulk = <can_decode_bulk_func>dlsym(libdbc, 'can_decode_bulk')
     if checks is None:
       checks = []
 
@@ -70,13 +78,39 @@ cdef class CANParser:
       mpo.check_frequency = freq
       message_options_v.push_back(mpo)
 
+    if tcp_addr is None:
+      tcp_addr = ""
     self.can = self.can_init_with_vectors(bus, dbc_name, message_options_v, signal_options_v, sendcan, tcp_addr, timeout)
+    if self.compact:
+      self.init_compact()
     self.update_vl(0)
 
+  cdef void init_compact(self):
+    cdef bool valid = False
+    cdef SignalValue cv
+    cdef size_t i
+
+    # a query at sec 0 returns every tracked signal, the name pointers point into the dbc and stay valid
+    self.can_query_vector(self.can, 0, &valid, self.can_values)
+
+    self.sig_index = {}
+    for i in range(self.can_values.size()):
+      cv = self.can_values[i]
+      self.sig_idx[cv.address][<uintptr_t>cv.name] = i
+      self.sig_index[(cv.address, string(cv.name))] = i
+      self.sig_index[(self.address_to_msg_name[cv.address], string(cv.name))] = i
+
+    self.values = np.zeros(self.can_values.size(), dtype=np.float64)
+    self.ts_values = np.zeros(self.can_values.size(), dtype=np.uint16)
+    self.values_view = self.values
+    self.ts_view = self.ts_values
+
   cdef unordered_set[uint32_t] update_vl(self, uint64_t sec):
     cdef string sig_name
     cdef unordered_set[uint32_t] updated_val
     cdef bool valid = False
+    cdef SignalValue cv
+    cdef size_t i, idx
 
     self.can_query_vector(self.can, sec, &valid, self.can_values)
 
@@ -86,6 +120,15 @@ cdef class CANParser:
         self.can_invalid_cnt = 0
     self.can_valid = self.can_invalid_cnt < CAN_INVALID_CNT
 
+    if self.compact:
+      for i in range(self.can_values.size()):
+        cv = self.can_values[i]
+        idx = self.sig_idx[cv.address][<uintptr_t>cv.name]
+        self.values_view[idx] = cv.value
+        self.ts_view[idx] = cv.ts
+        updated_val.insert(cv.address)
+      return updated_val
+
 
     for cv in self.can_values:
       self.vl[cv.address][string(cv.name)] = cv.value
@@ -103,3 +146,85 @@ cdef class CANParser:
     r = (self.can_update(self.can, sec, wait) >= 0)
     updated_val = self.update_vl(sec)
     return r, updated_val
+
+  def update_strings(self, uint64_t sec, strings):
+    """Updates from can packets that were already received, r is False when there were none."""
+    cdef vector[string] strs = strings
+    self.can_update_strings(&self.can, 1, sec, strs)
+    return len(strings) > 0, self.update_vl(sec)
+
+  def decode_bulk(self, t, address, bus_time, dat, src=None):
+    """Decodes a whole log of CAN frames in one call into NumPy columns.
+
+    t, address and bus_time are arrays with one entry per frame, dat is an (n, 8) uint8 array of
+    zero padded payloads and src the bus of every frame, frames on other buses are skipped. None
+    means they were all seen on this parser's bus. Returns a dict keyed by message name and
+    address like vl, with the arrays 't', 'ts' (bus time), 'valid' (checksum and counter checks
+    passed) and one column per signal.
+    """
+    cdef uint64_t[::1] t_v = np.ascontiguousarray(t, dtype=np.uint64)
+    cdef uint32_t[::1] address_v = np.ascontiguousarray(address, dtype=np.uint32)
+    cdef uint16_t[::1] bus_time_v = np.ascontiguousarray(bus_time, dtype=np.uint16)
+    cdef uint8_t[:, ::1] dat_v = np.ascontiguousarray(dat, dtype=np.uint8).reshape(-1, 8)
+    cdef uint8_t[::1] src_v
+    cdef const uint8_t* src_p = NULL
+    cdef size_t n = t_v.shape[0]
+    if address_v.shape[0] != n or bus_time_v.shape[0] != n or dat_v.shape[0] != n:
+      raise ValueError("every frame needs a time, address, bus time and payload")
+    if src is not None:
+      src_v = np.ascontiguousarray(src, dtype=np.uint8)
+      if src_v.shape[0] != n:
+        raise ValueError("every frame needs a source bus")
+      src_p = &src_v[0] if n > 0 else NULL
+
+    cdef vector[BulkMessage] out
+    if n > 0:
+      self.can_decode_bulk(self.can, n, &t_v[0], &address_v[0], &bus_time_v[0], src_p, &dat_v[0, 0], out)
+    else:
+      self.can_decode_bulk(self.can, 0, NULL, NULL, NULL, NULL, NULL, out)
+
+    ret = {}
+    cdef size_t i, j, rows, cols
+    cdef uint64_t[::1] t_out
+    cdef uint16_t[::1] ts_out
+    cdef uint8_t[::1] valid_out
+    cdef double[:, ::1] vals_out
+    for i in range(out.size()):
+      rows = out[i].t.size()
+      cols = out[i].names.size()
+
+      msg_t = np.empty(rows, dtype=np.uint64)
+      msg_ts = np.empty(rows, dtype=np.uint16)
+      msg_valid = np.empty(rows, dtype=np.uint8)
+      msg_vals = np.empty((rows, cols), dtype=np.float64)
+      if rows > 0:
+        t_out, ts_out, valid_out = msg_t, msg_ts, msg_valid
+        memcpy(&t_out[0], out[i].t.data(), rows * sizeof(uint64_t))
+        memcpy(&ts_out[0], out[i].ts.data(), rows * sizeof(uint16_t))
+        memcpy(&valid_out[0], out[i].valid.data(), rows * sizeof(uint8_t))
+        if cols > 0:
+          vals_out = msg_vals
+          memcpy(&vals_out[0, 0], out[i].vals.data(), rows * cols * sizeof(double))
+
+      msg = {'t': msg_t, 'ts': msg_ts, 'valid': msg_valid.view(np.bool_)}
+      for j in range(cols):
+        msg[out[i].names[j]] = msg_vals[:, j]
+
+      ret[out[i].address] = msg
+      ret[self.address_to_msg_name[out[i].address]] = msg
+    return ret
+
+
+cdef class CANDispatcher:
+  """Feeds received can packets to several parsers, every packet is deserialized only once."""
+  def __init__(self, parsers):
+    self.parsers = list(parsers)
+    for p in self.parsers:
+      self.cans.push_back((<CANParser>p).can)
+    self.can_update_strings = (<CANParser>self.parsers[0]).can_update_strings
+
+  def update_strings(self, uint64_t sec, strings):
+    """Returns whether there were any packets and the updated addresses of every parser."""
+    cdef vector[string] strs = strings
+    self.can_update_strings(self.cans.data(), self.cans.size(), sec, strs)
+    return len(strings) > 0, [(<CANParser>p).update_vl(sec) for p in self.parsers]
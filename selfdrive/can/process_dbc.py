@@ -2,6 +2,7 @@
 import os
 import glob
 import sys
+import hashlib
 
 import jinja2
 
@@ -17,26 +18,28 @@ def main():
   out_dir = sys.argv[2]
 
   template_fn = os.path.join(os.path.dirname(__file__), "dbc_template.cc")
-  template_mtime = os.path.getmtime(template_fn)
-
-  this_file_mtime = os.path.getmtime(__file__)
 
   with open(template_fn, "r") as template_f:
-    template = jinja2.Template(template_f.read(), trim_blocks=True, lstrip_blocks=True)
+    template_src = template_f.read()
+  template = jinja2.Template(template_src, trim_blocks=True, lstrip_blocks=True)
+
+  # the output only changes with the dbc, the parser, the template or this generator
+  with open(os.path.splitext(__file__)[0] + ".py", "r") as f:
+    generator_hash = hashlib.sha1(template_src + f.read()).hexdigest()
 
   for dbc_path in glob.iglob(os.path.join(dbc_dir, "*.dbc")):
-    dbc_mtime = os.path.getmtime(dbc_path)
     dbc_fn = os.path.split(dbc_path)[1]
     dbc_name = os.path.splitext(dbc_fn)[0]
     can_dbc = dbc(dbc_path)
     out_fn = os.path.join(os.path.dirname(__file__), out_dir, dbc_name + ".cc")
-    if os.path.exists(out_fn):
-      out_mtime = os.path.getmtime(out_fn)
-    else:
-      out_mtime = 0
 
-    if dbc_mtime < out_mtime and template_mtime < out_mtime and this_file_mtime < out_mtime:
-      continue #skip output is newer than template and dbc
+    header = "// generated from %s %s\n" % (can_dbc.hash, generator_hash)
+    if os.path.exists(out_fn):
+      with open(out_fn, "r") as out_f:
+        if out_f.readline() == header:
+          # touch so make sees it as newer than its inputs
+          os.utime(out_fn, None)
+          continue
 
     msgs = [(address, msg_name, msg_size, sorted(msg_sigs, key=lambda s: s.name not in ("COUNTER", "CHECKSUM"))) # process counter and checksums first
             for address, ((msg_name, msg_size), msg_sigs) in sorted(can_dbc.msgs.items()) if msg_sigs]
@@ -83,6 +86,7 @@ def main():
 
 
     with open(out_fn, "w") as out_f:
+      out_f.write(header)
       out_f.write(parser_code)
 
 if __name__ == '__main__':
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import common.dbc as dbc_module
+from common.dbc import dbc
+from opendbc import DBC_PATH
+
+DBC_FN = os.path.join(DBC_PATH, "toyota_prius_2017_pt_generated.dbc")
+
+
+class TestDbcCache(unittest.TestCase):
+  def setUp(self):
+    self.cache_dir = tempfile.mkdtemp()
+    self.orig_cache_dir = dbc_module.DBC_CACHE_DIR
+    dbc_module.DBC_CACHE_DIR = self.cache_dir
+
+  def tearDown(self):
+    dbc_module.DBC_CACHE_DIR = self.orig_cache_dir
+    shutil.rmtree(self.cache_dir)
+
+  def test_cached_matches_parsed(self):
+    parsed = dbc(DBC_FN, use_cache=False)
+    self.assertEqual(os.listdir(self.cache_dir), [])
+
+    dbc(DBC_FN)
+    self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(dbc_module.cache_path(parsed.name, parsed.hash))])
+
+    cached = dbc(DBC_FN)
+    self.assertEqual(cached.msgs, parsed.msgs)
+    self.assertEqual(dict(cached.def_vals), dict(parsed.def_vals))
+    self.assertEqual(cached.msg_name_to_address, parsed.msg_name_to_address)
+
+  def test_changed_dbc_invalidates(self):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      fn = os.path.join(tmp_dir, "test.dbc")
+      shutil.copy(DBC_FN, fn)
+      old = dbc(fn)
+
+      with open(fn, "a") as f:
+        f.write('BO_ 2047 NEW_MSG: 8 XXX\n SG_ NEW_SIG : 7|8@0+ (1,0) [0|255] "" XXX\n')
+      new = dbc(fn)
+      self.assertNotEqual(old.hash, new.hash)
+      self.assertIn(2047, new.msgs)
+      # the stale entry is replaced
+      self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+    finally:
+      shutil.rmtree(tmp_dir)
+
+
+class TestDbcBatch(unittest.TestCase):
+  def setUp(self):
+    self.dbc = dbc(DBC_FN, use_cache=False)
+    rng = np.random.RandomState(0)
+    self.addresses = np.array(sorted(self.dbc.msgs.keys()) * 10 + [0x7ff], dtype=np.uint32)
+    self.dat = rng.randint(0, 256, size=(len(self.addresses), 8)).astype(np.uint8)
+    for i, address in enumerate(self.addresses):
+      if address in self.dbc.msgs:
+        self.dat[i, self.dbc.msgs[address][0][1]:] = 0
+
+  def test_decode_batch(self):
+    out = self.dbc.decode_batch(self.addresses, self.dat)
+    self.assertNotIn(0x7ff, out)
+    for i, address in enumerate(self.addresses[:-1]):
+      _, expected = self.dbc.decode((int(address), 0, self.dat[i].tobytes()))
+      idx, data = out[address]
+      row = np.searchsorted(idx, i)
+      self.assertEqual(idx[row], i)
+      for sig, val in expected.items():
+        self.assertAlmostEqual(data[sig][row], val)
+
+  def test_decode_batch_uint64(self):
+    be = self.dat.view('>u8').ravel().astype(np.uint64)
+    out = self.dbc.decode_batch(self.addresses, be, arr=['STEER_ANGLE'])
+    expected = self.dbc.decode_batch(self.addresses, self.dat)
+    address = self.dbc.msg_name_to_address['STEER_ANGLE_SENSOR']
+    self.assertEqual(list(out[address][1].keys()), ['STEER_ANGLE'])
+    np.testing.assert_array_equal(out[address][1]['STEER_ANGLE'], expected[address][1]['STEER_ANGLE'])
+
+  def test_encode_batch(self):
+    out = self.dbc.decode_batch(self.addresses, self.dat)
+    for address, (idx, data) in out.items():
+      if not data:
+        continue
+      encoded = self.dbc.encode_batch(address, data)
+      for row in range(len(idx)):
+        expected = self.dbc.encode(address, {sig: vals[row] for sig, vals in data.items()})
+        self.assertEqual(encoded[row].tobytes(), expected)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -6,12 +6,11 @@ import unittest
 import requests
 
 import selfdrive.messaging as messaging
-from selfdrive.can.parser import CANParser as CANParserNew
+from selfdrive.can.parser import CANParser as CANParserNew, can_log_to_arrays
 from selfdrive.can.tests.parser_old import CANParser as CANParserOld
 from selfdrive.car.honda.carstate import get_can_signals
 from selfdrive.car.honda.interface import CarInterface
 from selfdrive.car.honda.values import CAR, DBC
-from selfdrive.services import service_list
 from tools.lib.logreader import LogReader
 
 BASE_URL = "https://commadataci.blob.core.windows.net/openpilotci/"
@@ -42,13 +41,20 @@ def dicts_vals_differ(dict1, dict2):
 
   return False
 
+def compact_vals_differ(parser, vl):
+  for (msg, sig), i in parser.sig_index.items():
+    if parser.values[i] != vl[msg][sig]:
+      return True
+  return False
+
 def run_route(route):
-  can = messaging.pub_sock(service_list['can'].port)
+  can = messaging.pub_sock('can')
 
   CP = CarInterface.get_params(CAR.CIVIC, {})
   signals, checks = get_can_signals(CP)
   parser_old = CANParserOld(DBC[CP.carFingerprint]['pt'], signals, checks, 0, timeout=-1)
   parser_new = CANParserNew(DBC[CP.carFingerprint]['pt'], signals, checks, 0, timeout=-1)
+  parser_compact = CANParserNew(DBC[CP.carFingerprint]['pt'], signals, checks, 0, timeout=-1, compact=True)
 
   if dict_keys_differ(parser_old.vl, parser_new.vl):
     return False
@@ -65,6 +71,7 @@ def run_route(route):
 
       _, updated_old = parser_old.update(t, True)
       _, updated_new = parser_new.update(t, True)
+      _, updated_compact = parser_compact.update(t, True)
 
       if updated_old != updated_new:
         route_ok = False
@@ -74,6 +81,39 @@ def run_route(route):
         print(t, "Diff in dict")
         route_ok = False
 
+      if updated_compact != updated_new or compact_vals_differ(parser_compact, parser_new.vl):
+        print(t, "Diff in compact")
+        route_ok = False
+
+  return route_ok
+
+def bulk_route(route):
+  can = messaging.pub_sock('can')
+
+  CP = CarInterface.get_params(CAR.CIVIC, {})
+  signals, checks = get_can_signals(CP)
+  parser = CANParserNew(DBC[CP.carFingerprint]['pt'], signals, checks, 0, timeout=-1)
+
+  msgs = [msg for msg in LogReader(route + ".bz2") if msg.which() == 'can']
+  bulk = parser.decode_bulk(*can_log_to_arrays(msgs))
+
+  t = 0
+  for msg in msgs:
+    t += DT
+    can.send(msg.as_builder().to_bytes())
+    parser.update(t, True)
+
+  # the last valid frame of every message is what the live parser ended up with
+  route_ok = True
+  for address in parser.vl:
+    if not isinstance(address, int) or not bulk[address]['valid'].any():
+      continue
+    last = bulk[address]['valid'].nonzero()[0][-1]
+    for sig, val in parser.vl[address].items():
+      if bulk[address][sig][last] != val:
+        print(hex(address), sig, "Diff in bulk decode")
+        route_ok = False
+
   return route_ok
 
 class TestCanParser(unittest.TestCase):
@@ -91,6 +131,9 @@ class TestCanParser(unittest.TestCase):
   def test_parser_civic(self):
     self.assertTrue(run_route(self.routes[CAR.CIVIC]))
 
+  def test_decode_bulk_civic(self):
+    self.assertTrue(bulk_route(self.routes[CAR.CIVIC]))
+
 
 if __name__ == "__main__":
   unittest.main()
@@ -1,11 +1,12 @@
 #!/usr/bin/env python
 import os
 from selfdrive.can.parser import CANParser
-from cereal import car
-from common.realtime import sec_since_boot
+import selfdrive.messaging as messaging
+from selfdrive.car.radar_interface_base import RadarInterfaceBase, D_REL, Y_REL, V_REL
 
-RADAR_MSGS_C = range(0x2c2, 0x2d4+2, 2)  # c_ messages 706,...,724
-RADAR_MSGS_D = range(0x2a2, 0x2b4+2, 2)  # d_ messages
+RADAR_MSGS_C = list(range(0x2c2, 0x2d4+2, 2))  # c_ messages 706,...,724
+RADAR_MSGS_D = list(range(0x2a2, 0x2b4+2, 2))  # d_ messages
+FIRST_MSG = min(RADAR_MSGS_C + RADAR_MSGS_D)
 LAST_MSG = max(RADAR_MSGS_C + RADAR_MSGS_D)
 NUMBER_MSGS = len(RADAR_MSGS_C) + len(RADAR_MSGS_D)
 
@@ -37,7 +38,7 @@ def _create_radar_can_parser():
                [20]*msg_n +  # 20Hz (0.05s)
                [20]*msg_n))  # 20Hz (0.05s)
 
-  return CANParser(os.path.splitext(dbc_f)[0], signals, checks, 1)
+  return CANParser(os.path.splitext(dbc_f)[0], signals, checks, 1, tcp_addr=None)
 
 def _address_to_track(address):
   if address in RADAR_MSGS_C:
@@ -46,57 +47,40 @@ def _address_to_track(address):
     return (address - RADAR_MSGS_D[0]) // 2
   raise ValueError("radar received unexpected address %d" % address)
 
-class RadarInterface(object):
-  def __init__(self, CP):
-    self.pts = {}
-    self.delay = 0.0  # Delay of radar  #TUNE
-    self.rcp = _create_radar_can_parser()
-
-  def update(self):
-    canMonoTimes = []
-
-    updated_messages = set()  # set of message IDs (sig_addresses) we've seen
+class RadarInterface(RadarInterfaceBase):
+  FIRST_MSG = FIRST_MSG
+  LAST_MSG = LAST_MSG
 
-    while 1:
-      tm = int(sec_since_boot() * 1e9)
-      _, vls = self.rcp.update(tm, True)
-      updated_messages.update(vls)
-      if LAST_MSG in updated_messages:
-        break
-
-    ret = car.RadarData.new_message()
-    errors = []
-    if not self.rcp.can_valid:
-      errors.append("canError")
-    ret.errors = errors
-    ret.canMonoTimes = canMonoTimes
+  def __init__(self, CP):
+    super(RadarInterface, self).__init__(CP, _create_radar_can_parser(), delay=0.0)  #TUNE
 
-    for ii in updated_messages:  # ii should be the message ID as a number
+  def _update(self, updated):
+    for ii in updated:  # ii should be the message ID as a number
       cpt = self.rcp.vl[ii]
       trackId = _address_to_track(ii)
 
       if trackId not in self.pts:
-        self.pts[trackId] = car.RadarData.RadarPoint.new_message()
-        self.pts[trackId].trackId = trackId
-        self.pts[trackId].aRel = float('nan')
-        self.pts[trackId].yvRel = float('nan')
-        self.pts[trackId].measured = True
+        self.pts[trackId] = [trackId, 0., 0., 0., True]
 
       if 'LONG_DIST' in cpt:  # c_* message
-        self.pts[trackId].dRel = cpt['LONG_DIST']  # from front of car
+        self.pts[trackId][D_REL] = cpt['LONG_DIST']  # from front of car
         # our lat_dist is positive to the right in car's frame.
         # TODO what does yRel want?
-        self.pts[trackId].yRel = cpt['LAT_DIST']  # in car frame's y axis, left is positive
+        self.pts[trackId][Y_REL] = cpt['LAT_DIST']  # in car frame's y axis, left is positive
       else:  # d_* message
-        self.pts[trackId].vRel = cpt['REL_SPEED']
+        self.pts[trackId][V_REL] = cpt['REL_SPEED']
 
-    # We want a list, not a dictionary. Filter out LONG_DIST==0 because that means it's not valid.
-    ret.points = [x for x in self.pts.values() if x.dRel != 0]
-    return ret
+  def _points(self):
+    # Filter out LONG_DIST==0 because that means it's not valid.
+    pts = super(RadarInterface, self)._points()
+    return pts[pts[:, D_REL] != 0]
 
 if __name__ == "__main__":
   RI = RadarInterface(None)
+  can_sock = messaging.sub_sock('can')
   while 1:
-    ret = RI.update()
+    ret = RI.update(messaging.drain_sock_raw(can_sock, wait_for_one=True))
+    if ret is None:
+      continue
     print(chr(27) + "[2J")  # clear screen
     print(ret)
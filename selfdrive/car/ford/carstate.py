@@ -29,7 +29,7 @@ def get_can_parser(CP):
   checks = [
   ]
 
-  return CANParser(DBC[CP.carFingerprint]['pt'], signals, checks, 0, timeout=100)
+  return CANParser(DBC[CP.carFingerprint]['pt'], signals, checks, 0, tcp_addr=None)
 
 
 class CarState(object):
@@ -105,11 +105,11 @@ class CarInterface(object):
     return ret
 
   # returns a car.CarState
-  def update(self, c):
+  def update(self, c, can_strings):
     # ******************* do can recv *******************
     canMonoTimes = []
 
-    can_rcv_valid, _ = self.cp.update(int(sec_since_boot() * 1e9), True)
+    can_rcv_valid, _ = self.cp.update_strings(int(sec_since_boot() * 1e9), can_strings)
 
     self.CS.update(self.cp)
 
@@ -2,10 +2,10 @@
 import os
 import numpy as np
 from selfdrive.can.parser import CANParser
-from cereal import car
-from common.realtime import sec_since_boot
+import selfdrive.messaging as messaging
+from selfdrive.car.radar_interface_base import RadarInterfaceBase, D_REL, Y_REL, V_REL
 
-RADAR_MSGS = range(0x500, 0x540)
+RADAR_MSGS = list(range(0x500, 0x540))
 
 def _create_radar_can_parser():
   dbc_f = 'ford_fusion_2018_adas.dbc'
@@ -15,41 +15,19 @@ def _create_radar_can_parser():
                      [0] * msg_n + [0] * msg_n + [0] * msg_n))
   checks = list(zip(RADAR_MSGS, [20]*msg_n))
 
-  return CANParser(os.path.splitext(dbc_f)[0], signals, checks, 1)
+  return CANParser(os.path.splitext(dbc_f)[0], signals, checks, 1, tcp_addr=None)
+
+class RadarInterface(RadarInterfaceBase):
+  FIRST_MSG = RADAR_MSGS[0]
+  LAST_MSG = RADAR_MSGS[-1]
 
-class RadarInterface(object):
   def __init__(self, CP):
-    # radar
-    self.pts = {}
     self.validCnt = {key: 0 for key in RADAR_MSGS}
     self.track_id = 0
+    super(RadarInterface, self).__init__(CP, _create_radar_can_parser())
 
-    self.delay = 0.0  # Delay of radar
-
-    # Nidec
-    self.rcp = _create_radar_can_parser()
-
-  def update(self):
-    canMonoTimes = []
-
-    updated_messages = set()
-    while 1:
-      tm = int(sec_since_boot() * 1e9)
-      _, vls = self.rcp.update(tm, True)
-      updated_messages.update(vls)
-
-      # TODO: do not hardcode last msg
-      if 0x53f in updated_messages:
-        break
-
-    ret = car.RadarData.new_message()
-    errors = []
-    if not self.rcp.can_valid:
-      errors.append("canError")
-    ret.errors = errors
-    ret.canMonoTimes = canMonoTimes
-
-    for ii in updated_messages:
+  def _update(self, updated):
+    for ii in updated:
       cpt = self.rcp.vl[ii]
 
       if cpt['X_Rel'] > 0.00001:
@@ -64,25 +42,22 @@ class RadarInterface(object):
       # radar point only valid if there have been enough valid measurements
       if self.validCnt[ii] > 0:
         if ii not in self.pts:
-          self.pts[ii] = car.RadarData.RadarPoint.new_message()
-          self.pts[ii].trackId = self.track_id
+          self.pts[ii] = [self.track_id, 0., 0., 0., True]
           self.track_id += 1
-        self.pts[ii].dRel = cpt['X_Rel']  # from front of car
-        self.pts[ii].yRel = cpt['X_Rel'] * cpt['Angle'] * np.pi / 180.  # in car frame's y axis, left is positive
-        self.pts[ii].vRel = cpt['V_Rel']
-        self.pts[ii].aRel = float('nan')
-        self.pts[ii].yvRel = float('nan')
-        self.pts[ii].measured = True
+        pt = self.pts[ii]
+        pt[D_REL] = cpt['X_Rel']  # from front of car
+        pt[Y_REL] = cpt['X_Rel'] * cpt['Angle'] * np.pi / 180.  # in car frame's y axis, left is positive
+        pt[V_REL] = cpt['V_Rel']
       else:
         if ii in self.pts:
           del self.pts[ii]
 
-    ret.points = self.pts.values()
-    return ret
-
 if __name__ == "__main__":
   RI = RadarInterface(None)
+  can_sock = messaging.sub_sock('can')
   while 1:
-    ret = RI.update()
+    ret = RI.update(messaging.drain_sock_raw(can_sock, wait_for_one=True))
+    if ret is None:
+      continue
     print(chr(27) + "[2J")
     print(ret)
@@ -47,7 +47,7 @@ def get_powertrain_can_parser(CP, canbus):
       ("CruiseState", "AcceleratorPedal2", 0),
     ]
 
-  return CANParser(DBC[CP.carFingerprint]['pt'], signals, [], canbus.powertrain, timeout=100)
+  return CANParser(DBC[CP.carFingerprint]['pt'], signals, [], canbus.powertrain, tcp_addr=None)
 
 
 class CarState(object):
@@ -1,12 +1,11 @@
 #!/usr/bin/env python
 import math
-import time
 import numpy as np
-from cereal import car
 from selfdrive.can.parser import CANParser
+import selfdrive.messaging as messaging
+from selfdrive.car.radar_interface_base import RadarInterfaceBase, D_REL, Y_REL, V_REL
 from selfdrive.car.gm.interface import CanBus
 from selfdrive.car.gm.values import DBC, CAR
-from common.realtime import sec_since_boot
 
 RADAR_HEADER_MSG = 1120
 SLOT_1_MSG = RADAR_HEADER_MSG + 1
@@ -21,7 +20,7 @@ def create_radar_can_parser(canbus, car_fingerprint):
   dbc_f = DBC[car_fingerprint]['radar']
   if car_fingerprint in (CAR.VOLT, CAR.MALIBU, CAR.HOLDEN_ASTRA, CAR.ACADIA, CAR.CADILLAC_ATS):
     # C1A-ARS3-A by Continental
-    radar_targets = range(SLOT_1_MSG, SLOT_1_MSG + NUM_SLOTS)
+    radar_targets = list(range(SLOT_1_MSG, SLOT_1_MSG + NUM_SLOTS))
     signals = list(zip(['FLRRNumValidTargets',
                    'FLRRSnsrBlckd', 'FLRRYawRtPlsblityFlt',
                    'FLRRHWFltPrsntInt', 'FLRRAntTngFltPrsnt',
@@ -37,53 +36,33 @@ def create_radar_can_parser(canbus, car_fingerprint):
 
     checks = []
 
-    return CANParser(dbc_f, signals, checks, canbus.obstacle)
+    return CANParser(dbc_f, signals, checks, canbus.obstacle, tcp_addr=None)
   else:
     return None
 
-class RadarInterface(object):
-  def __init__(self, CP):
-    # radar
-    self.pts = {}
+class RadarInterface(RadarInterfaceBase):
+  FIRST_MSG = RADAR_HEADER_MSG
+  LAST_MSG = LAST_RADAR_MSG
 
-    self.delay = 0.0  # Delay of radar
+  def __init__(self, CP):
+    self.fault = False
 
     canbus = CanBus()
-    print "Using %d as obstacle CAN bus ID" % canbus.obstacle
-    self.rcp = create_radar_can_parser(canbus, CP.carFingerprint)
-
-  def update(self):
-    updated_messages = set()
-    ret = car.RadarData.new_message()
-    while 1:
-
-      if self.rcp is None:
-        time.sleep(0.05)   # nothing to do
-        return ret
-
-      tm = int(sec_since_boot() * 1e9)
-      _, vls = self.rcp.update(tm, True)
-      updated_messages.update(vls)
-      if LAST_RADAR_MSG in updated_messages:
-        break
+    print("Using %d as obstacle CAN bus ID" % canbus.obstacle)
+    super(RadarInterface, self).__init__(CP, create_radar_can_parser(canbus, CP.carFingerprint))
 
+  def _update(self, updated):
     header = self.rcp.vl[RADAR_HEADER_MSG]
-    fault = header['FLRRSnsrBlckd'] or header['FLRRSnstvFltPrsntInt'] or \
+    self.fault = header['FLRRSnsrBlckd'] or header['FLRRSnstvFltPrsntInt'] or \
       header['FLRRYawRtPlsblityFlt'] or header['FLRRHWFltPrsntInt'] or \
       header['FLRRAntTngFltPrsnt'] or header['FLRRAlgnFltPrsnt']
-    errors = []
-    if not self.rcp.can_valid:
-      errors.append("canError")
-    if fault:
-      errors.append("fault")
-    ret.errors = errors
 
     currentTargets = set()
     num_targets = header['FLRRNumValidTargets']
 
     # Not all radar messages describe targets,
     # no need to monitor all of the self.rcp.msgs_upd
-    for ii in updated_messages:
+    for ii in updated:
       if ii == RADAR_HEADER_MSG:
         continue
 
@@ -96,27 +75,30 @@ class RadarInterface(object):
         targetId = cpt['TrkObjectID']
         currentTargets.add(targetId)
         if targetId not in self.pts:
-          self.pts[targetId] = car.RadarData.RadarPoint.new_message()
-          self.pts[targetId].trackId = targetId
+          self.pts[targetId] = [targetId, 0., 0., 0., False]
         distance = cpt['TrkRange']
-        self.pts[targetId].dRel = distance # from front of car
+        self.pts[targetId][D_REL] = distance # from front of car
         # From driver's pov, left is positive
         deg_to_rad = np.pi/180.
-        self.pts[targetId].yRel = math.sin(deg_to_rad * cpt['TrkAzimuth']) * distance
-        self.pts[targetId].vRel = cpt['TrkRangeRate']
-        self.pts[targetId].aRel = float('nan')
-        self.pts[targetId].yvRel = float('nan')
+        self.pts[targetId][Y_REL] = math.sin(deg_to_rad * cpt['TrkAzimuth']) * distance
+        self.pts[targetId][V_REL] = cpt['TrkRangeRate']
 
-    for oldTarget in self.pts.keys():
+    for oldTarget in list(self.pts.keys()):
       if not oldTarget in currentTargets:
         del self.pts[oldTarget]
 
-    ret.points = self.pts.values()
-    return ret
+  def _errors(self):
+    errors = super(RadarInterface, self)._errors()
+    if self.fault:
+      errors.append("fault")
+    return errors
 
 if __name__ == "__main__":
   RI = RadarInterface(None)
+  can_sock = messaging.sub_sock('can')
   while 1:
-    ret = RI.update()
+    ret = RI.update(messaging.drain_sock_raw(can_sock, wait_for_one=True))
+    if ret is None:
+      continue
     print(chr(27) + "[2J")
     print(ret)
@@ -153,7 +153,7 @@ def get_can_signals(CP):
 
 def get_can_parser(CP):
   signals, checks = get_can_signals(CP)
-  return CANParser(DBC[CP.carFingerprint]['pt'], signals, checks, 0, timeout=100)
+  return CANParser(DBC[CP.carFingerprint]['pt'], signals, checks, 0, tcp_addr=None)
 
 
 def get_cam_can_parser(CP):
@@ -166,7 +166,7 @@ def get_cam_can_parser(CP):
 
   cam_bus = 1 if CP.carFingerprint in HONDA_BOSCH else 2
 
-  return CANParser(DBC[CP.carFingerprint]['pt'], signals, checks, cam_bus, timeout=100)
+  return CANParser(DBC[CP.carFingerprint]['pt'], signals, checks, cam_bus, tcp_addr=None)
 
 class CarState(object):
   def __init__(self, CP):
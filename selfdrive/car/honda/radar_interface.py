@@ -1,13 +1,12 @@
 #!/usr/bin/env python
 import os
-import time
-from cereal import car
 from selfdrive.can.parser import CANParser
-from common.realtime import sec_since_boot
+import selfdrive.messaging as messaging
+from selfdrive.car.radar_interface_base import RadarInterfaceBase, D_REL, Y_REL, V_REL
 
 def _create_nidec_can_parser():
   dbc_f = 'acura_ilx_2016_nidec.dbc'
-  radar_messages = [0x400] + range(0x430, 0x43A) + range(0x440, 0x446)
+  radar_messages = [0x400] + list(range(0x430, 0x43A)) + list(range(0x440, 0x446))
   signals = list(zip(['RADAR_STATE'] +
                 ['LONG_DIST'] * 16 + ['NEW_TRACK'] * 16 + ['LAT_DIST'] * 16 +
                 ['REL_SPEED'] * 16,
@@ -15,43 +14,24 @@ def _create_nidec_can_parser():
                 [0] + [255] * 16 + [1] * 16 + [0] * 16 + [0] * 16))
   checks = list(zip([0x445], [20]))
 
-  return CANParser(os.path.splitext(dbc_f)[0], signals, checks, 1)
+  return CANParser(os.path.splitext(dbc_f)[0], signals, checks, 1, tcp_addr=None)
 
 
-class RadarInterface(object):
+class RadarInterface(RadarInterfaceBase):
+  FIRST_MSG = 0x400
+  LAST_MSG = 0x445
+
   def __init__(self, CP):
-    # radar
-    self.pts = {}
     self.track_id = 0
     self.radar_fault = False
     self.radar_wrong_config = False
-    self.radar_off_can = CP.radarOffCan
-
-    self.delay = 0.1  # Delay of radar
-
-    # Nidec
-    self.rcp = _create_nidec_can_parser()
-
-  def update(self):
-    canMonoTimes = []
 
-    updated_messages = set()
-    ret = car.RadarData.new_message()
+    # in Bosch radar and we are only steering for now, so return no points
+    rcp = None if CP.radarOffCan else _create_nidec_can_parser()
+    super(RadarInterface, self).__init__(CP, rcp, delay=0.1)
 
-    # in Bosch radar and we are only steering for now, so sleep 0.05s to keep
-    # radard at 20Hz and return no points
-    if self.radar_off_can:
-      time.sleep(0.05)
-      return ret
-
-    while 1:
-      tm = int(sec_since_boot() * 1e9)
-      _, vls = self.rcp.update(tm, True)
-      updated_messages.update(vls)
-      if 0x445 in updated_messages:
-        break
-
-    for ii in updated_messages:
+  def _update(self, updated):
+    for ii in updated:
       cpt = self.rcp.vl[ii]
       if ii == 0x400:
         # check for radar faults
@@ -59,32 +39,23 @@ class RadarInterface(object):
         self.radar_wrong_config = cpt['RADAR_STATE'] == 0x69
       elif cpt['LONG_DIST'] < 255:
         if ii not in self.pts or cpt['NEW_TRACK']:
-          self.pts[ii] = car.RadarData.RadarPoint.new_message()
-          self.pts[ii].trackId = self.track_id
+          self.pts[ii] = [self.track_id, 0., 0., 0., True]
           self.track_id += 1
-        self.pts[ii].dRel = cpt['LONG_DIST']  # from front of car
-        self.pts[ii].yRel = -cpt['LAT_DIST']  # in car frame's y axis, left is positive
-        self.pts[ii].vRel = cpt['REL_SPEED']
-        self.pts[ii].aRel = float('nan')
-        self.pts[ii].yvRel = float('nan')
-        self.pts[ii].measured = True
+        pt = self.pts[ii]
+        pt[D_REL] = cpt['LONG_DIST']  # from front of car
+        pt[Y_REL] = -cpt['LAT_DIST']  # in car frame's y axis, left is positive
+        pt[V_REL] = cpt['REL_SPEED']
       else:
         if ii in self.pts:
           del self.pts[ii]
 
-    errors = []
-    if not self.rcp.can_valid:
-      errors.append("canError")
+  def _errors(self):
+    errors = super(RadarInterface, self)._errors()
     if self.radar_fault:
       errors.append("fault")
     if self.radar_wrong_config:
       errors.append("wrongConfig")
-    ret.errors = errors
-    ret.canMonoTimes = canMonoTimes
-
-    ret.points = self.pts.values()
-
-    return ret
+    return errors
 
 
 if __name__ == "__main__":
@@ -92,7 +63,10 @@ if __name__ == "__main__":
     radarOffCan = False
 
   RI = RadarInterface(CarParams)
+  can_sock = messaging.sub_sock('can')
   while 1:
-    ret = RI.update()
+    ret = RI.update(messaging.drain_sock_raw(can_sock, wait_for_one=True))
+    if ret is None:
+      continue
     print(chr(27) + "[2J")
     print(ret)
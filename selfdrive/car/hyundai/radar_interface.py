@@ -1,24 +1,15 @@
 #!/usr/bin/env python
-from cereal import car
-import time
+from selfdrive.car.radar_interface_base import RadarInterfaceBase
 
 
-class RadarInterface(object):
+class RadarInterface(RadarInterfaceBase):
   def __init__(self, CP):
-    # radar
-    self.pts = {}
-    self.delay = 0.1
-
-  def update(self):
-
-    ret = car.RadarData.new_message()
-    time.sleep(0.05)  # radard runs on RI updates
-
-    return ret
+    # no radar parser, update sleeps to keep radard at 20Hz
+    super(RadarInterface, self).__init__(CP, delay=0.1)
 
 if __name__ == "__main__":
   RI = RadarInterface(None)
   while 1:
-    ret = RI.update()
+    ret = RI.update([])
     print(chr(27) + "[2J")
     print(ret)
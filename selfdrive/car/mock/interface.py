@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 from cereal import car
 from selfdrive.config import Conversions as CV
-from selfdrive.services import service_list
 from selfdrive.swaglog import cloudlog
 import selfdrive.messaging as messaging
 from common.realtime import Ratekeeper
@@ -22,8 +21,8 @@ class CarInterface(object):
     cloudlog.debug("Using Mock Car Interface")
 
     # TODO: subscribe to phone sensor
-    self.sensor = messaging.sub_sock(service_list['sensorEvents'].port)
-    self.gps = messaging.sub_sock(service_list['gpsLocation'].port)
+    self.sensor = messaging.sub_sock('sensorEvents')
+    self.gps = messaging.sub_sock('gpsLocation')
 
     self.speed = 0.
     self.prev_speed = 0.
@@ -80,7 +79,7 @@ class CarInterface(object):
     return ret
 
   # returns a car.CarState
-  def update(self, c):
+  def update(self, c, can_strings):
     self.rk.keep_time()
 
     # get basic data from phone and gps since CAN isn't connected
@@ -0,0 +1,81 @@
+"""Assembles radar sweeps from can packets.
+
+A radar sends one sweep every cycle as a burst of messages from FIRST_MSG to LAST_MSG. radard
+drains its can socket and hands the packets to update, which feeds them to the radar parser one at
+a time and hands the messages updated since FIRST_MSG to the car specific parse once LAST_MSG shows
+up. A sweep that isn't complete yet is continued by the next call.
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from cereal import log
+from common.realtime import sec_since_boot
+
+# columns of RadarSweep.points
+POINT_FIELDS = ['trackId', 'dRel', 'yRel', 'vRel', 'measured']
+TRACK_ID, D_REL, Y_REL, V_REL, MEASURED = range(len(POINT_FIELDS))
+
+# points is an (n, len(POINT_FIELDS)) float array, canMonoTimes the logMonoTime of the can packets
+# that started and ended the sweep
+RadarSweep = namedtuple('RadarSweep', ['points', 'canMonoTimes', 'errors'])
+
+
+def can_mono_time(dat):
+  return log.Event.from_bytes(dat).logMonoTime
+
+
+class RadarInterfaceBase(object):
+  FIRST_MSG = None
+  LAST_MSG = None
+
+  def __init__(self, CP, rcp=None, delay=0.0):
+    """rcp is the radar CANParser, created with tcp_addr=None. Without one update only keeps
+    radard at 20Hz and returns empty sweeps, radard doesn't need can then."""
+    self.rcp = rcp
+    self.delay = delay  # Delay of radar
+    self.pts = {}
+    self.updated = set()
+    self.can_mono_times = []
+
+  def update(self, can_strings):
+    """Returns the last sweep completed by the can packets, None if they didn't complete one."""
+    if self.rcp is None:
+      time.sleep(0.05)  # radard runs on RI updates
+      return RadarSweep(np.zeros((0, len(POINT_FIELDS))), [], [])
+
+    sweep = None
+    for dat in can_strings:
+      _, updated = self.rcp.update_strings(int(sec_since_boot() * 1e9), [dat])
+      if not updated:
+        continue
+
+      # the parser already deserialized the packet, only the ones that start or end a sweep are
+      # read again for their time
+      # a sweep starts over at its first message, unless this packet also ends the previous one
+      if self.FIRST_MSG in updated and self.LAST_MSG not in updated:
+        self.updated = set()
+        self.can_mono_times = [can_mono_time(dat)]
+      self.updated.update(updated)
+
+      if self.LAST_MSG in updated:
+        can_mono_times = self.can_mono_times + [can_mono_time(dat)]
+        updated, self.updated, self.can_mono_times = self.updated, set(), []
+        self._update(updated)
+        sweep = RadarSweep(self._points(), can_mono_times, self._errors())
+    return sweep
+
+  def _update(self, updated):
+    """Updates self.pts from the messages updated during the sweep, every point is a list with
+    the POINT_FIELDS."""
+    raise NotImplementedError
+
+  def _points(self):
+    return np.array(list(self.pts.values()), dtype=np.float64).reshape(-1, len(POINT_FIELDS))
+
+  def _errors(self):
+    errors = []
+    if not self.rcp.can_valid:
+      errors.append("canError")
+    return errors
@@ -37,7 +37,7 @@ def get_powertrain_can_parser(CP):
     ("BodyInfo", 10),
   ]
 
-  return CANParser(DBC[CP.carFingerprint]['pt'], signals, checks, 0, timeout=100)
+  return CANParser(DBC[CP.carFingerprint]['pt'], signals, checks, 0, tcp_addr=None)
 
 
 def get_camera_can_parser(CP):
@@ -79,7 +79,7 @@ def get_camera_can_parser(CP):
     ("ES_DashStatus", 10),
   ]
 
-  return CANParser(DBC[CP.carFingerprint]['pt'], signals, checks, 2, timeout=100)
+  return CANParser(DBC[CP.carFingerprint]['pt'], signals, checks, 2, tcp_addr=None)
 
 
 class CarState(object):
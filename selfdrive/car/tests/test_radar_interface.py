@@ -0,0 +1,96 @@
+import unittest
+import numpy as np
+
+import selfdrive.messaging as messaging
+import selfdrive.car.radar_interface_base as radar_interface_base
+from selfdrive.car.radar_interface_base import RadarInterfaceBase, POINT_FIELDS, TRACK_ID, D_REL
+
+
+class RadarParser(object):
+  """Reports the addresses on bus 1 of every can packet as updated, like CANParser.update_strings."""
+  can_valid = True
+
+  def __init__(self):
+    self.vl = {}
+
+  def update_strings(self, sec, strings):
+    updated = set()
+    for s in strings:
+      for c in messaging.log.Event.from_bytes(s).can:
+        if c.src == 1:
+          self.vl[c.address] = {'DIST': float(c.dat[0])}
+          updated.add(c.address)
+    return len(strings) > 0, updated
+
+
+class RadarInterface(RadarInterfaceBase):
+  FIRST_MSG = 0x10
+  LAST_MSG = 0x12
+
+  def __init__(self):
+    super(RadarInterface, self).__init__(None, RadarParser())
+
+  def _update(self, updated):
+    for ii in updated:
+      self.pts[ii] = [ii, self.rcp.vl[ii]['DIST'], 0., 0., True]
+
+
+def can_packet(log_mono_time, addresses, dist=1):
+  dat = messaging.new_message()
+  dat.logMonoTime = log_mono_time
+  dat.init('can', len(addresses))
+  for i, address in enumerate(addresses):
+    dat.can[i] = {'address': address, 'dat': bytes(bytearray([dist] * 8)), 'src': 1}
+  return dat.to_bytes()
+
+
+class TestRadarInterfaceBase(unittest.TestCase):
+  def setUp(self):
+    self.RI = RadarInterface()
+
+  def test_sweep(self):
+    self.assertIsNone(self.RI.update([can_packet(1, [0x10]), can_packet(2, [0x11])]))
+    sweep = self.RI.update([can_packet(3, [0x12])])
+    self.assertEqual(sweep.points.shape, (3, len(POINT_FIELDS)))
+    self.assertEqual(sorted(sweep.points[:, TRACK_ID]), [0x10, 0x11, 0x12])
+    self.assertEqual(sweep.canMonoTimes, [1, 3])
+    self.assertEqual(sweep.errors, [])
+
+  def test_packets_after_the_sweep_are_kept(self):
+    sweep = self.RI.update([can_packet(1, [0x10, 0x11]), can_packet(2, [0x12]), can_packet(3, [0x10], dist=5)])
+    self.assertEqual(sweep.canMonoTimes, [1, 2])
+
+    sweep = self.RI.update([can_packet(4, [0x11, 0x12], dist=5)])
+    self.assertEqual(sweep.canMonoTimes, [3, 4])
+    np.testing.assert_array_equal(sweep.points[:, D_REL], [5., 5., 5.])
+
+  def test_last_sweep(self):
+    # radard fell behind, only the last complete sweep is returned
+    sweep = self.RI.update([can_packet(1, [0x10, 0x11, 0x12]), can_packet(2, [0x10, 0x11], dist=5), can_packet(3, [0x12], dist=5)])
+    self.assertEqual(sweep.canMonoTimes, [2, 3])
+    np.testing.assert_array_equal(sweep.points[:, D_REL], [5., 5., 5.])
+
+  def test_times_of_boundaries_only(self):
+    read = []
+    can_mono_time = radar_interface_base.can_mono_time
+    radar_interface_base.can_mono_time = lambda dat: read.append(dat) or can_mono_time(dat)
+    try:
+      packets = [can_packet(1, [0x10]), can_packet(2, [0x11]), can_packet(3, [0x11]), can_packet(4, [0x12])]
+      self.RI.update(packets)
+    finally:
+      radar_interface_base.can_mono_time = can_mono_time
+    self.assertEqual(read, [packets[0], packets[3]])
+
+  def test_no_radar(self):
+    sweep = RadarInterfaceBase(None).update([])
+    self.assertEqual(sweep.points.shape, (0, len(POINT_FIELDS)))
+
+  def test_first_msg_starts_over(self):
+    # a partial sweep from before the radar was first seen
+    self.RI.update([can_packet(1, [0x11])])
+    sweep = self.RI.update([can_packet(2, [0x10]), can_packet(3, [0x12])])
+    self.assertEqual(sweep.canMonoTimes, [2, 3])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -4,6 +4,7 @@ from cereal import car
 from selfdrive.config import Conversions as CV
 from selfdrive.controls.lib.drive_helpers import EventTypes as ET, create_event
 from selfdrive.controls.lib.vehicle_model import VehicleModel
+from selfdrive.can.parser import CANDispatcher
 from selfdrive.car.toyota.carstate import CarState, get_can_parser, get_cam_can_parser
 from selfdrive.car.toyota.values import ECU, check_ecu_msgs, CAR, NO_STOP_TIMER_CAR
 from selfdrive.car import STD_CARGO_KG, scale_rot_inertia, scale_tire_stiffness
@@ -25,6 +26,7 @@ class CarInterface(object):
 
     self.cp = get_can_parser(CP)
     self.cp_cam = get_cam_can_parser(CP)
+    self.can_dispatcher = CANDispatcher([self.cp, self.cp_cam])
 
     self.forwarding_camera = False
 
@@ -236,15 +238,15 @@ class CarInterface(object):
     return ret
 
   # returns a car.CarState
-  def update(self, c):
+  def update(self, c, can_strings):
     # ******************* do can recv *******************
     canMonoTimes = []
 
-    can_rcv_valid, _ = self.cp.update(int(sec_since_boot() * 1e9), True)
-
     # run the cam can update for 10s as we just need to know if the camera is alive
     if self.frame < 1000:
-      self.cp_cam.update(int(sec_since_boot() * 1e9), False)
+      can_rcv_valid, _ = self.can_dispatcher.update_strings(int(sec_since_boot() * 1e9), can_strings)
+    else:
+      can_rcv_valid, _ = self.cp.update_strings(int(sec_since_boot() * 1e9), can_strings)
 
     self.CS.update(self.cp)
 
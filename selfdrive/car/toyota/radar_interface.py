@@ -1,79 +1,48 @@
 #!/usr/bin/env python
 import os
-import time
 from selfdrive.can.parser import CANParser
-from cereal import car
-from common.realtime import sec_since_boot
+import selfdrive.messaging as messaging
+from selfdrive.car.radar_interface_base import RadarInterfaceBase, D_REL, Y_REL, V_REL, MEASURED
 from selfdrive.car.toyota.values import NO_DSU_CAR, DBC, TSS2_CAR
 
+def _radar_msgs(car_fingerprint):
+  if car_fingerprint in TSS2_CAR:
+    return list(range(0x180, 0x190)), list(range(0x190, 0x1a0))
+  return list(range(0x210, 0x220)), list(range(0x220, 0x230))
+
 def _create_radar_can_parser(car_fingerprint):
   dbc_f = DBC[car_fingerprint]['radar']
 
-  if car_fingerprint in TSS2_CAR:
-    RADAR_A_MSGS = list(range(0x180, 0x190))
-    RADAR_B_MSGS = list(range(0x190, 0x1a0))
-  else:
-    RADAR_A_MSGS = list(range(0x210, 0x220))
-    RADAR_B_MSGS = list(range(0x220, 0x230))
+  RADAR_A_MSGS, RADAR_B_MSGS = _radar_msgs(car_fingerprint)
 
   msg_a_n = len(RADAR_A_MSGS)
   msg_b_n = len(RADAR_B_MSGS)
 
-  signals = zip(['LONG_DIST'] * msg_a_n + ['NEW_TRACK'] * msg_a_n + ['LAT_DIST'] * msg_a_n +
-                ['REL_SPEED'] * msg_a_n + ['VALID'] * msg_a_n + ['SCORE'] * msg_b_n,
-                RADAR_A_MSGS * 5 + RADAR_B_MSGS,
-                [255] * msg_a_n + [1] * msg_a_n + [0] * msg_a_n + [0] * msg_a_n + [0] * msg_a_n + [0] * msg_b_n)
+  signals = list(zip(['LONG_DIST'] * msg_a_n + ['NEW_TRACK'] * msg_a_n + ['LAT_DIST'] * msg_a_n +
+                     ['REL_SPEED'] * msg_a_n + ['VALID'] * msg_a_n + ['SCORE'] * msg_b_n,
+                     RADAR_A_MSGS * 5 + RADAR_B_MSGS,
+                     [255] * msg_a_n + [1] * msg_a_n + [0] * msg_a_n + [0] * msg_a_n + [0] * msg_a_n + [0] * msg_b_n))
 
-  checks = zip(RADAR_A_MSGS + RADAR_B_MSGS, [20]*(msg_a_n + msg_b_n))
+  checks = list(zip(RADAR_A_MSGS + RADAR_B_MSGS, [20]*(msg_a_n + msg_b_n)))
 
-  return CANParser(os.path.splitext(dbc_f)[0], signals, checks, 1)
+  return CANParser(os.path.splitext(dbc_f)[0], signals, checks, 1, tcp_addr=None)
 
-class RadarInterface(object):
+class RadarInterface(RadarInterfaceBase):
   def __init__(self, CP):
-    # radar
-    self.pts = {}
-    self.track_id = 0
-
-    self.delay = 0.0  # Delay of radar
-
-    if CP.carFingerprint in TSS2_CAR:
-      self.RADAR_A_MSGS = list(range(0x180, 0x190))
-      self.RADAR_B_MSGS = list(range(0x190, 0x1a0))
-    else:
-      self.RADAR_A_MSGS = list(range(0x210, 0x220))
-      self.RADAR_B_MSGS = list(range(0x220, 0x230))
-
+    self.RADAR_A_MSGS, self.RADAR_B_MSGS = _radar_msgs(CP.carFingerprint)
+    self.FIRST_MSG = self.RADAR_A_MSGS[0]
+    self.LAST_MSG = self.RADAR_B_MSGS[-1]
     self.valid_cnt = {key: 0 for key in self.RADAR_A_MSGS}
+    self.track_id = 0
 
-    self.rcp = _create_radar_can_parser(CP.carFingerprint)
     # No radar dbc for cars without DSU which are not TSS 2.0
     # TODO: make a adas dbc file for dsu-less models
-    self.no_radar = CP.carFingerprint in NO_DSU_CAR and CP.carFingerprint not in TSS2_CAR
-
-  def update(self):
-
-    ret = car.RadarData.new_message()
-
-    if self.no_radar:
-      time.sleep(0.05)
-      return ret
+    no_radar = CP.carFingerprint in NO_DSU_CAR and CP.carFingerprint not in TSS2_CAR
+    rcp = None if no_radar else _create_radar_can_parser(CP.carFingerprint)
+    super(RadarInterface, self).__init__(CP, rcp)
 
-    canMonoTimes = []
-    updated_messages = set()
-    while 1:
-      tm = int(sec_since_boot() * 1e9)
-      _, vls = self.rcp.update(tm, True)
-      updated_messages.update(vls)
-      if self.RADAR_B_MSGS[-1] in updated_messages:
-        break
-
-    errors = []
-    if not self.rcp.can_valid:
-      errors.append("canError")
-    ret.errors = errors
-    ret.canMonoTimes = canMonoTimes
-
-    for ii in updated_messages:
+  def _update(self, updated):
+    for ii in updated:
       if ii in self.RADAR_A_MSGS:
         cpt = self.rcp.vl[ii]
 
@@ -90,25 +59,23 @@ class RadarInterface(object):
         # radar point only valid if it's a valid measurement and score is above 50
         if cpt['VALID'] or (score > 50 and cpt['LONG_DIST'] < 255 and self.valid_cnt[ii] > 0):
           if ii not in self.pts or cpt['NEW_TRACK']:
-            self.pts[ii] = car.RadarData.RadarPoint.new_message()
-            self.pts[ii].trackId = self.track_id
+            self.pts[ii] = [self.track_id, 0., 0., 0., 0.]
             self.track_id += 1
-          self.pts[ii].dRel = cpt['LONG_DIST']  # from front of car
-          self.pts[ii].yRel = -cpt['LAT_DIST']  # in car frame's y axis, left is positive
-          self.pts[ii].vRel = cpt['REL_SPEED']
-          self.pts[ii].aRel = float('nan')
-          self.pts[ii].yvRel = float('nan')
-          self.pts[ii].measured = bool(cpt['VALID'])
+          pt = self.pts[ii]
+          pt[D_REL] = cpt['LONG_DIST']  # from front of car
+          pt[Y_REL] = -cpt['LAT_DIST']  # in car frame's y axis, left is positive
+          pt[V_REL] = cpt['REL_SPEED']
+          pt[MEASURED] = bool(cpt['VALID'])
         else:
           if ii in self.pts:
             del self.pts[ii]
 
-    ret.points = self.pts.values()
-    return ret
-
 if __name__ == "__main__":
   RI = RadarInterface(None)
+  can_sock = messaging.sub_sock('can')
   while 1:
-    ret = RI.update()
+    ret = RI.update(messaging.drain_sock_raw(can_sock, wait_for_one=True))
+    if ret is None:
+      continue
     print(chr(27) + "[2J")
     print(ret)
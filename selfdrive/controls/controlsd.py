@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 import gc
+import zmq
 import capnp
 from cereal import car, log
 from common.numpy_fast import clip
@@ -8,7 +9,6 @@ from common.profiler import Profiler
 from common.params import Params
 import selfdrive.messaging as messaging
 from selfdrive.config import Conversions as CV
-from selfdrive.services import service_list
 from selfdrive.boardd.boardd import can_list_to_can_capnp
 from selfdrive.car.car_helpers import get_car, get_startup_alert
 from selfdrive.controls.lib.model_parser import CAMERA_OFFSET
@@ -49,12 +49,13 @@ def events_to_bytes(events):
   return ret
 
 
-def data_sample(CI, CC, sm, cal_status, cal_perc, overtemp, free_space, low_battery,
+def data_sample(CI, CC, sm, can_sock, wait_for_can, cal_status, cal_perc, overtemp, free_space, low_battery,
                 driver_status, state, mismatch_counter, params):
   """Receive data from sockets and create events for battery, temperature and disk space"""
 
   # Update carstate from CAN and create events
-  CS = CI.update(CC)
+  can_strs = messaging.drain_sock_raw(can_sock, wait_for_one=wait_for_can)
+  CS = CI.update(CC, can_strs)
   events = list(CS.events)
   enabled = isEnabled(state)
 
@@ -263,8 +264,7 @@ def state_control(frame, rcv_frame, plan, path_plan, CS, CP, state, events, v_cr
   return actuators, v_cruise_kph, driver_status, v_acc_sol, a_acc_sol, lac_log
 
 
-def data_send(sm, CS, CI, CP, VM, state, events, actuators, v_cruise_kph, rk, carstate,
-              carcontrol, carevents, carparams, controlsstate, sendcan, AM, driver_status,
+def data_send(sm, pm, CS, CI, CP, VM, state, events, actuators, v_cruise_kph, rk, AM, driver_status,
               LaC, LoC, read_only, start_time, v_acc, a_acc, lac_log, events_prev):
   """Send actuators and hud commands to the car, send controlsstate and MPC logging"""
 
@@ -305,7 +305,7 @@ def data_send(sm, CS, CI, CP, VM, state, events, actuators, v_cruise_kph, rk, ca
   if not read_only:
     # send car controls over can
     can_sends = CI.apply(CC)
-    sendcan.send(can_list_to_can_capnp(can_sends, msgtype='sendcan', valid=CS.canValid))
+    pm.send('sendcan', can_list_to_can_capnp(can_sends, msgtype='sendcan', valid=CS.canValid))
 
   force_decel = driver_status.awareness < 0.
 
@@ -359,7 +359,7 @@ def data_send(sm, CS, CI, CP, VM, state, events, actuators, v_cruise_kph, rk, ca
     dat.controlsState.lateralControlState.pidState = lac_log
   else:
     dat.controlsState.lateralControlState.indiState = lac_log
-  controlsstate.send(dat.to_bytes())
+  pm.queue('controlsState', dat)
 
   # carState
   cs_send = messaging.new_message()
@@ -367,7 +367,7 @@ def data_send(sm, CS, CI, CP, VM, state, events, actuators, v_cruise_kph, rk, ca
   cs_send.valid = CS.canValid
   cs_send.carState = CS
   cs_send.carState.events = events
-  carstate.send(cs_send.to_bytes())
+  pm.queue('carState', cs_send)
 
   # carEvents - logged every second or on change
   events_bytes = events_to_bytes(events)
@@ -375,21 +375,24 @@ def data_send(sm, CS, CI, CP, VM, state, events, actuators, v_cruise_kph, rk, ca
     ce_send = messaging.new_message()
     ce_send.init('carEvents', len(events))
     ce_send.carEvents = events
-    carevents.send(ce_send.to_bytes())
+    pm.queue('carEvents', ce_send)
 
   # carParams - logged every 50 seconds (> 1 per segment)
   if (sm.frame % int(50. / DT_CTRL) == 0):
     cp_send = messaging.new_message()
     cp_send.init('carParams')
     cp_send.carParams = CP
-    carparams.send(cp_send.to_bytes())
+    pm.queue('carParams', cp_send)
 
   # carControl
   cc_send = messaging.new_message()
   cc_send.init('carControl')
   cc_send.valid = CS.canValid
   cc_send.carControl = CC
-  carcontrol.send(cc_send.to_bytes())
+  pm.queue('carControl', cc_send)
+
+  # logging messages leave together, sendcan went out right away
+  pm.flush()
 
   return CC, events_bytes
 
@@ -403,21 +406,20 @@ def controlsd_thread(gctx=None):
   params = Params()
 
   # Pub Sockets
-  sendcan = messaging.pub_sock(service_list['sendcan'].port)
-  controlsstate = messaging.pub_sock(service_list['controlsState'].port)
-  carstate = messaging.pub_sock(service_list['carState'].port)
-  carcontrol = messaging.pub_sock(service_list['carControl'].port)
-  carevents = messaging.pub_sock(service_list['carEvents'].port)
-  carparams = messaging.pub_sock(service_list['carParams'].port)
+  pm = messaging.PubMaster(['sendcan', 'controlsState', 'carState', 'carControl', 'carEvents', 'carParams'])
 
   is_metric = params.get("IsMetric") == "1"
   passive = params.get("Passive") != "0"
 
-  sm = messaging.SubMaster(['thermal', 'health', 'liveCalibration', 'driverMonitoring', 'plan', 'pathPlan'])
-  logcan = messaging.sub_sock(service_list['can'].port)
+  sm = messaging.SubMaster(['thermal', 'health', 'liveCalibration', 'driverMonitoring', 'plan', 'pathPlan'], zero_copy=True)
+  logcan = messaging.sub_sock('can')
 
   CC = car.CarControl.new_message()
-  CI, CP = get_car(logcan, sendcan)
+  CI, CP = get_car(logcan, pm.sock['sendcan'])
+  # controlsd is driven by can, a missing packet shows up as a can error after 100ms. The mock car
+  # has no can and keeps time in its update, waiting for can would slow it down to 10Hz
+  logcan.setsockopt(zmq.RCVTIMEO, 100)
+  wait_for_can = CP.carName != 'mock'
   AM = AlertManager()
 
   car_recognized = CP.carName != 'mock'
@@ -469,7 +471,7 @@ def controlsd_thread(gctx=None):
 
     # Sample data and compute car events
     CS, events, cal_status, cal_perc, overtemp, free_space, low_battery, mismatch_counter =\
-      data_sample(CI, CC, sm, cal_status, cal_perc, overtemp, free_space, low_battery,
+      data_sample(CI, CC, sm, logcan, wait_for_can, cal_status, cal_perc, overtemp, free_space, low_battery,
                   driver_status, state, mismatch_counter, params)
     prof.checkpoint("Sample")
 
@@ -507,8 +509,8 @@ def controlsd_thread(gctx=None):
     prof.checkpoint("State Control")
 
     # Publish data
-    CC, events_prev = data_send(sm, CS, CI, CP, VM, state, events, actuators, v_cruise_kph, rk, carstate, carcontrol, carevents, carparams,
-                   controlsstate, sendcan, AM, driver_status, LaC, LoC, read_only, start_time, v_acc, a_acc, lac_log, events_prev)
+    CC, events_prev = data_send(sm, pm, CS, CI, CP, VM, state, events, actuators, v_cruise_kph, rk,
+                                AM, driver_status, LaC, LoC, read_only, start_time, v_acc, a_acc, lac_log, events_prev)
     prof.checkpoint("Sent")
 
     rk.monitor_time()
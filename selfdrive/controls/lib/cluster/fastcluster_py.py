@@ -2,10 +2,11 @@ import os
 import numpy as np
 
 from cffi import FFI
-import subprocess
+
+from common.build_manifest import ensure_built
 
 cluster_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)))
-subprocess.check_call(["make", "-j4"], cwd=cluster_dir)
+ensure_built(cluster_dir, ["libfastcluster.so"], ["Makefile", "*.cpp", "*.h"])
 
 cluster_fn = os.path.join(cluster_dir, "libfastcluster.so")
 
@@ -3,7 +3,6 @@ import math
 import numpy as np
 
 from common.realtime import sec_since_boot
-from selfdrive.services import service_list
 from selfdrive.swaglog import cloudlog
 from selfdrive.controls.lib.lateral_mpc import libmpc_py
 from selfdrive.controls.lib.drive_helpers import MPC_COST_LAT
@@ -28,8 +27,8 @@ class PathPlanner(object):
 
     self.last_cloudlog_t = 0
 
-    self.plan = messaging.pub_sock(service_list['pathPlan'].port)
-    self.livempc = messaging.pub_sock(service_list['liveMpc'].port)
+    self.plan = messaging.pub_sock('pathPlan')
+    self.livempc = messaging.pub_sock('liveMpc')
 
     self.setup_mpc(CP.steerRateCost)
     self.solution_invalid_cnt = 0
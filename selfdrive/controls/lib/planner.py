@@ -10,7 +10,6 @@ from cereal import car
 from common.realtime import sec_since_boot, DT_PLAN
 from selfdrive.swaglog import cloudlog
 from selfdrive.config import Conversions as CV
-from selfdrive.services import service_list
 from selfdrive.controls.lib.speed_smoother import speed_smoother
 from selfdrive.controls.lib.longcontrol import LongCtrlState, MIN_CAN_SPEED
 from selfdrive.controls.lib.fcw import FCWChecker
@@ -67,8 +66,8 @@ class Planner(object):
     self.CP = CP
     self.poller = zmq.Poller()
 
-    self.plan = messaging.pub_sock(service_list['plan'].port)
-    self.live_longitudinal_mpc = messaging.pub_sock(service_list['liveLongitudinalMpc'].port)
+    self.plan = messaging.pub_sock('plan')
+    self.live_longitudinal_mpc = messaging.pub_sock('liveLongitudinalMpc')
 
     self.mpc1 = LongitudinalMpc(1, self.live_longitudinal_mpc)
     self.mpc2 = LongitudinalMpc(2, self.live_longitudinal_mpc)
@@ -1,7 +1,8 @@
 import numpy as np
 
 from common.numpy_fast import clip, interp
-from common.kalman.simple_kalman import KF1D
+from common.kalman.simple_kalman import KF1DBank
+from selfdrive.controls.lib.cluster.fastcluster_py import cluster_points_centroid
 
 _LEAD_ACCEL_TAU = 1.5
 NO_FUSION_SCORE = 100 # bad default fusion score
@@ -32,164 +33,332 @@ _VLEAD_K = [[ 0.1988689 ], [ 0.28555364]]
 
 RDR_TO_LDR = 2.7
 
+# path samples skipped by the first pass of path_distance, 1m on radard's 0.1m path
+PATH_COARSE_STEP = 10
+# below this many points the search over every path sample is cheaper
+PATH_BRUTE_FORCE_POINTS = 12
+
+# max centroid distance of tracks in a cluster, in get_keys_for_cluster units
+CLUSTER_DIST = 2.5
+# tracks that moved less than this since they were assigned keep their cluster
+CLUSTER_MOVE_THR = 1.0
+# cycles between two clusterings of all tracks, so cluster membership can't drift
+CLUSTER_FULL_INTERVAL = 20
+# track fields that are averaged over a cluster
+CLUSTER_MEAN_FIELDS = ['dRel', 'yRel', 'vRel', 'aRel', 'vLead', 'dPath', 'vLat', 'vLeadK', 'aLeadK', 'aLeadTau']
+
+
+def match_ids(prev_ids, ids):
+  """Returns the index in prev_ids of every id and a mask of the ids that are in prev_ids."""
+  if len(prev_ids) == 0:
+    return np.zeros(len(ids), dtype=np.int64), np.zeros(len(ids), dtype=np.bool_)
+  sorter = np.argsort(prev_ids)
+  pos = np.minimum(np.searchsorted(prev_ids, ids, sorter=sorter), len(prev_ids) - 1)
+  prev = sorter[pos]
+  return prev, prev_ids[prev] == ids
+
+
+class Tracks(object):
+  """Every radar track of the current cycle, stored as one array per field.
+
+  Tracks are matched to the previous cycle by id, so all of them are updated in a single pass no
+  matter how many points the radar reports.
+  """
+  FIELDS = [('dRel', np.float64), ('yRel', np.float64), ('vRel', np.float64), ('measured', np.bool_),
+            ('dPath', np.float64), ('vLead', np.float64), ('aRel', np.float64), ('vLat', np.float64),
+            ('vLeadK', np.float64), ('aLeadK', np.float64), ('aLeadTau', np.float64),
+            ('cnt', np.int64), ('vision_cnt', np.int64), ('vision', np.bool_),
+            ('stationary', np.bool_), ('oncoming', np.bool_), ('vision_score', np.float64)]
 
-class Track(object):
   def __init__(self):
-    self.ekf = None
-    self.stationary = True
-    self.initted = False
-
-  def update(self, d_rel, y_rel, v_rel, d_path, v_ego_t_aligned, measured, steer_override):
-    if self.initted:
-      # pylint: disable=access-member-before-definition
-      self.dPathPrev = self.dPath
-      self.vLeadPrev = self.vLead
-      self.vRelPrev = self.vRel
-
-    # relative values, copy
-    self.dRel = d_rel   # LONG_DIST
-    self.yRel = y_rel   # -LAT_DIST
-    self.vRel = v_rel   # REL_SPEED
-    self.measured = measured   # measured or estimate
-
-    # compute distance to path
+    self.ids = np.zeros(0, dtype=np.int64)
+    for name, dtype in self.FIELDS:
+      setattr(self, name, np.zeros(0, dtype=dtype))
+    self.kf = KF1DBank(_VLEAD_A, _VLEAD_C, _VLEAD_K)
+
+  def __len__(self):
+    return len(self.ids)
+
+  def update(self, ids, pts, d_path, v_ego_t_aligned, steer_override):
+    """Replaces the tracks by the ids seen this cycle, pts holds d_rel, y_rel, v_rel and measured
+    of every id and d_path its signed distance to the path. Ids that aren't seen anymore are dropped."""
+    ids = np.asarray(ids, dtype=np.int64)
+    prev, known = match_ids(self.ids, ids)
+    new = ~known
+    old = prev[known]
+
+    # carry over the state of known tracks, new ones start from their defaults
+    for name, dtype in self.FIELDS:
+      arr = np.zeros(len(ids), dtype=dtype)
+      arr[known] = getattr(self, name)[old]
+      setattr(self, name, arr)
+    d_path_prev = self.dPath[known]
+    v_rel_prev = self.vRel[known]
+
+    self.kf.remove(np.setdiff1d(self.ids, ids))
+    self.ids = ids
+    self.dRel = pts[:, 0]   # LONG_DIST
+    self.yRel = pts[:, 1]   # -LAT_DIST
+    self.vRel = pts[:, 2]   # REL_SPEED
+    self.measured = pts[:, 3].astype(np.bool_)   # measured or estimate
     self.dPath = d_path
 
     # computed velocity and accelerations
     self.vLead = self.vRel + v_ego_t_aligned
 
-    if not self.initted:
-      self.initted = True
-      self.aLeadTau = _LEAD_ACCEL_TAU
-      self.cnt = 1
-      self.vision_cnt = 0
-      self.vision = False
-      self.aRel = 0.      # nidec gives no information about this
-      self.vLat = 0.
-      self.kf = KF1D([[self.vLead], [0.0]], _VLEAD_A, _VLEAD_C, _VLEAD_K)
-    else:
-      # estimate acceleration
-      # TODO: use Kalman filter
-      a_rel_unfilt = (self.vRel - self.vRelPrev) / ts
-      a_rel_unfilt = clip(a_rel_unfilt, -10., 10.)
-      self.aRel = k_a_lead * a_rel_unfilt + (1 - k_a_lead) * self.aRel
+    self.aLeadTau[new] = _LEAD_ACCEL_TAU
+    self.cnt[new] = 1
+    self.stationary[new] = True
+    self.kf.add(ids[new], np.column_stack([self.vLead[new], np.zeros(np.count_nonzero(new))]))
 
-      # TODO: use Kalman filter
-      # neglect steer override cases as dPath is too noisy
-      v_lat_unfilt = 0. if steer_override else (self.dPath - self.dPathPrev) / ts
-      self.vLat = k_v_lat * v_lat_unfilt + (1 - k_v_lat) * self.vLat
+    # estimate acceleration
+    # TODO: use Kalman filter
+    a_rel_unfilt = np.clip((self.vRel[known] - v_rel_prev) / ts, -10., 10.)
+    self.aRel[known] = k_a_lead * a_rel_unfilt + (1 - k_a_lead) * self.aRel[known]
 
-      self.kf.update(self.vLead)
+    # TODO: use Kalman filter
+    # neglect steer override cases as dPath is too noisy
+    v_lat_unfilt = 0. if steer_override else (self.dPath[known] - d_path_prev) / ts
+    self.vLat[known] = k_v_lat * v_lat_unfilt + (1 - k_v_lat) * self.vLat[known]
 
-      self.cnt += 1
+    self.kf.update(self.vLead[known], ids[known])
+    self.cnt[known] += 1
 
-    self.vLeadK = float(self.kf.x[SPEED][0])
-    self.aLeadK = float(self.kf.x[ACCEL][0])
+    kf_x = self.kf.x[self.kf.index(ids)]
+    self.vLeadK = kf_x[:, SPEED].copy()
+    self.aLeadK = kf_x[:, ACCEL].copy()
 
-    if self.stationary:
-      # stationary objects can become non stationary, but not the other way around
-      self.stationary = v_ego_t_aligned > v_ego_stationary and abs(self.vLead) < v_stationary_thr
+    # stationary objects can become non stationary, but not the other way around
+    self.stationary &= (v_ego_t_aligned > v_ego_stationary) & (np.abs(self.vLead) < v_stationary_thr)
     self.oncoming = self.vLead < v_oncoming_thr
 
-    self.vision_score = NO_FUSION_SCORE
+    self.vision_score[:] = NO_FUSION_SCORE
 
     # Learn if constant acceleration
-    if abs(self.aLeadK) < 0.5:
-      self.aLeadTau = _LEAD_ACCEL_TAU
-    else:
-      self.aLeadTau *= 0.9
+    self.aLeadTau = np.where(np.abs(self.aLeadK) < 0.5, _LEAD_ACCEL_TAU, self.aLeadTau * 0.9)
 
-  def update_vision_score(self, dist_to_vision, rel_speed_diff):
+  def update_vision(self, d_rel, y_rel, v_rel):
+    """Scores every track against the vision point and fuses the best one."""
+    dist_to_vision = np.sqrt((0.5 * (d_rel - self.dRel)) ** 2 + (2 * (y_rel - self.yRel)) ** 2)
+    rel_speed_diff = np.abs(v_rel - self.vRel)
     # rel speed is very hard to estimate from vision
-    if dist_to_vision < 4.0 and rel_speed_diff < 10.:
-      self.vision_score = dist_to_vision + rel_speed_diff
-    else:
-      self.vision_score = NO_FUSION_SCORE
+    self.vision_score = np.where((dist_to_vision < 4.0) & (rel_speed_diff < 10.),
+                                 dist_to_vision + rel_speed_diff, NO_FUSION_SCORE)
+
+    if len(self.ids) == 0 or self.vision_score.min() >= NO_FUSION_SCORE:
+      return
+    fused = np.argmin(self.vision_score)
+    self.vision_cnt[fused] += 1
 
-  def update_vision_fusion(self):
     # vision point is never stationary
     # don't trust 1 or 2 fusions until model quality is much better
-    if self.vision_cnt >= 3:
-      self.vision = True
-      self.stationary = False
+    if self.vision_cnt[fused] >= 3:
+      self.vision[fused] = True
+      self.stationary[fused] = False
 
-  def get_key_for_cluster(self):
+  def get_keys_for_cluster(self):
     # Weigh y higher since radar is inaccurate in this dimension
-    return [self.dRel, self.yRel*2, self.vRel]
-
-
-def mean(l):
-  return sum(l) / len(l)
+    return np.column_stack([self.dRel, self.yRel * 2, self.vRel])
+
+
+def path_distance(path_x, path_y, d_rel, y_rel, coarse_step=PATH_COARSE_STEP):
+  """Distance of every point to the closest path sample, signed by the side of the path it's on.
+
+  With more than a handful of points the closest sample is first searched among samples spaced
+  coarse_step samples apart along the path and then refined among the samples around it.
+  """
+  d_rel = d_rel[:, None]
+  y_rel = y_rel[:, None]
+  if len(d_rel) <= PATH_BRUTE_FORCE_POINTS:
+    d_path = np.sqrt(np.amin((path_x - d_rel) ** 2 + (path_y - y_rel) ** 2, axis=1))
+    return d_path * np.sign(y_rel[:, 0] - np.interp(d_rel[:, 0], path_x, path_y))
+
+  # coarse samples evenly spaced along the path, steep parts get more of them. The manhattan length
+  # is cheaper than the arc length and keeps the coarse samples at most one coarse step apart.
+  path_len = path_x - path_x[0] + np.concatenate([[0.], np.cumsum(np.abs(np.diff(path_y)))])
+  coarse_idxs = np.searchsorted(path_len, np.arange(0., path_len[-1], coarse_step * (path_x[1] - path_x[0])))
+  coarse_idxs = coarse_idxs[np.concatenate([[True], coarse_idxs[1:] != coarse_idxs[:-1]])]
+  coarse = coarse_idxs[np.argmin((path_x[coarse_idxs] - d_rel) ** 2 + (path_y[coarse_idxs] - y_rel) ** 2, axis=1)]
+
+  window = np.arange(-coarse_step, coarse_step + 1)
+  idxs = np.clip(coarse[:, None] + window, 0, len(path_x) - 1)
+  d_path = np.sqrt(np.amin((path_x[idxs] - d_rel) ** 2 + (path_y[idxs] - y_rel) ** 2, axis=1))
+  return d_path * np.sign(y_rel[:, 0] - np.interp(d_rel[:, 0], path_x, path_y))
+
+
+class TrackClusters(object):
+  """Clusters the tracks of every cycle.
+
+  In incremental mode the cluster of every track is kept between cycles, only new tracks and
+  tracks that moved more than move_thr since they were assigned are looked at again. They join
+  the closest cluster if its centroid is within dist, the rest are clustered among themselves.
+  All tracks are clustered from scratch every full_interval cycles, or when most of them moved.
+  Clustering a few dozen tracks from scratch only takes a few us, so this only pays off with a
+  lot more tracks than today's radars report.
+  """
+  def __init__(self, incremental=False, dist=CLUSTER_DIST, move_thr=CLUSTER_MOVE_THR, full_interval=CLUSTER_FULL_INTERVAL):
+    self.incremental = incremental
+    self.dist = dist
+    self.move_thr = move_thr
+    self.full_interval = full_interval
+    self.frame = 0
+    self.ids = np.zeros(0, dtype=np.int64)
+    self.labels = np.zeros(0, dtype=np.int64)
+    # key of every track when it got its label
+    self.keys = np.zeros((0, 3))
+
+  def _cluster(self, keys):
+    if len(keys) == 1:
+      return np.zeros(1, dtype=np.int64)
+    return np.asarray(cluster_points_centroid(keys, self.dist), dtype=np.int64)
+
+  def _assign(self, keys, prev, known):
+    """Labels the tracks from the previous labels, None if they all need to be clustered again."""
+    moved = ~known
+    moved[known] = np.linalg.norm(keys[known] - self.keys[prev[known]], axis=1) > self.move_thr
+    if 2 * np.count_nonzero(moved) > len(keys):
+      return None
+
+    stable = ~moved
+    labels = np.full(len(keys), -1, dtype=np.int64)
+    labels[stable] = self.labels[prev[stable]]
+    ref_keys = keys.copy()
+    ref_keys[stable] = self.keys[prev[stable]]
+    if not moved.any():
+      return labels, ref_keys
+
+    rest = np.flatnonzero(moved)
+    if stable.any():
+      cluster_labels, inverse = np.unique(labels[stable], return_inverse=True)
+      centroids = np.array([np.bincount(inverse, weights=keys[stable, i]) for i in range(keys.shape[1])]).T
+      centroids /= np.bincount(inverse)[:, None]
+
+      dists = np.linalg.norm(keys[rest, None] - centroids[None], axis=2)
+      closest = np.argmin(dists, axis=1)
+      joins = dists[np.arange(len(rest)), closest] <= self.dist
+      labels[rest[joins]] = cluster_labels[closest[joins]]
+      rest = rest[~joins]
+
+    if len(rest):
+      labels[rest] = self._cluster(keys[rest]) + labels.max() + 1
+    return labels, ref_keys
+
+  def update(self, tracks):
+    """Returns the clusters of this cycle's tracks."""
+    keys = tracks.get_keys_for_cluster()
+    assigned = None
+    if self.incremental and self.frame % self.full_interval != 0 and len(keys):
+      assigned = self._assign(keys, *match_ids(self.ids, tracks.ids))
+    self.frame += 1
+
+    if assigned is None:
+      labels = self._cluster(keys) if len(keys) else np.zeros(0, dtype=np.int64)
+      ref_keys = keys
+    else:
+      labels, ref_keys = assigned
+
+    self.ids = tracks.ids
+    self.labels = labels
+    self.keys = ref_keys
+    return make_clusters(tracks, labels)
+
+
+def make_clusters(tracks, labels):
+  """Returns a Cluster for every distinct label, the stats of all of them are computed at once."""
+  if not len(labels):
+    # nothing to reduce over, e.g. a sweep without points
+    return []
+  # one row of members per cluster
+  members = labels == np.unique(labels)[:, None]
+  counts = members.sum(axis=1).tolist()
+
+  fields = CLUSTER_MEAN_FIELDS + ['vision', 'measured', 'stationary', 'oncoming']
+  sums = np.array([getattr(tracks, name) for name in fields]).dot(members.T).tolist()
+  stats = dict(zip(fields, sums))
+  for name in CLUSTER_MEAN_FIELDS:
+    stats[name] = [s / c for s, c in zip(stats[name], counts)]
+  # true if any track is
+  for name in ('vision', 'measured'):
+    stats[name] = [s > 0 for s in stats[name]]
+  # true if all tracks are
+  for name in ('stationary', 'oncoming'):
+    stats[name] = [s == c for s, c in zip(stats[name], counts)]
+  stats['vision_cnt'] = np.where(members, tracks.vision_cnt, 0).max(axis=1).tolist()
+
+  return [Cluster(stats, i, members) for i in range(len(counts))]
 
 
 class Cluster(object):
-  def __init__(self):
-    self.tracks = set()
+  def __init__(self, stats, i, members):
+    self.stats = stats
+    self.i = i
+    self.members = members
 
-  def add(self, t):
-    # add the first track
-    self.tracks.add(t)
+  @property
+  def idxs(self):
+    # indices of the tracks in the cluster
+    return np.flatnonzero(self.members[self.i])
 
   # TODO: make generic
   @property
   def dRel(self):
-    return mean([t.dRel for t in self.tracks])
+    return self.stats['dRel'][self.i]
 
   @property
   def yRel(self):
-    return mean([t.yRel for t in self.tracks])
+    return self.stats['yRel'][self.i]
 
   @property
   def vRel(self):
-    return mean([t.vRel for t in self.tracks])
+    return self.stats['vRel'][self.i]
 
   @property
   def aRel(self):
-    return mean([t.aRel for t in self.tracks])
+    return self.stats['aRel'][self.i]
 
   @property
   def vLead(self):
-    return mean([t.vLead for t in self.tracks])
+    return self.stats['vLead'][self.i]
 
   @property
   def dPath(self):
-    return mean([t.dPath for t in self.tracks])
+    return self.stats['dPath'][self.i]
 
   @property
   def vLat(self):
-    return mean([t.vLat for t in self.tracks])
+    return self.stats['vLat'][self.i]
 
   @property
   def vLeadK(self):
-    return mean([t.vLeadK for t in self.tracks])
+    return self.stats['vLeadK'][self.i]
 
   @property
   def aLeadK(self):
-    return mean([t.aLeadK for t in self.tracks])
+    return self.stats['aLeadK'][self.i]
 
   @property
   def aLeadTau(self):
-    return mean([t.aLeadTau for t in self.tracks])
+    return self.stats['aLeadTau'][self.i]
 
   @property
   def vision(self):
-    return any([t.vision for t in self.tracks])
+    return self.stats['vision'][self.i]
 
   @property
   def measured(self):
-    return any([t.measured for t in self.tracks])
+    return self.stats['measured'][self.i]
 
   @property
   def vision_cnt(self):
-    return max([t.vision_cnt for t in self.tracks])
+    return self.stats['vision_cnt'][self.i]
 
   @property
   def stationary(self):
-    return all([t.stationary for t in self.tracks])
+    return self.stats['stationary'][self.i]
 
   @property
   def oncoming(self):
-    return all([t.oncoming for t in self.tracks])
+    return self.stats['oncoming'][self.i]
 
   def toRadarState(self):
     return {
@@ -31,7 +31,7 @@ def plannerd_thread():
 
   VM = VehicleModel(CP)
 
-  sm = messaging.SubMaster(['carState', 'controlsState', 'radarState', 'model', 'liveParameters'])
+  sm = messaging.SubMaster(['carState', 'controlsState', 'radarState', 'model', 'liveParameters'], zero_copy=True, lazy=True)
 
   sm['liveParameters'].valid = True
   sm['liveParameters'].sensorValid = True
@@ -41,7 +41,8 @@ def plannerd_thread():
   live_map_data.init('liveMapData')
 
   while True:
-    sm.update()
+    # plan when model or radar data comes in, carState and controlsState are just picked up
+    sm.update(wait_for=['model', 'radarState'])
 
     if sm.updated['model']:
       PP.update(sm, CP, VM)
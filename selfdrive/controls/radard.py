@@ -1,23 +1,19 @@
 #!/usr/bin/env python
 import numpy as np
-import numpy.matlib
 import importlib
-from collections import defaultdict, deque
+from collections import deque
 
 import selfdrive.messaging as messaging
-from selfdrive.services import service_list
 from selfdrive.controls.lib.latcontrol_helpers import calc_lookahead_offset
 from selfdrive.controls.lib.model_parser import ModelParser
-from selfdrive.controls.lib.radar_helpers import Track, Cluster, \
-                                                 RDR_TO_LDR, NO_FUSION_SCORE
-
-from selfdrive.controls.lib.cluster.fastcluster_py import cluster_points_centroid
+from selfdrive.controls.lib.radar_helpers import Tracks, TrackClusters, path_distance, RDR_TO_LDR
 from selfdrive.controls.lib.vehicle_model import VehicleModel
+from selfdrive.car.radar_interface_base import TRACK_ID, D_REL, MEASURED
 from selfdrive.swaglog import cloudlog
 from cereal import car
 from common.params import Params
 from common.realtime import set_realtime_priority, Ratekeeper, DT_MDL
-from common.kalman.ekf import EKF, SimpleSensor
+from common.kalman.ekf import InPlaceEKF, SimpleSensor
 
 DEBUG = False
 
@@ -27,21 +23,49 @@ XV, SPEEDV = 0, 1
 VISION_POINT = -1
 
 
-class EKFV1D(EKF):
+class EKFV1D(InPlaceEKF):
   def __init__(self):
-    super(EKFV1D, self).__init__(False)
-    self.identity = numpy.matlib.identity(DIMSV)
-    self.state = np.matlib.zeros((DIMSV, 1))
-    self.var_init = 1e2   # ~ model variance when probability is 70%, so good starting point
-    self.covar = self.identity * self.var_init
-
-    self.process_noise = np.matlib.diag([0.5, 1])
+    # var_init ~ model variance when probability is 70%, so good starting point
+    super(EKFV1D, self).__init__(DIMSV, 1e2, [0.5, 1])
+    self.tf = np.identity(DIMSV)
 
   def calc_transfer_fun(self, dt):
-    tf = np.matlib.identity(DIMSV)
-    tf[XV, SPEEDV] = dt
-    tfj = tf
-    return tf, tfj
+    self.tf[XV, SPEEDV] = dt
+    return self.tf, self.tf
+
+
+def update_leads(rr, tracks, track_clusters, path_x, path_y, v_ego, v_ego_t_aligned, steer_override, vision_pt, mocked):
+  """Updates the tracks from a RadarSweep, returns the clusters and the candidates for the first and
+  second lead sorted by distance. Sweeps can be empty, e.g. for cars without a radar."""
+  track_ids = rr.points[:, TRACK_ID].astype(np.int64)
+  pts = rr.points[:, D_REL:MEASURED + 1].copy()
+  pts[:, 0] += RDR_TO_LDR
+
+  # *** compute the tracks, points that are gone drop their track ***
+  # ignore standalone vision point, unless we are mocking the radar
+  if mocked and vision_pt is not None:
+    track_ids = np.append(track_ids, VISION_POINT)
+    pts = np.vstack([pts, vision_pt])
+
+  d_path = path_distance(path_x, path_y, pts[:, 0], pts[:, 1])
+  tracks.update(track_ids, pts, d_path, v_ego_t_aligned, steer_override)
+
+  # allow the vision model to remove the stationary flag if distance and rel speed roughly match
+  if vision_pt is not None:
+    tracks.update_vision(*vision_pt[:3])
+
+  clusters = track_clusters.update(tracks)
+
+  # *** extract the lead car ***
+  lead_clusters = [c for c in clusters
+                   if c.is_potential_lead(v_ego)]
+  lead_clusters.sort(key=lambda x: x.dRel)
+
+  # *** extract the second lead from the whole set of leads ***
+  lead2_clusters = [c for c in lead_clusters
+                    if c.is_potential_lead2(lead_clusters)]
+  lead2_clusters.sort(key=lambda x: x.dRel)
+  return clusters, lead_clusters, lead2_clusters
 
 
 ## fuses camera and radar data for best lead detection
@@ -59,7 +83,7 @@ def radard_thread(gctx=None):
   cloudlog.info("radard is importing %s", CP.carName)
   RadarInterface = importlib.import_module('selfdrive.car.%s.radar_interface' % CP.carName).RadarInterface
 
-  sm = messaging.SubMaster(['model', 'controlsState', 'liveParameters'])
+  sm = messaging.SubMaster(['model', 'controlsState', 'liveParameters'], zero_copy=True, lazy=True)
 
   # Default parameters
   live_parameters = messaging.new_message()
@@ -70,13 +94,15 @@ def radard_thread(gctx=None):
 
   MP = ModelParser()
   RI = RadarInterface(CP)
+  # the radar parser is fed from radard's can socket, cars without one don't need can
+  can_sock = messaging.sub_sock('can') if RI.rcp is not None else None
 
   last_md_ts = 0
   last_controls_state_ts = 0
 
   # *** publish radarState and liveTracks
-  radarState = messaging.pub_sock(service_list['radarState'].port)
-  liveTracks = messaging.pub_sock(service_list['liveTracks'].port)
+  radarState = messaging.pub_sock('radarState')
+  liveTracks = messaging.pub_sock('liveTracks')
 
   path_x = np.arange(0.0, 140.0, 0.1)    # 140 meters is max
 
@@ -88,7 +114,8 @@ def radard_thread(gctx=None):
   steer_angle = 0.
   steer_override = False
 
-  tracks = defaultdict(dict)
+  tracks = Tracks()
+  track_clusters = TrackClusters()
 
   # Kalman filter stuff:
   ekfv = EKFV1D()
@@ -102,11 +129,10 @@ def radard_thread(gctx=None):
 
   rk = Ratekeeper(rate, print_delay_threshold=None)
   while 1:
-    rr = RI.update()
-
-    ar_pts = {}
-    for pt in rr.points:
-      ar_pts[pt.trackId] = [pt.dRel + RDR_TO_LDR, pt.yRel, pt.vRel, pt.measured]
+    can_strings = messaging.drain_sock_raw(can_sock, wait_for_one=True) if can_sock is not None else []
+    rr = RI.update(can_strings)
+    if rr is None:
+      continue
 
     sm.update(0)
 
@@ -130,27 +156,25 @@ def radard_thread(gctx=None):
 
 
     # run kalman filter only if prob is high enough
+    vision_pt = None
     if MP.lead_prob > 0.7:
-      reading = speedSensorV.read(MP.lead_dist, covar=np.matrix(MP.lead_var))
+      reading = speedSensorV.read(MP.lead_dist, covar=MP.lead_var)
       ekfv.update_scalar(reading)
       ekfv.predict(DT_MDL)
 
       # When changing lanes the distance to the lead car can suddenly change,
       # which makes the Kalman filter output large relative acceleration
-      if mocked and abs(MP.lead_dist - ekfv.state[XV]) > 2.0:
-        ekfv.state[XV] = MP.lead_dist
-        ekfv.covar = (np.diag([MP.lead_var, ekfv.var_init]))
-        ekfv.state[SPEEDV] = 0.
+      if mocked and abs(MP.lead_dist - ekfv.state[XV, 0]) > 2.0:
+        ekfv.state[XV, 0] = MP.lead_dist
+        ekfv.covar[:] = np.diag([MP.lead_var, ekfv.var_init])
+        ekfv.state[SPEEDV, 0] = 0.
 
-      ar_pts[VISION_POINT] = (float(ekfv.state[XV]), np.polyval(MP.d_poly, float(ekfv.state[XV])),
-                              float(ekfv.state[SPEEDV]), False)
+      vision_pt = (float(ekfv.state[XV, 0]), np.polyval(MP.d_poly, float(ekfv.state[XV, 0])),
+                   float(ekfv.state[SPEEDV, 0]), False)
     else:
-      ekfv.state[XV] = MP.lead_dist
-      ekfv.covar = (np.diag([MP.lead_var, ekfv.var_init]))
-      ekfv.state[SPEEDV] = 0.
-
-      if VISION_POINT in ar_pts:
-        del ar_pts[VISION_POINT]
+      ekfv.state[XV, 0] = MP.lead_dist
+      ekfv.covar[:] = np.diag([MP.lead_var, ekfv.var_init])
+      ekfv.state[SPEEDV, 0] = 0.
 
     # *** compute the likely path_y ***
     if (active and not steer_override) or mocked:
@@ -160,87 +184,23 @@ def radard_thread(gctx=None):
       # use path from steer, set angle_offset to 0 it does not only report the physical offset
       path_y = calc_lookahead_offset(v_ego, steer_angle, path_x, VM, angle_offset=live_parameters.liveParameters.angleOffsetAverage)[0]
 
-    # *** remove missing points from meta data ***
-    for ids in tracks.keys():
-      if ids not in ar_pts:
-        tracks.pop(ids, None)
-
-    # *** compute the tracks ***
-    for ids in ar_pts:
-      # ignore standalone vision point, unless we are mocking the radar
-      if ids == VISION_POINT and not mocked:
-        continue
-      rpt = ar_pts[ids]
-
-      # align v_ego by a fixed time to align it with the radar measurement
-      cur_time = float(rk.frame)/rate
-      v_ego_t_aligned = np.interp(cur_time - RI.delay, v_ego_hist_t, v_ego_hist_v)
-
-      d_path = np.sqrt(np.amin((path_x - rpt[0]) ** 2 + (path_y - rpt[1]) ** 2))
-      # add sign
-      d_path *= np.sign(rpt[1] - np.interp(rpt[0], path_x, path_y))
-
-      # create the track if it doesn't exist or it's a new track
-      if ids not in tracks:
-        tracks[ids] = Track()
-      tracks[ids].update(rpt[0], rpt[1], rpt[2], d_path, v_ego_t_aligned, rpt[3], steer_override)
-
-    # allow the vision model to remove the stationary flag if distance and rel speed roughly match
-    if VISION_POINT in ar_pts:
-      fused_id = None
-      best_score = NO_FUSION_SCORE
-      for ids in tracks:
-        dist_to_vision = np.sqrt((0.5*(ar_pts[VISION_POINT][0] - tracks[ids].dRel)) ** 2 + (2*(ar_pts[VISION_POINT][1] - tracks[ids].yRel)) ** 2)
-        rel_speed_diff = abs(ar_pts[VISION_POINT][2] - tracks[ids].vRel)
-        tracks[ids].update_vision_score(dist_to_vision, rel_speed_diff)
-        if best_score > tracks[ids].vision_score:
-          fused_id = ids
-          best_score = tracks[ids].vision_score
-
-      if fused_id is not None:
-        tracks[fused_id].vision_cnt += 1
-        tracks[fused_id].update_vision_fusion()
+    # align v_ego by a fixed time to align it with the radar measurement
+    cur_time = float(rk.frame)/rate
+    v_ego_t_aligned = np.interp(cur_time - RI.delay, v_ego_hist_t, v_ego_hist_v)
 
     if DEBUG:
       print("NEW CYCLE")
-      if VISION_POINT in ar_pts:
-        print("vision", ar_pts[VISION_POINT])
-
-    idens = list(tracks.keys())
-    track_pts = np.array([tracks[iden].get_key_for_cluster() for iden in idens])
-
-    # If we have multiple points, cluster them
-    if len(track_pts) > 1:
-      cluster_idxs = cluster_points_centroid(track_pts, 2.5)
-      clusters = [None] * (max(cluster_idxs) + 1)
-
-      for idx in xrange(len(track_pts)):
-        cluster_i = cluster_idxs[idx]
-        if clusters[cluster_i] is None:
-          clusters[cluster_i] = Cluster()
-        clusters[cluster_i].add(tracks[idens[idx]])
-
-    elif len(track_pts) == 1:
-      # TODO: why do we need this?
-      clusters = [Cluster()]
-      clusters[0].add(tracks[idens[0]])
-    else:
-      clusters = []
+      if vision_pt is not None:
+        print("vision", vision_pt)
+
+    clusters, lead_clusters, lead2_clusters = update_leads(rr, tracks, track_clusters, path_x, path_y, v_ego,
+                                                           v_ego_t_aligned, steer_override, vision_pt, mocked)
+    lead_len = len(lead_clusters)
+    lead2_len = len(lead2_clusters)
 
     if DEBUG:
       for i in clusters:
         print(i)
-    # *** extract the lead car ***
-    lead_clusters = [c for c in clusters
-                     if c.is_potential_lead(v_ego)]
-    lead_clusters.sort(key=lambda x: x.dRel)
-    lead_len = len(lead_clusters)
-
-    # *** extract the second lead from the whole set of leads ***
-    lead2_clusters = [c for c in lead_clusters
-                      if c.is_potential_lead2(lead_clusters)]
-    lead2_clusters.sort(key=lambda x: x.dRel)
-    lead2_len = len(lead2_clusters)
 
     # *** publish radarState ***
     dat = messaging.new_message()
@@ -266,23 +226,23 @@ def radard_thread(gctx=None):
     dat = messaging.new_message()
     dat.init('liveTracks', len(tracks))
 
-    for cnt, ids in enumerate(tracks.keys()):
+    for cnt, ids in enumerate(tracks.ids):
       if DEBUG:
         print("id: %4.0f x:  %4.1f  y: %4.1f  vr: %4.1f d: %4.1f  va: %4.1f  vl: %4.1f  vlk: %4.1f alk: %4.1f  s: %1.0f  v: %1.0f" % \
-          (ids, tracks[ids].dRel, tracks[ids].yRel, tracks[ids].vRel,
-           tracks[ids].dPath, tracks[ids].vLat,
-           tracks[ids].vLead, tracks[ids].vLeadK,
-           tracks[ids].aLeadK,
-           tracks[ids].stationary,
-           tracks[ids].measured))
+          (ids, tracks.dRel[cnt], tracks.yRel[cnt], tracks.vRel[cnt],
+           tracks.dPath[cnt], tracks.vLat[cnt],
+           tracks.vLead[cnt], tracks.vLeadK[cnt],
+           tracks.aLeadK[cnt],
+           tracks.stationary[cnt],
+           tracks.measured[cnt]))
       dat.liveTracks[cnt] = {
-        "trackId": ids,
-        "dRel": float(tracks[ids].dRel),
-        "yRel": float(tracks[ids].yRel),
-        "vRel": float(tracks[ids].vRel),
-        "aRel": float(tracks[ids].aRel),
-        "stationary": bool(tracks[ids].stationary),
-        "oncoming": bool(tracks[ids].oncoming),
+        "trackId": int(ids),
+        "dRel": float(tracks.dRel[cnt]),
+        "yRel": float(tracks.yRel[cnt]),
+        "vRel": float(tracks.vRel[cnt]),
+        "aRel": float(tracks.aRel[cnt]),
+        "stationary": bool(tracks.stationary[cnt]),
+        "oncoming": bool(tracks.oncoming[cnt]),
       }
     liveTracks.send(dat.to_bytes())
 
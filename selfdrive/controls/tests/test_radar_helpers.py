@@ -0,0 +1,93 @@
+import unittest
+import numpy as np
+
+from common.kalman.simple_kalman_old import KF1D
+from selfdrive.controls.lib.radar_helpers import Tracks, TrackClusters, make_clusters, path_distance, \
+                                                 _VLEAD_A, _VLEAD_C, _VLEAD_K, NO_FUSION_SCORE
+
+
+def make_pts(d_rel, y_rel, v_rel):
+  return np.column_stack([d_rel, y_rel, v_rel, np.ones(len(d_rel))])
+
+
+class TestTracks(unittest.TestCase):
+  def test_match_by_id(self):
+    tracks = Tracks()
+    tracks.update([3, 7], make_pts([10., 20.], [0., 1.], [-1., -2.]), np.zeros(2), 10., False)
+    tracks.update([7, 5], make_pts([21., 30.], [1., 2.], [-2.5, 0.]), np.zeros(2), 10., False)
+
+    np.testing.assert_array_equal(tracks.ids, [7, 5])
+    np.testing.assert_array_equal(tracks.cnt, [2, 1])
+    # only the track seen twice has a relative acceleration
+    self.assertLess(tracks.aRel[0], 0.)
+    self.assertEqual(tracks.aRel[1], 0.)
+
+  def test_kalman(self):
+    kf = None
+    tracks = Tracks()
+    for i in range(20):
+      v_rel = -3. + 0.1 * i
+      tracks.update([1], make_pts([50.], [0.], [v_rel]), np.zeros(1), 20., False)
+      if kf is None:
+        kf = KF1D(np.array([[20. + v_rel], [0.]]), np.array(_VLEAD_A), np.array([_VLEAD_C]), np.array(_VLEAD_K))
+      else:
+        kf.update(20. + v_rel)
+      self.assertAlmostEqual(tracks.vLeadK[0], kf.x[0, 0])
+      self.assertAlmostEqual(tracks.aLeadK[0], kf.x[1, 0])
+
+  def test_vision_fusion(self):
+    tracks = Tracks()
+    for _ in range(3):
+      tracks.update([1, 2], make_pts([30., 60.], [0., 3.], [0., 0.]), np.zeros(2), 20., False)
+      tracks.update_vision(31., 0.1, 0.5)
+    np.testing.assert_array_equal(tracks.vision_cnt, [3, 0])
+    np.testing.assert_array_equal(tracks.vision, [True, False])
+    self.assertEqual(tracks.vision_score[1], NO_FUSION_SCORE)
+
+    cluster, = make_clusters(tracks, np.array([0, 0]))
+    self.assertAlmostEqual(cluster.dRel, 45.)
+    self.assertTrue(cluster.vision)
+    self.assertFalse(cluster.stationary)
+
+
+class TestTrackClusters(unittest.TestCase):
+  def test_incremental_matches_full(self):
+    rng = np.random.RandomState(0)
+    # three cars seen as two points each and a lone point, drifting slowly
+    d_rel = np.array([20., 20.8, 45., 45.6, 80., 81., 110.])
+    y_rel = np.array([0., 0.2, -3.5, -3.3, 3., 3.2, 0.])
+    ids = np.arange(len(d_rel))
+    full, incremental = TrackClusters(), TrackClusters(incremental=True)
+    tracks = Tracks()
+    for _ in range(50):
+      d_rel += rng.normal(0., 0.05, len(d_rel))
+      tracks.update(ids, make_pts(d_rel, y_rel, np.zeros(len(d_rel))), np.zeros(len(d_rel)), 10., False)
+      expected = sorted(tuple(c.idxs) for c in full.update(tracks))
+      self.assertEqual(sorted(tuple(c.idxs) for c in incremental.update(tracks)), expected)
+      self.assertEqual(len(expected), 4)
+
+
+class TestPathDistance(unittest.TestCase):
+  def test_matches_per_point(self):
+    path_x = np.arange(0.0, 140.0, 0.1)
+    path_y = 0.002 * path_x ** 2
+    d_rel = np.array([5., 40., 80., 120.])
+    y_rel = np.array([1., -2., 10., 30.])
+    d_path = path_distance(path_x, path_y, d_rel, y_rel)
+    for x, y, d in zip(d_rel, y_rel, d_path):
+      expected = np.sqrt(np.amin((path_x - x) ** 2 + (path_y - y) ** 2)) * np.sign(y - np.interp(x, path_x, path_y))
+      self.assertAlmostEqual(d, expected)
+
+  def test_coarse_to_fine(self):
+    rng = np.random.RandomState(0)
+    path_x = np.arange(0.0, 140.0, 0.1)
+    for curvature in np.linspace(-0.05, 0.05, 21):
+      path_y = path_x * np.tan(np.arcsin(np.clip(path_x * curvature, -0.999, 0.999)) / 2.)
+      d_rel = rng.uniform(0., 150., 64)
+      y_rel = rng.uniform(-20., 20., 64)
+      expected = [path_distance(path_x, path_y, d_rel[i:i+1], y_rel[i:i+1])[0] for i in range(len(d_rel))]
+      np.testing.assert_allclose(path_distance(path_x, path_y, d_rel, y_rel), expected, atol=1e-2)
+
+
+if __name__ == "__main__":
+  unittest.main()
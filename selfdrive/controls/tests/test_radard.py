@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+
+from selfdrive.car.radar_interface_base import RadarSweep, POINT_FIELDS
+from selfdrive.controls.lib.radar_helpers import Tracks, TrackClusters
+from selfdrive.controls.radard import update_leads
+
+
+def empty_sweep():
+  return RadarSweep(np.zeros((0, len(POINT_FIELDS))), [], [])
+
+
+class TestUpdateLeads(unittest.TestCase):
+  def setUp(self):
+    self.path_x = np.arange(0.0, 140.0, 0.1)
+    self.path_y = np.zeros_like(self.path_x)
+
+  def update(self, rr, track_clusters, vision_pt=None, mocked=False):
+    return update_leads(rr, self.tracks, track_clusters, self.path_x, self.path_y, 20., 20., False, vision_pt, mocked)
+
+  def test_empty_sweep(self):
+    # cars without a radar only ever send empty sweeps
+    for incremental in (False, True):
+      self.tracks = Tracks()
+      track_clusters = TrackClusters(incremental=incremental)
+      for _ in range(3):
+        self.assertEqual(self.update(empty_sweep(), track_clusters), ([], [], []))
+      self.assertEqual(len(self.tracks), 0)
+
+  def test_points_gone(self):
+    self.tracks = Tracks()
+    track_clusters = TrackClusters()
+    rr = RadarSweep(np.array([[1., 30., 0., 0., 1.]]), [], [])
+    clusters, leads, _ = self.update(rr, track_clusters)
+    self.assertEqual(len(clusters), 1)
+    self.assertEqual(len(leads), 1)
+    self.assertEqual(self.update(empty_sweep(), track_clusters), ([], [], []))
+
+  def test_mocked_vision_point(self):
+    self.tracks = Tracks()
+    clusters, leads, _ = self.update(empty_sweep(), TrackClusters(), vision_pt=(30., 0., 0., False), mocked=True)
+    self.assertEqual(len(clusters), 1)
+    self.assertEqual(len(leads), 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -33,15 +33,16 @@ if __name__ == "__main__":
 
   for m in args.socket if len(args.socket) > 0 else service_list:
     if m in service_list:
-      port = service_list[m].port
+      service = m
     elif m.isdigit():
-      port = int(m)
+      # ports that aren't in the service list
+      service = int(m)
     else:
       print("service not found")
       sys.exit(-1)
-    sock = messaging.sub_sock(port, poller, addr=args.addr)
+    sock = messaging.sub_sock(service, poller, addr=args.addr)
     if args.proxy:
-      republish_socks[sock] = messaging.pub_sock(port)
+      republish_socks[sock] = messaging.pub_sock(service)
 
   if args.map:
     from flask.ext.socketio import SocketIO  #pylint: disable=no-name-in-module, import-error
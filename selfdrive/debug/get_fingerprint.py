@@ -12,9 +12,8 @@
 #   until all messages are received at least once
 
 import selfdrive.messaging as messaging
-from selfdrive.services import service_list
 
-logcan = messaging.sub_sock(service_list['can'].port)
+logcan = messaging.sub_sock('can')
 msgs = {}
 while True:
   lc = messaging.recv_sock(logcan, True)
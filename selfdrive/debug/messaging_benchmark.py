@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""Compares end-to-end latency and CPU usage of the zmq TCP and shared memory transports.
+
+Every service is published from its own process at its service_list frequency with a real
+message of that type, and received by --subscribers processes. Latency is measured from
+logMonoTime to the moment the subscriber has parsed the event.
+
+  python selfdrive/debug/messaging_benchmark.py --seconds 10 --subscribers 3 can carState controlsState
+"""
+import os
+import time
+import argparse
+import multiprocessing
+
+import zmq
+import numpy as np
+
+import selfdrive.messaging as messaging
+from common.realtime import sec_since_boot
+from selfdrive.services import service_list
+from selfdrive.messaging_shm import ShmPubSock, ShmSubSock, Poller
+
+BENCH_PORT_OFFSET = 50000
+DEFAULT_SERVICES = ['can', 'sendcan', 'carState', 'controlsState', 'carControl']
+
+
+def make_msg(service):
+  dat = messaging.new_message()
+  if service in ('can', 'sendcan'):
+    # typical amount of frames boardd sees in 10ms
+    can = dat.init(service, 60)
+    for i in range(len(can)):
+      can[i].address = 0x100 + i
+      can[i].dat = b"\x00" * 8
+  else:
+    dat.init(service)
+  return dat
+
+
+def make_pub(transport, service):
+  sock = zmq.Context.instance().socket(zmq.PUB)
+  sock.bind("tcp://*:%d" % (BENCH_PORT_OFFSET + service_list[service].port))
+  if transport == "shm":
+    sock = ShmPubSock("bench_" + service, sock)
+  return sock
+
+
+def make_sub(transport, service):
+  if transport == "shm":
+    return ShmSubSock("bench_" + service)
+  sock = zmq.Context.instance().socket(zmq.SUB)
+  sock.connect("tcp://127.0.0.1:%d" % (BENCH_PORT_OFFSET + service_list[service].port))
+  sock.setsockopt(zmq.SUBSCRIBE, b"")
+  return sock
+
+
+def publisher(transport, service, seconds, ready, result):
+  sock = make_pub(transport, service)
+  dat = make_msg(service)
+  ready.wait()
+  # give slow joiners a moment to connect
+  time.sleep(0.5)
+
+  interval = 1. / service_list[service].frequency
+  t0 = time.time()
+  cpu0 = os.times()
+  next_t = sec_since_boot()
+  while time.time() - t0 < seconds:
+    dat.logMonoTime = int(sec_since_boot() * 1e9)
+    sock.send(dat.to_bytes())
+    next_t += interval
+    time.sleep(max(next_t - sec_since_boot(), 0))
+  cpu1 = os.times()
+  result.put(('pub', service, cpu1[0] + cpu1[1] - cpu0[0] - cpu0[1], []))
+
+
+def subscriber(transport, services, seconds, ready, result):
+  poller = Poller()
+  socks = {}
+  for s in services:
+    sock = make_sub(transport, s)
+    poller.register(sock, zmq.POLLIN)
+    socks[sock] = s
+  latencies = {s: [] for s in services}
+  ready.wait()
+
+  t0 = time.time()
+  cpu0 = os.times()
+  while time.time() - t0 < seconds + 1.:
+    for sock, _ in poller.poll(100):
+      msg = messaging.recv_one(sock)
+      latencies[socks[sock]].append(sec_since_boot() * 1e9 - msg.logMonoTime)
+  cpu1 = os.times()
+  cpu = cpu1[0] + cpu1[1] - cpu0[0] - cpu0[1]
+  for s in services:
+    result.put(('sub', s, cpu / len(services), latencies[s]))
+
+
+def run(transport, services, seconds, n_subscribers):
+  ready = multiprocessing.Event()
+  result = multiprocessing.Queue()
+  procs = [multiprocessing.Process(target=publisher, args=(transport, s, seconds, ready, result)) for s in services]
+  procs += [multiprocessing.Process(target=subscriber, args=(transport, services, seconds, ready, result)) for _ in range(n_subscribers)]
+  for p in procs:
+    p.start()
+  time.sleep(0.5)
+  ready.set()
+
+  pub_cpu = dict.fromkeys(services, 0.)
+  sub_cpu = dict.fromkeys(services, 0.)
+  latencies = {s: [] for s in services}
+  for _ in range(len(services) * (n_subscribers + 1)):
+    # don't wait forever on a crashed worker
+    kind, s, cpu, lat = result.get(timeout=seconds + 30.)
+    if kind == 'pub':
+      pub_cpu[s] += cpu
+    else:
+      sub_cpu[s] += cpu
+      latencies[s] += lat
+  for p in procs:
+    p.join()
+
+  print("transport %s, %d subscribers, %.0f s" % (transport, n_subscribers, seconds))
+  print("  %-16s %8s %10s %10s %10s %10s %10s" % ("service", "msgs", "p50 us", "p99 us", "max us", "pub cpu%", "sub cpu%"))
+  for s in services:
+    lat = np.array(latencies[s]) / 1e3
+    if len(lat) == 0:
+      print("  %-16s no messages received" % s)
+      continue
+    print("  %-16s %8d %10.1f %10.1f %10.1f %10.2f %10.2f" % (s, len(lat), np.percentile(lat, 50), np.percentile(lat, 99),
+                                                             np.max(lat), 100. * pub_cpu[s] / seconds, 100. * sub_cpu[s] / seconds))
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Benchmark zmq tcp against the shared memory transport')
+  parser.add_argument('--seconds', type=float, default=10.)
+  parser.add_argument('--subscribers', type=int, default=3)
+  parser.add_argument('--transport', choices=['tcp', 'shm', 'both'], default='both')
+  parser.add_argument("services", type=str, nargs='*', default=DEFAULT_SERVICES, help="services to publish")
+  args = parser.parse_args()
+
+  transports = ['tcp', 'shm'] if args.transport == 'both' else [args.transport]
+  for t in transports:
+    run(t, args.services, args.seconds, args.subscribers)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""Measures params write throughput and latency of one put per key, put_many and a transaction,
+on the params directory and on common.params_mmap.
+
+Every iteration writes --batch keys with values of --size bytes into a scratch params directory,
+which should be on the filesystem of the real params (/data on the device) for the fsyncs to
+mean anything.
+
+  python selfdrive/debug/params_benchmark.py --dir /data/params_bench --batch 5 --iterations 200
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+from common.params import Params, keys
+from common.params_mmap import MmapDB
+
+
+def bench(write, batches):
+  latencies = []
+  t = time.time()
+  for batch in batches:
+    t_write = time.time()
+    write(batch)
+    latencies.append(time.time() - t_write)
+  total = time.time() - t
+  return sum(len(b) for b in batches) / total, np.percentile(latencies, 50) * 1e3, np.percentile(latencies, 99) * 1e3
+
+
+def put_each(params):
+  def write(batch):
+    for k, v in batch.items():
+      params.put(k, v)
+  return write
+
+
+def transaction(params):
+  def write(batch):
+    with params.transaction(write=True) as txn:
+      for k, v in batch.items():
+        txn.put(k, v)
+  return write
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--dir", help="scratch params directory, removed afterwards (default: a temp dir)")
+  parser.add_argument("--batch", type=int, default=5)
+  parser.add_argument("--size", type=int, default=64)
+  parser.add_argument("--iterations", type=int, default=200)
+  args = parser.parse_args()
+
+  path = args.dir or tempfile.mkdtemp()
+  try:
+    params = Params(path)
+    # start from a populated store like on a device
+    params.put_many({k: os.urandom(args.size) for k in keys})
+    mm_params = Params(MmapDB(os.path.join(path, "params.mm"), import_dir=path))
+
+    rng = np.random.RandomState(0)
+    all_keys = sorted(keys)
+    batches = []
+    for _ in range(args.iterations):
+      batch_keys = rng.choice(all_keys, args.batch, replace=False)
+      batches.append({str(k): os.urandom(args.size) for k in batch_keys})
+
+    print("%d keys per batch, %d byte values, %d batches in %s" % (args.batch, args.size, args.iterations, path))
+    print("%-10s %12s %14s %14s" % ("", "keys/s", "p50 batch ms", "p99 batch ms"))
+    for name, write in [("put", put_each(params)), ("put_many", params.put_many), ("txn", transaction(params)),
+                        ("mmap put", put_each(mm_params)), ("mmap many", mm_params.put_many)]:
+      print("%-10s %12.0f %14.2f %14.2f" % ((name,) + bench(write, batches)))
+  finally:
+    shutil.rmtree(path)
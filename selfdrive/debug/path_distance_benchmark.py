@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""Compares radard's path_distance against the brute force search over every path sample.
+
+Paths are random model polynomials and steering arcs on radard's 0.1m path_x, the points are
+spread over the radar's field of view.
+
+  python selfdrive/debug/path_distance_benchmark.py --points 32 --iterations 2000
+"""
+import time
+import argparse
+
+import numpy as np
+
+from selfdrive.controls.lib.radar_helpers import path_distance
+
+
+def path_distance_brute(path_x, path_y, d_rel, y_rel):
+  d_path = np.sqrt(np.amin((path_x - d_rel[:, None]) ** 2 + (path_y - y_rel[:, None]) ** 2, axis=1))
+  return d_path * np.sign(y_rel - np.interp(d_rel, path_x, path_y))
+
+
+def random_path(rng, path_x):
+  if rng.rand() < 0.5:
+    poly = [rng.uniform(-1e-4, 1e-4), rng.uniform(-5e-3, 5e-3), rng.uniform(-0.1, 0.1), rng.uniform(-2., 2.)]
+    return np.polyval(poly, path_x)
+  curvature = rng.uniform(-0.05, 0.05)
+  return path_x * np.tan(np.arcsin(np.clip(path_x * curvature, -0.999, 0.999)) / 2.)
+
+
+def bench(f, cases):
+  t = time.time()
+  for path_x, path_y, d_rel, y_rel in cases:
+    f(path_x, path_y, d_rel, y_rel)
+  return (time.time() - t) / len(cases)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--points", type=int, default=32)
+  parser.add_argument("--iterations", type=int, default=2000)
+  args = parser.parse_args()
+
+  rng = np.random.RandomState(0)
+  path_x = np.arange(0.0, 140.0, 0.1)
+  cases = [(path_x, random_path(rng, path_x), rng.uniform(0., 150., args.points), rng.uniform(-15., 15., args.points))
+           for _ in range(args.iterations)]
+
+  max_err = max(np.abs(path_distance(*c) - path_distance_brute(*c)).max() for c in cases)
+  t_brute = bench(path_distance_brute, cases)
+  t_fast = bench(path_distance, cases)
+  print("%d points: brute force %.1f us, path_distance %.1f us (%.1fx), max difference %.2e m" %
+        (args.points, t_brute * 1e6, t_fast * 1e6, t_brute / t_fast, max_err))
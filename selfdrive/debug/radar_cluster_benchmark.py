@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""Replays the liveTracks of recorded drives through radard's full and incremental clustering.
+
+Prints the clustering time per cycle of both modes, how often they produce the same clusters and
+how often they pick the same lead. liveTracks doesn't log the path, so the lead is picked with a
+straight path ahead.
+
+  python selfdrive/debug/radar_cluster_benchmark.py rlog.bz2 [rlog.bz2 ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from selfdrive.controls.lib.radar_helpers import Tracks, TrackClusters
+from tools.lib.logreader import LogReader
+
+
+def load_frames(fns):
+  frames = []
+  v_ego = 0.
+  for fn in fns:
+    for msg in LogReader(fn):
+      if msg.which() == 'controlsState':
+        v_ego = msg.controlsState.vEgo
+      elif msg.which() == 'liveTracks':
+        ids = [t.trackId for t in msg.liveTracks]
+        pts = np.array([[t.dRel, t.yRel, t.vRel, 1.] for t in msg.liveTracks]).reshape(-1, 4)
+        frames.append((ids, pts, v_ego))
+  return frames
+
+
+def replay(frames, incremental):
+  tracks = Tracks()
+  track_clusters = TrackClusters(incremental=incremental)
+  partitions, leads = [], []
+  t_cluster = 0.
+  for ids, pts, v_ego in frames:
+    tracks.update(ids, pts, pts[:, 1].copy(), v_ego, False)
+
+    t = time.time()
+    clusters = track_clusters.update(tracks)
+    t_cluster += time.time() - t
+
+    partitions.append(sorted(tuple(sorted(tracks.ids[c.idxs])) for c in clusters))
+    lead_clusters = sorted([c for c in clusters if c.is_potential_lead(v_ego)], key=lambda c: c.dRel)
+    leads.append(tuple(sorted(tracks.ids[lead_clusters[0].idxs])) if lead_clusters else None)
+  return t_cluster / max(len(frames), 1), partitions, leads
+
+
+if __name__ == "__main__":
+  frames = load_frames(sys.argv[1:])
+  t_full, partitions_full, leads_full = replay(frames, False)
+  t_inc, partitions_inc, leads_inc = replay(frames, True)
+
+  n = max(len(frames), 1)
+  print("%d cycles, %.1f tracks per cycle" % (len(frames), np.mean([len(f[0]) for f in frames]) if frames else 0.))
+  print("full clustering        %7.1f us per cycle" % (t_full * 1e6))
+  print("incremental clustering %7.1f us per cycle" % (t_inc * 1e6))
+  print("same clusters %.1f%%, same lead %.1f%%" % (100. * sum(a == b for a, b in zip(partitions_full, partitions_inc)) / n,
+                                                    100. * sum(a == b for a, b in zip(leads_full, leads_inc)) / n))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+"""Prints how long each daemon spent importing before its first loop iteration.
+
+The times are written by common.startup_time the first time a process started by the manager
+runs its loop, so run this after the car has started.
+
+  python selfdrive/debug/startup_report.py
+"""
+import os
+import sys
+import json
+
+from common.startup_time import STARTUP_DIR
+
+
+def load_reports(path):
+  reports = []
+  for fn in sorted(os.listdir(path)):
+    if fn.endswith(".json"):
+      with open(os.path.join(path, fn)) as f:
+        reports.append(json.load(f))
+  return reports
+
+
+def print_report(reports):
+  print("%-20s %12s %12s %12s %12s" % ("process", "preimport ms", "import ms", "to loop ms", "total ms"))
+  for r in sorted(reports, key=lambda r: r['first_iteration'] - r['start'], reverse=True):
+    preimport = "-" if r['preimport'] is None else "%.1f" % (r['preimport'] * 1e3)
+    print("%-20s %12s %12.1f %12.1f %12.1f" % (r['name'], preimport,
+                                                (r['imported'] - r['start']) * 1e3,
+                                                (r['first_iteration'] - r['imported']) * 1e3,
+                                                (r['first_iteration'] - r['start']) * 1e3))
+
+
+if __name__ == "__main__":
+  path = sys.argv[1] if len(sys.argv) > 1 else STARTUP_DIR
+  print_report(load_reports(path))
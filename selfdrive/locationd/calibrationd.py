@@ -6,7 +6,6 @@ import numpy as np
 import selfdrive.messaging as messaging
 from selfdrive.locationd.calibration_helpers import Calibration
 from selfdrive.swaglog import cloudlog
-from selfdrive.services import service_list
 from common.params import Params
 from common.transformations.model import model_height, get_camera_frame_from_model_frame, get_camera_frame_from_medmodel_frame
 from common.transformations.camera import view_frame_from_device_frame, get_view_frame_from_road_frame, \
@@ -98,8 +97,8 @@ class Calibrator(object):
 
 
 def calibrationd_thread(gctx=None, addr="127.0.0.1"):
-  cameraodometry = messaging.sub_sock(service_list['cameraOdometry'].port, addr=addr, conflate=True)
-  livecalibration = messaging.pub_sock(service_list['liveCalibration'].port)
+  cameraodometry = messaging.sub_sock('cameraOdometry', addr=addr, conflate=True)
+  livecalibration = messaging.pub_sock('liveCalibration')
   calibrator = Calibrator(param_put=True)
 
   # buffer with all the messages that still need to be input into the kalman
@@ -5,7 +5,6 @@ from common import realtime
 from selfdrive.locationd.test.ubloxd import gen_raw, gen_solution
 import zmq
 import selfdrive.messaging as messaging
-from selfdrive.services import service_list
 
 
 unlogger = os.getenv("UNLOGGER") is not None   # debug prints
@@ -13,10 +12,10 @@ unlogger = os.getenv("UNLOGGER") is not None   # debug prints
 def main(gctx=None):
   poller = zmq.Poller()
 
-  gpsLocationExternal = messaging.pub_sock(service_list['gpsLocationExternal'].port)
-  ubloxGnss = messaging.pub_sock(service_list['ubloxGnss'].port)
+  gpsLocationExternal = messaging.pub_sock('gpsLocationExternal')
+  ubloxGnss = messaging.pub_sock('ubloxGnss')
 
-  # ubloxRaw = messaging.sub_sock(service_list['ubloxRaw'].port, poller)
+  # ubloxRaw = messaging.sub_sock('ubloxRaw', poller)
 
   # buffer with all the messages that still need to be input into the kalman
   while 1:
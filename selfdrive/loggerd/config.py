@@ -8,6 +8,11 @@ else:
 
 SEGMENT_LENGTH = 60
 
+# the uploader's index of the files left to upload, outside of ROOT which only holds segments
+UPLOAD_INDEX = os.path.join(os.path.dirname(os.path.normpath(ROOT)), ".upload_index.json")
+# blocks uploaded of the files that weren't finished
+UPLOAD_STATE = os.path.join(os.path.dirname(os.path.normpath(ROOT)), ".upload_state.json")
+
 
 def get_available_percent():
     try:
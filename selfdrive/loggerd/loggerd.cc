@@ -574,7 +574,7 @@ int main(int argc, char** argv) {
 
       std::stringstream ss;
       ss << "tcp://";
-      if (it.second[4]) {
+      if (it.second[4] && !it.second[4].IsNull()) {
         ss << it.second[4].as<std::string>();
         ts_replace_sock.insert(sock);
       } else{
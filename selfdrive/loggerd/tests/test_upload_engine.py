@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+try:
+  from urllib.parse import urlparse, parse_qs
+  from http.server import HTTPServer, BaseHTTPRequestHandler
+  from socketserver import ThreadingMixIn
+except ImportError:
+  from urlparse import urlparse, parse_qs
+  from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+  from SocketServer import ThreadingMixIn
+
+from selfdrive.loggerd.upload_engine import UploadEngine, TokenBucket, block_id
+
+
+class BlobHandler(BaseHTTPRequestHandler):
+  """Stand-in for the blob service: put blob, put block and put block list."""
+  protocol_version = "HTTP/1.1"
+
+  def log_message(self, *args):
+    pass
+
+  def reply(self, status):
+    self.send_response(status)
+    self.send_header("Content-Length", "0")
+    self.end_headers()
+
+  def do_PUT(self):
+    server = self.server
+    body = self.rfile.read(int(self.headers["Content-Length"]))
+    url = urlparse(self.path)
+    query = parse_qs(url.query)
+    with server.lock:
+      server.requests.append((url.path, query.get("comp", [None])[0], len(body)))
+      server.clients.add(self.client_address)
+      fail = server.fail_requests > 0 and len(server.requests) == server.fail_requests
+
+    if fail:
+      self.reply(500)
+    elif "comp" not in query:
+      server.blobs[url.path] = body
+      self.reply(201)
+    elif query["comp"] == ["block"]:
+      server.blocks.setdefault(url.path, {})[query["blockid"][0]] = body
+      self.reply(201)
+    else:
+      blocks = server.blocks.pop(url.path, {})
+      ids = body.decode().split("<Latest>")[1:]
+      server.blobs[url.path] = b"".join(blocks[i.split("</Latest>")[0]] for i in ids)
+      self.reply(201)
+
+
+class BlobServer(ThreadingMixIn, HTTPServer):
+  daemon_threads = True
+
+  def __init__(self):
+    HTTPServer.__init__(self, ("127.0.0.1", 0), BlobHandler)
+    self.lock = threading.Lock()
+    self.blobs = {}
+    self.blocks = {}
+    self.requests = []
+    self.clients = set()
+    # the nth request fails
+    self.fail_requests = 0
+
+
+class TestUploadEngine(unittest.TestCase):
+  def setUp(self):
+    self.server = BlobServer()
+    self.server_thread = threading.Thread(target=self.server.serve_forever)
+    self.server_thread.daemon = True
+    self.server_thread.start()
+    self.tmp = tempfile.mkdtemp()
+    self.state_path = os.path.join(self.tmp, "upload_state.json")
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+    shutil.rmtree(self.tmp)
+
+  def get_url(self, key):
+    return "http://127.0.0.1:%d/%s?sig=x" % (self.server.server_port, key), {"x-ms-blob-type": "BlockBlob"}
+
+  def make_engine(self, **kwargs):
+    return UploadEngine(self.get_url, self.state_path, chunk_size=1024, **kwargs)
+
+  def make_file(self, key, size):
+    fn = os.path.join(self.tmp, key.replace("/", "_"))
+    with open(fn, "wb") as f:
+      f.write(os.urandom(size))
+    return fn
+
+  def read(self, fn):
+    with open(fn, "rb") as f:
+      return f.read()
+
+  def test_single_put(self):
+    fn = self.make_file("seg/qlog.bz2", 1000)
+    result = self.make_engine().run("seg/qlog.bz2", fn, 1000)
+    self.assertEqual(result.resp.status_code, 201)
+    self.assertEqual(self.server.blobs["/seg/qlog.bz2"], self.read(fn))
+    self.assertEqual(self.server.requests, [("/seg/qlog.bz2", None, 1000)])
+
+  def test_blocks(self):
+    fn = self.make_file("seg/rlog.bz2", 4000)
+    result = self.make_engine().run("seg/rlog.bz2", fn, 4000)
+    self.assertEqual(result.resp.status_code, 201)
+    self.assertEqual(self.server.blobs["/seg/rlog.bz2"], self.read(fn))
+    self.assertEqual([comp for _, comp, _ in self.server.requests], ["block"] * 4 + ["blocklist"])
+    # one connection for all the requests
+    self.assertEqual(len(self.server.clients), 1)
+
+  def test_resume(self):
+    fn = self.make_file("seg/fcamera.hevc", 5000)
+    self.server.fail_requests = 3
+    result = self.make_engine().run("seg/fcamera.hevc", fn, 5000)
+    self.assertEqual(result.resp.status_code, 500)
+    with open(self.state_path) as f:
+      self.assertEqual(json.load(f)["seg/fcamera.hevc"]["blocks"], 2)
+
+    # a new engine, as after a restart
+    self.server.fail_requests = 0
+    del self.server.requests[:]
+    result = self.make_engine().run("seg/fcamera.hevc", fn, 5000)
+    self.assertEqual(result.resp.status_code, 201)
+    self.assertEqual(self.server.blobs["/seg/fcamera.hevc"], self.read(fn))
+    self.assertEqual([comp for _, comp, _ in self.server.requests], ["block"] * 3 + ["blocklist"])
+    self.assertEqual(sorted(self.server.blocks), [])
+    with open(self.state_path) as f:
+      self.assertEqual(json.load(f), {})
+
+  def test_workers(self):
+    engine = self.make_engine(workers=3)
+    keys = ["seg%d/rlog.bz2" % i for i in range(6)]
+    for key in keys:
+      engine.submit(key, self.make_file(key, 3000), 3000)
+
+    results = []
+    t = time.time()
+    while len(results) < len(keys) and time.time() - t < 10:
+      results += engine.get_results(1.)
+    engine.close()
+
+    self.assertEqual(sorted(r.key for r in results), keys)
+    self.assertTrue(all(r.resp.status_code == 201 for r in results))
+    self.assertEqual(engine.in_flight, set())
+    metrics = engine.metrics()
+    self.assertEqual(metrics["files_uploaded"], 6)
+    self.assertEqual(metrics["bytes_sent"], 6 * 3000)
+    # a connection per worker
+    self.assertLessEqual(len(self.server.clients), 3)
+
+  def test_rate_limit(self):
+    engine = self.make_engine()
+    engine.bucket.set_rate(20 * 1024)
+    fn = self.make_file("seg/dcamera.hevc", 10 * 1024)
+    t = time.time()
+    engine.run("seg/dcamera.hevc", fn, 10 * 1024)
+    self.assertGreater(time.time() - t, 0.4)
+
+  def test_block_ids(self):
+    self.assertEqual(len(set(len(block_id(i)) for i in [0, 9, 10, 12345])), 1)
+
+
+class TestTokenBucket(unittest.TestCase):
+  def test_unlimited(self):
+    bucket = TokenBucket()
+    t = time.time()
+    bucket.consume(10 * 1024 * 1024)
+    self.assertLess(time.time() - t, 0.1)
+
+
+if __name__ == "__main__":
+  unittest.main()
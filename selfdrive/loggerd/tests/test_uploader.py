@@ -0,0 +1,101 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from selfdrive.loggerd.upload_index import UploadIndex
+from loggerd_tests_common import UploaderTestCase, create_random_file
+
+
+class TestUploadIndex(UploaderTestCase):
+  use_inotify = True
+
+  def setUp(self):
+    super(TestUploadIndex, self).setUp()
+    self.index_dir = tempfile.mkdtemp()
+    self.index_path = os.path.join(self.index_dir, "upload_index.json")
+
+  def tearDown(self):
+    super(TestUploadIndex, self).tearDown()
+    shutil.rmtree(self.index_dir)
+
+  def make_index(self):
+    return UploadIndex(self.root, self.index_path, use_inotify=self.use_inotify)
+
+  def make_segment(self, seg_num, names, lock=False):
+    seg_dir = self.seg_format.format(seg_num)
+    for fn in names:
+      create_random_file(os.path.join(self.root, seg_dir, fn), .01, lock=lock)
+    return seg_dir
+
+  def upload_all(self, index, with_raw=True):
+    keys = []
+    while 1:
+      index.update()
+      d = index.next(with_raw)
+      if d is None:
+        return keys
+      key, fn, _ = d
+      os.unlink(fn)
+      if index.remove(key):
+        os.rmdir(os.path.dirname(fn))
+      keys.append(key)
+
+  def test_priority_order(self):
+    index = self.make_index()
+    for seg_num in range(3):
+      self.make_segment(seg_num, ["dcamera.hevc", "fcamera.hevc", "rlog.bz2", "qlog.bz2", "other"])
+      # segments are ordered by their ctime
+      time.sleep(0.01)
+
+    keys = self.upload_all(index)
+    expected = [os.path.join(self.seg_format.format(seg_num), fn)
+                for fn in ["qlog.bz2", "rlog.bz2", "fcamera.hevc", "dcamera.hevc", "other"]
+                for seg_num in range(3)]
+    self.assertEqual(keys, expected)
+    self.assertEqual(os.listdir(self.root), [])
+
+  def test_qlogs_only_without_raw(self):
+    index = self.make_index()
+    self.make_segment(0, ["qlog.bz2", "rlog.bz2"])
+    self.assertEqual(self.upload_all(index, with_raw=False), [os.path.join(self.seg_format.format(0), "qlog.bz2")])
+    self.assertEqual(index.stats(), ({"rlog.bz2": 1}, os.path.getsize(os.path.join(self.root, self.seg_format.format(0), "rlog.bz2"))))
+
+  def test_locked_segment(self):
+    index = self.make_index()
+    seg_dir = self.make_segment(0, ["qlog.bz2"], lock=True)
+    index.update()
+    self.assertIsNone(index.next(True))
+
+    os.remove(os.path.join(self.root, seg_dir, "qlog.bz2.lock"))
+    self.assertEqual(self.upload_all(index), [os.path.join(seg_dir, "qlog.bz2")])
+
+  def test_deleted_segment(self):
+    index = self.make_index()
+    seg_dir = self.make_segment(0, ["qlog.bz2", "rlog.bz2"])
+    index.update()
+    shutil.rmtree(os.path.join(self.root, seg_dir))
+    self.assertEqual(self.upload_all(index), [])
+
+  def test_persisted(self):
+    index = self.make_index()
+    seg_dir = self.make_segment(0, ["qlog.bz2", "rlog.bz2"])
+    index.update()
+    key, fn, _ = index.next(True)
+    os.unlink(fn)
+    index.remove(key)
+
+    # a new segment while the uploader isn't running
+    new_seg_dir = self.make_segment(1, ["qlog.bz2"])
+    index = self.make_index()
+    self.assertEqual(sorted(index.segments[seg_dir].files), ["rlog.bz2"])
+    self.assertEqual(self.upload_all(index), [os.path.join(new_seg_dir, "qlog.bz2"), os.path.join(seg_dir, "rlog.bz2")])
+
+
+class TestUploadIndexPolling(TestUploadIndex):
+  use_inotify = False
+
+
+if __name__ == "__main__":
+  unittest.main()
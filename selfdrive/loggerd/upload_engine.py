@@ -0,0 +1,332 @@
+"""Concurrent, resumable uploads to the presigned blob urls handed out by the api.
+
+Files up to chunk_size are put at once like before. Larger ones are uploaded as the blocks of a
+block blob, one "Put Block" request per chunk_size bytes and a "Put Block List" that commits them.
+The blob service keeps uncommitted blocks for a week, so the number of blocks uploaded of every
+unfinished file is saved to state_path after each one, and a failed or interrupted upload continues
+from the first missing block with a new url instead of starting over.
+
+A few worker threads upload different files at once, each with its own requests.Session so the
+connection is reused between requests. All of them read the files through one TokenBucket whose
+rate is set from the network type, the uploader shouldn't saturate a hotspot or cellular link.
+"""
+import os
+import json
+import time
+import base64
+import threading
+import traceback
+from collections import deque, namedtuple
+
+import requests
+
+try:
+  import queue
+except ImportError:
+  import Queue as queue  #pylint: disable=import-error
+
+from selfdrive.swaglog import cloudlog
+
+UPLOAD_WORKERS = 3
+CHUNK_SIZE = 4 * 1024 * 1024
+READ_SIZE = 64 * 1024
+TIMEOUT = 10
+
+# bytes per second, None isn't limited
+RATE_WIFI = None
+RATE_HOTSPOT = 1024 * 1024
+RATE_CELLULAR = 256 * 1024
+
+# throughput is averaged over the last METRICS_WINDOW seconds
+METRICS_WINDOW = 10.
+
+# resp is None and exc set if the upload raised, seconds is how long it took
+UploadResult = namedtuple('UploadResult', ['key', 'fn', 'size', 'resp', 'exc', 'seconds'])
+
+
+def network_rate(on_wifi, on_hotspot):
+  if on_hotspot:
+    return RATE_HOTSPOT
+  elif on_wifi:
+    return RATE_WIFI
+  return RATE_CELLULAR
+
+
+def block_id(i):
+  # all the block ids of a blob have the same length
+  return base64.b64encode(("%08d" % i).encode()).decode()
+
+
+def block_url(url, query):
+  return url + ("&" if "?" in url else "?") + query
+
+
+def block_list(n_blocks):
+  blocks = "".join("<Latest>%s</Latest>" % block_id(i) for i in range(n_blocks))
+  return '<?xml version="1.0" encoding="utf-8"?><BlockList>%s</BlockList>' % blocks
+
+
+class TokenBucket(object):
+  """Limits the bytes per second of all the workers together."""
+  def __init__(self, rate=None):
+    self.lock = threading.Lock()
+    self.rate = None
+    self.tokens = 0.
+    self.t = time.time()
+    self.set_rate(rate)
+
+  def set_rate(self, rate):
+    with self.lock:
+      if rate != self.rate:
+        self.rate = rate
+        self.tokens = 0.
+        self.t = time.time()
+
+  def consume(self, n):
+    with self.lock:
+      if self.rate is None:
+        return
+      now = time.time()
+      # up to a second of burst
+      self.tokens = min(self.rate, self.tokens + (now - self.t) * self.rate) - n
+      self.t = now
+      wait = -self.tokens / self.rate
+    if wait > 0:
+      time.sleep(wait)
+
+
+class ThrottledReader(object):
+  """length bytes of f from its current position, requests sends them with a Content-Length."""
+  def __init__(self, f, length, bucket, sent):
+    self.f = f
+    self.left = length
+    self.bucket = bucket
+    self.sent = sent
+
+  def __len__(self):
+    return self.left
+
+  def read(self, size=-1):
+    if size < 0 or size > READ_SIZE:
+      size = READ_SIZE
+    size = min(size, self.left)
+    if size == 0:
+      return b""
+    self.bucket.consume(size)
+    dat = self.f.read(size)
+    self.left -= len(dat)
+    self.sent(len(dat))
+    return dat
+
+
+class UploadState(object):
+  """Blocks uploaded of the files that weren't finished, saved to path on every change."""
+  def __init__(self, path=None):
+    self.path = path
+    self.lock = threading.Lock()
+    self.files = {}
+    if path is not None:
+      try:
+        with open(path) as f:
+          self.files = json.load(f)
+      except (IOError, OSError, ValueError):
+        pass
+
+  def blocks(self, key, size, chunk_size):
+    with self.lock:
+      st = self.files.get(key)
+    if st is None or st["size"] != size or st["chunk_size"] != chunk_size:
+      return 0
+    return st["blocks"]
+
+  def set_blocks(self, key, size, chunk_size, blocks):
+    with self.lock:
+      self.files[key] = {"size": size, "chunk_size": chunk_size, "blocks": blocks}
+      self._save()
+
+  def remove(self, key):
+    with self.lock:
+      if self.files.pop(key, None) is not None:
+        self._save()
+
+  def prune(self, exists):
+    """Forgets the files exists returns False for, e.g. removed by the deleter."""
+    with self.lock:
+      gone = [key for key in self.files if not exists(key)]
+      for key in gone:
+        del self.files[key]
+      if gone:
+        self._save()
+
+  def _save(self):
+    if self.path is None:
+      return
+    tmp_path = self.path + ".tmp"
+    try:
+      with open(tmp_path, "w") as f:
+        json.dump(self.files, f)
+      os.rename(tmp_path, self.path)
+    except (IOError, OSError):
+      cloudlog.exception("upload state: save failed")
+
+
+class FakeResponse(object):
+  def __init__(self):
+    self.status_code = 200
+
+
+class UploadEngine(object):
+  def __init__(self, get_url, state_path=None, workers=UPLOAD_WORKERS, chunk_size=CHUNK_SIZE,
+               timeout=TIMEOUT, fake=False):
+    """get_url(key) returns the url and headers to upload key to."""
+    self.get_url = get_url
+    self.state = UploadState(state_path)
+    self.n_workers = workers
+    self.chunk_size = chunk_size
+    self.timeout = timeout
+    self.fake = fake
+    self.bucket = TokenBucket()
+
+    self.jobs = queue.Queue()
+    self.results = deque()
+    self.results_cond = threading.Condition()
+    self.workers = []
+    # keys submitted and not returned by get_results yet, only used from the submitting thread
+    self.in_flight = set()
+    self.session = None
+
+    self.metrics_lock = threading.Lock()
+    self.bytes_sent = 0
+    self.sent_window = deque()
+    self.files_uploaded = 0
+    self.files_failed = 0
+
+  def set_network(self, on_wifi, on_hotspot):
+    self.bucket.set_rate(network_rate(on_wifi, on_hotspot))
+
+  def idle(self):
+    return len(self.in_flight) < self.n_workers
+
+  def submit(self, key, fn, size):
+    if not self.workers:
+      for _ in range(self.n_workers):
+        t = threading.Thread(target=self._worker)
+        t.daemon = True
+        t.start()
+        self.workers.append(t)
+    self.in_flight.add(key)
+    self.jobs.put((key, fn, size))
+
+  def wait(self, timeout):
+    """Waits up to timeout seconds for an upload to finish."""
+    with self.results_cond:
+      if not self.results:
+        self.results_cond.wait(timeout)
+
+  def get_results(self, timeout=0.):
+    """Returns the results of the uploads that finished, waiting up to timeout seconds for one."""
+    with self.results_cond:
+      if not self.results and timeout > 0:
+        self.results_cond.wait(timeout)
+      results = list(self.results)
+      self.results.clear()
+    for result in results:
+      self.in_flight.discard(result.key)
+    return results
+
+  def close(self):
+    """Stops the workers once they finished the uploads they're in."""
+    for _ in self.workers:
+      self.jobs.put(None)
+    self.workers = []
+
+  def _worker(self):
+    session = requests.Session()
+    while 1:
+      job = self.jobs.get()
+      if job is None:
+        session.close()
+        return
+      result = self.run(*job, session=session)
+      with self.results_cond:
+        self.results.append(result)
+        self.results_cond.notify_all()
+
+  def run(self, key, fn, size, session=None):
+    """Uploads fn in this thread."""
+    if session is None:
+      if self.session is None:
+        self.session = requests.Session()
+      session = self.session
+
+    t = time.time()
+    resp, exc = None, None
+    try:
+      resp = self._upload(session, key, fn, size)
+    except Exception as e:
+      exc = (e, traceback.format_exc())
+    success = resp is not None and resp.status_code in (200, 201)
+    with self.metrics_lock:
+      if success:
+        self.files_uploaded += 1
+      else:
+        self.files_failed += 1
+    return UploadResult(key, fn, size, resp, exc, time.time() - t)
+
+  def _sent(self, n):
+    with self.metrics_lock:
+      self.bytes_sent += n
+      self.sent_window.append((time.time(), n))
+
+  def _reader(self, f, length):
+    return ThrottledReader(f, length, self.bucket, self._sent)
+
+  def _upload(self, session, key, fn, size):
+    url, headers = self.get_url(key)
+    if self.fake:
+      cloudlog.info("*** WARNING, THIS IS A FAKE UPLOAD TO %s ***" % url)
+      return FakeResponse()
+
+    if size <= self.chunk_size:
+      with open(fn, "rb") as f:
+        return session.put(url, data=self._reader(f, size), headers=headers, timeout=self.timeout)
+
+    # the blob type is only a header of the single put
+    headers = {k: v for k, v in headers.items() if k.lower() != "x-ms-blob-type"}
+    n_blocks = (size + self.chunk_size - 1) // self.chunk_size
+    start = self.state.blocks(key, size, self.chunk_size)
+    if start > 0:
+      cloudlog.info("upload: resuming %r at block %d/%d", key, start, n_blocks)
+
+    with open(fn, "rb") as f:
+      for i in range(start, n_blocks):
+        offset = i * self.chunk_size
+        f.seek(offset)
+        data = self._reader(f, min(self.chunk_size, size - offset))
+        resp = session.put(block_url(url, "comp=block&blockid=" + requests.utils.quote(block_id(i), safe="")),
+                           data=data, headers=headers, timeout=self.timeout)
+        if resp.status_code not in (200, 201):
+          return resp
+        self.state.set_blocks(key, size, self.chunk_size, i + 1)
+
+    resp = session.put(block_url(url, "comp=blocklist"), data=block_list(n_blocks), headers=headers,
+                       timeout=self.timeout)
+    if resp.status_code in (200, 201) or resp.status_code == 400:
+      # a 400 is an invalid block list, the blocks expired and the next try starts over
+      self.state.remove(key)
+    return resp
+
+  def metrics(self):
+    """Upload counters and the throughput in bytes per second over the last METRICS_WINDOW."""
+    with self.metrics_lock:
+      now = time.time()
+      while self.sent_window and self.sent_window[0][0] < now - METRICS_WINDOW:
+        self.sent_window.popleft()
+      return {
+        "bytes_sent": self.bytes_sent,
+        "files_uploaded": self.files_uploaded,
+        "files_failed": self.files_failed,
+        "in_flight": len(self.in_flight),
+        "throughput": sum(n for _, n in self.sent_window) / METRICS_WINDOW,
+        "rate_limit": self.bucket.rate,
+      }
@@ -0,0 +1,284 @@
+"""Index of the files the uploader still has to upload.
+
+The uploader used to list every segment directory up to four times to pick a single file. The
+index keeps the uploadable files in a heap ordered by (priority, segment creation time), so picking
+the next one is a look at the top of the heap and removing an uploaded one is O(log n).
+
+It's kept up to date from inotify events instead of listing directories: a new segment directory
+in root is watched until loggerd removes its last .lock file, at which point the segment is closed
+and its files are added, files that show up in a closed segment afterwards aren't seen.
+Directories that disappear (deleter) drop their files. Without inotify, or when the event queue
+overflows, reconcile lists root and only the segments that were still locked.
+
+The index is saved to path after every change, so after a restart only segments that weren't
+closed yet are listed again.
+"""
+import os
+import json
+import time
+import heapq
+
+from common import inotify
+from selfdrive.swaglog import cloudlog
+
+# qlogs first, then rlogs, the cameras and everything else, oldest segments first in each
+PRIORITIES = {
+  "qlog.bz2": 0,
+  "rlog.bz2": 1,
+  "fcamera.hevc": 2,
+  "dcamera.hevc": 3,
+}
+OTHER_PRIORITY = 4
+
+ROOT_EVENTS = inotify.IN_CREATE | inotify.IN_MOVED_TO | inotify.IN_DELETE | inotify.IN_MOVED_FROM
+SEGMENT_EVENTS = inotify.IN_CREATE | inotify.IN_DELETE | inotify.IN_MOVED_TO | inotify.IN_MOVED_FROM
+
+INDEX_VERSION = 1
+
+
+def upload_priority(name):
+  return PRIORITIES.get(name, OTHER_PRIORITY)
+
+
+def is_uploadable(name):
+  return not name.endswith(".lock") and not name.endswith(".tmp")
+
+
+class Segment(object):
+  def __init__(self, ctime):
+    self.ctime = ctime
+    self.locks = set()
+    # names of the files still to upload
+    self.files = {}
+    self.closed = False
+    self.wd = None
+
+
+class UploadIndex(object):
+  def __init__(self, root, path=None, use_inotify=True):
+    self.root = root
+    self.path = path
+    self.segments = {}
+    self.heap = []
+    self.dirty = False
+
+    self.inotify = None
+    self.root_wd = None
+    self.wds = {}
+    if use_inotify and inotify.available:
+      try:
+        self.inotify = inotify.Inotify()
+      except OSError:
+        cloudlog.exception("upload index: inotify failed, listing directories")
+
+    self._load()
+    self.reconcile()
+
+  def _load(self):
+    if self.path is None:
+      return
+    try:
+      with open(self.path) as f:
+        dat = json.load(f)
+      if dat["version"] != INDEX_VERSION or dat["root"] != self.root:
+        return
+      for logname, seg in dat["segments"].items():
+        # segments that weren't closed are listed again
+        if seg["closed"]:
+          self._add_segment(logname, seg["ctime"])
+          self._add_files(logname, seg["files"])
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+      pass
+
+  def save(self):
+    if self.path is None or not self.dirty:
+      return
+    dat = {
+      "version": INDEX_VERSION,
+      "root": self.root,
+      "segments": {logname: {"ctime": seg.ctime, "closed": seg.closed, "files": seg.files}
+                   for logname, seg in self.segments.items()},
+    }
+    tmp_path = self.path + ".tmp"
+    try:
+      with open(tmp_path, "w") as f:
+        json.dump(dat, f)
+      os.rename(tmp_path, self.path)
+      self.dirty = False
+    except (IOError, OSError):
+      cloudlog.exception("upload index: save failed")
+
+  def _watch_root(self):
+    if self.inotify is not None and self.root_wd is None:
+      try:
+        self.root_wd = self.inotify.add_watch(self.root, ROOT_EVENTS)
+      except OSError:
+        # root doesn't exist yet
+        self.root_wd = None
+
+  def reconcile(self):
+    """Lists root and the segments that weren't closed, the fallback for missed events."""
+    self._watch_root()
+    try:
+      lognames = os.listdir(self.root)
+    except OSError:
+      lognames = []
+
+    current = set(lognames)
+    for logname in list(self.segments.keys()):
+      if logname not in current:
+        self._drop_segment(logname)
+
+    for logname in lognames:
+      seg = self.segments.get(logname)
+      if seg is None or not seg.closed:
+        self._scan_segment(logname)
+    self.save()
+
+  def _add_segment(self, logname, ctime):
+    seg = Segment(ctime)
+    self.segments[logname] = seg
+    self.dirty = True
+    return seg
+
+  def _drop_segment(self, logname):
+    seg = self.segments.pop(logname, None)
+    if seg is not None:
+      self._unwatch(seg)
+      self.dirty = True
+
+  def _unwatch(self, seg):
+    if seg.wd is not None:
+      self.wds.pop(seg.wd, None)
+      self.inotify.rm_watch(seg.wd)
+      seg.wd = None
+
+  def _add_files(self, logname, names):
+    seg = self.segments[logname]
+    for name, size in names.items():
+      if is_uploadable(name) and name not in seg.files:
+        seg.files[name] = size
+        heapq.heappush(self.heap, (upload_priority(name), seg.ctime, logname, name))
+    seg.closed = True
+    self.dirty = True
+
+  def _scan_segment(self, logname):
+    path = os.path.join(self.root, logname)
+    seg = self.segments.get(logname)
+    if seg is None:
+      try:
+        st = os.stat(path)
+      except OSError:
+        return
+      if not os.path.isdir(path):
+        return
+      seg = self._add_segment(logname, st.st_ctime)
+
+    # watch before listing, nothing created in between is missed
+    if self.inotify is not None and seg.wd is None:
+      try:
+        seg.wd = self.inotify.add_watch(path, SEGMENT_EVENTS)
+        self.wds[seg.wd] = logname
+      except OSError:
+        seg.wd = None
+
+    try:
+      names = os.listdir(path)
+    except OSError:
+      self._drop_segment(logname)
+      return
+
+    seg.locks = set(name for name in names if name.endswith(".lock"))
+    # loggerd creates the directory before the locks, an empty one isn't closed yet
+    if not seg.locks and any(is_uploadable(name) for name in names):
+      sizes = {}
+      for name in names:
+        try:
+          sizes[name] = os.path.getsize(os.path.join(path, name))
+        except OSError:
+          pass
+      self._add_files(logname, sizes)
+      self._unwatch(seg)
+
+  def _handle_event(self, wd, mask, name):
+    if mask & inotify.IN_Q_OVERFLOW:
+      self.reconcile()
+    elif wd == self.root_wd:
+      if mask & inotify.IN_ISDIR and mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO):
+        self._scan_segment(name)
+      elif mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+        self._drop_segment(name)
+      elif mask & inotify.IN_IGNORED:
+        # root was removed
+        self.root_wd = None
+    elif wd in self.wds:
+      logname = self.wds[wd]
+      seg = self.segments[logname]
+      if mask & inotify.IN_IGNORED:
+        self.wds.pop(wd)
+        seg.wd = None
+      elif name.endswith(".lock"):
+        if mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO):
+          seg.locks.add(name)
+        else:
+          seg.locks.discard(name)
+          if not seg.locks:
+            # the segment was closed
+            self._scan_segment(logname)
+
+  def update(self, timeout=0.):
+    """Applies the changes on disk, waiting up to timeout seconds for the first one."""
+    if self.inotify is None or self.root_wd is None:
+      if timeout > 0:
+        # polling, only new segments and the ones that weren't closed are listed
+        time.sleep(timeout)
+      self.reconcile()
+      return
+
+    for wd, mask, _, name in self.inotify.read(timeout):
+      self._handle_event(wd, mask, name)
+    self.save()
+
+  def next(self, with_raw, skip=()):
+    """Returns (key, path, priority) of the next file to upload, None if there's nothing left.
+    Only qlogs are returned without with_raw, keys in skip (being uploaded) are passed over."""
+    skipped = []
+    try:
+      while self.heap:
+        prio, _, logname, name = self.heap[0]
+        seg = self.segments.get(logname)
+        if seg is None or name not in seg.files:
+          # uploaded or deleted since
+          heapq.heappop(self.heap)
+          continue
+        if prio > 0 and not with_raw:
+          return None
+        key = os.path.join(logname, name)
+        if key in skip:
+          skipped.append(heapq.heappop(self.heap))
+          continue
+        return (key, os.path.join(self.root, key), prio)
+      return None
+    finally:
+      for entry in skipped:
+        heapq.heappush(self.heap, entry)
+
+  def remove(self, key):
+    """Drops an uploaded or missing file, returns True if its segment has nothing left."""
+    logname, name = os.path.split(key)
+    seg = self.segments.get(logname)
+    if seg is None or seg.files.pop(name, None) is None:
+      return False
+    self.dirty = True
+    self.save()
+    return seg.closed and not seg.files
+
+  def stats(self):
+    """Returns the number of files left by name and their total size."""
+    name_counts = {}
+    total_size = 0
+    for seg in self.segments.values():
+      for name, size in seg.files.items():
+        name_counts[name] = name_counts.get(name, 0) + 1
+        total_size += size
+    return name_counts, total_size
@@ -7,20 +7,22 @@ import json
 import random
 import ctypes
 import inspect
-import requests
-import traceback
 import threading
 import subprocess
 
-from collections import Counter
 from selfdrive.swaglog import cloudlog
-from selfdrive.loggerd.config import ROOT
+from selfdrive.loggerd.config import ROOT, UPLOAD_INDEX, UPLOAD_STATE
+from selfdrive.loggerd.upload_index import UploadIndex
+from selfdrive.loggerd.upload_engine import UploadEngine, UPLOAD_WORKERS
 
 from common.params import Params
 from common.api import api_get
 
 fake_upload = os.getenv("FAKEUPLOAD") is not None
 
+# seconds between the upload_stats events
+STATS_INTERVAL = 60.
+
 def raise_on_thread(t, exctype):
   for ctid, tobj in threading._active.items():
     if tobj is t:
@@ -93,116 +95,51 @@ def is_on_hotspot():
     return False
 
 class Uploader(object):
-  def __init__(self, dongle_id, access_token, root):
+  def __init__(self, dongle_id, access_token, root, index_path=None, state_path=None, workers=UPLOAD_WORKERS):
     self.dongle_id = dongle_id
     self.access_token = access_token
     self.root = root
-
-    self.upload_thread = None
+    self.index = UploadIndex(root, index_path)
+    self.engine = UploadEngine(self.get_upload_url, state_path, workers, fake=fake_upload)
+    self.engine.state.prune(lambda key: os.path.exists(os.path.join(root, key)))
 
     self.last_resp = None
     self.last_exc = None
 
-  def clean_dirs(self):
-    try:
-      for logname in os.listdir(self.root):
-        path = os.path.join(self.root, logname)
-        # remove empty directories
-        if not os.listdir(path):
-          os.rmdir(path)
-    except OSError:
-      cloudlog.exception("clean_dirs failed")
-
-  def gen_upload_files(self):
-    if not os.path.isdir(self.root):
-      return
-    for logname in listdir_by_creation_date(self.root):
-      path = os.path.join(self.root, logname)
-      try:
-        names = os.listdir(path)
-      except OSError:
-        continue
-      if any(name.endswith(".lock") for name in names):
-        continue
-
-      for name in names:
-        key = os.path.join(logname, name)
-        fn = os.path.join(path, name)
-
-        yield (name, key, fn)
-
   def get_data_stats(self):
-    name_counts = Counter()
-    total_size = 0
-    for name, key, fn in self.gen_upload_files():
-      name_counts[name] += 1
-      total_size += os.stat(fn).st_size
-    return dict(name_counts), total_size
+    self.index.update()
+    return self.index.stats()
 
   def next_file_to_upload(self, with_raw):
-    # try to upload qlog files first
-    for name, key, fn in self.gen_upload_files():
-      if name  == "qlog.bz2":
-        return (key, fn, 0)
-
-    if with_raw:
-      # then upload log files
-      for name, key, fn in self.gen_upload_files():
-        if name  == "rlog.bz2":
-          return (key, fn, 1)
-
-      # then upload rear and front camera files
-      for name, key, fn in self.gen_upload_files():
-        if name == "fcamera.hevc":
-          return (key, fn, 2)
-        elif name == "dcamera.hevc":
-          return (key, fn, 3)
-
-      # then upload other files
-      for name, key, fn in self.gen_upload_files():
-        if not name.endswith('.lock') and not name.endswith(".tmp"):
-          return (key, fn, 4)
-
-    return None
-
-
-  def do_upload(self, key, fn):
-    try:
-      url_resp = api_get("v1.2/"+self.dongle_id+"/upload_url/", timeout=2, path=key, access_token=self.access_token)
-      url_resp_json = json.loads(url_resp.text)
-      url = url_resp_json['url']
-      headers = url_resp_json['headers']
-      cloudlog.info("upload_url v1.2 %s %s", url, str(headers))
-
-      if fake_upload:
-        cloudlog.info("*** WARNING, THIS IS A FAKE UPLOAD TO %s ***" % url)
-        class FakeResponse(object):
-          def __init__(self):
-            self.status_code = 200
-        self.last_resp = FakeResponse()
-      else:
-        with open(fn, "rb") as f:
-          self.last_resp = requests.put(url, data=f, headers=headers, timeout=10)
-    except Exception as e:
-      self.last_exc = (e, traceback.format_exc())
-      raise
-
-  def normal_upload(self, key, fn):
-    self.last_resp = None
-    self.last_exc = None
-
-    try:
-      self.do_upload(key, fn)
-    except Exception:
-      pass
-
-    return self.last_resp
-
-  def upload(self, key, fn):
+    # qlogs first, then rlogs, cameras and other files
+    self.index.update()
+    return self.index.next(with_raw, skip=self.engine.in_flight)
+
+  def remove_from_index(self, key):
+    self.engine.state.remove(key)
+    if self.index.remove(key):
+      # remove empty directories
+      try:
+        os.rmdir(os.path.join(self.root, os.path.dirname(key)))
+      except OSError:
+        pass
+
+  def get_upload_url(self, key):
+    url_resp = api_get("v1.2/"+self.dongle_id+"/upload_url/", timeout=2, path=key, access_token=self.access_token)
+    url_resp_json = json.loads(url_resp.text)
+    url = url_resp_json['url']
+    headers = url_resp_json['headers']
+    cloudlog.info("upload_url v1.2 %s %s", url, str(headers))
+    return url, headers
+
+  def start_upload(self, key, fn, wait=False):
+    """Hands fn to the upload workers, or uploads it in this thread with wait. Returns False if fn
+    is gone or, with wait, wasn't uploaded. Empty files are deleted."""
     try:
       sz = os.path.getsize(fn)
     except OSError:
       cloudlog.exception("upload: getsize failed")
+      self.remove_from_index(key)
       return False
 
     cloudlog.event("upload", key=key, fn=fn, sz=sz)
@@ -212,28 +149,38 @@ class Uploader(object):
     if sz == 0:
       # can't upload files of 0 size
       os.unlink(fn) # delete the file
-      success = True
+      self.remove_from_index(key)
+      return True
+
+    cloudlog.info("uploading %r", fn)
+    if wait:
+      return self.finish_upload(self.engine.run(key, fn, sz))
+    self.engine.submit(key, fn, sz)
+    return True
+
+  def finish_upload(self, result):
+    """Deletes the file of an UploadResult if it was uploaded, returns whether it was."""
+    key, fn, sz, stat = result.key, result.fn, result.size, result.resp
+    self.last_resp = stat
+    self.last_exc = result.exc
+
+    if stat is not None and stat.status_code in (200, 201):
+      cloudlog.event("upload_success", key=key, fn=fn, sz=sz, seconds=result.seconds,
+                     throughput=sz / max(result.seconds, 1e-3))
+
+      # delete the file
+      try:
+        os.unlink(fn)
+      except OSError:
+        cloudlog.exception("delete_failed", stat=stat, exc=self.last_exc, key=key, fn=fn, sz=sz)
+      self.remove_from_index(key)
+      return True
     else:
-      cloudlog.info("uploading %r", fn)
-      stat = self.normal_upload(key, fn)
-      if stat is not None and stat.status_code in (200, 201):
-        cloudlog.event("upload_success", key=key, fn=fn, sz=sz)
-
-        # delete the file
-        try:
-          os.unlink(fn)
-        except OSError:
-          cloudlog.exception("delete_failed", stat=stat, exc=self.last_exc, key=key, fn=fn, sz=sz)
-
-        success = True
-      else:
-        cloudlog.event("upload_failed", stat=stat, exc=self.last_exc, key=key, fn=fn, sz=sz)
-        success = False
-
-    self.clean_dirs()
-
-    return success
+      cloudlog.event("upload_failed", stat=stat, exc=self.last_exc, key=key, fn=fn, sz=sz)
+      return False
 
+  def upload(self, key, fn):
+    return self.start_upload(key, fn, wait=True)
 
 
 def uploader_fn(exit_event):
@@ -246,9 +193,11 @@ def uploader_fn(exit_event):
     cloudlog.info("uploader MISSING DONGLE_ID or ACCESS_TOKEN")
     raise Exception("uploader can't start without dongle id and access token")
 
-  uploader = Uploader(dongle_id, access_token, ROOT)
+  uploader = Uploader(dongle_id, access_token, ROOT, UPLOAD_INDEX, UPLOAD_STATE)
 
   backoff = 0.1
+  retry_time = 0.
+  last_stats = time.time()
   while True:
     allow_raw_upload = (params.get("IsUploadRawEnabled") != "0")
     allow_cellular = (params.get("IsUploadVideoOverCellularEnabled") != "0")
@@ -257,25 +206,45 @@ def uploader_fn(exit_event):
     should_upload = allow_cellular or (on_wifi and not on_hotspot)
 
     if exit_event.is_set():
+      uploader.engine.close()
       return
 
-    d = uploader.next_file_to_upload(with_raw=allow_raw_upload and should_upload)
-    if d is None:
-      time.sleep(5)
-      continue
+    # metered networks get a share of the bandwidth
+    uploader.engine.set_network(on_wifi, on_hotspot)
 
-    key, fn, _ = d
+    for result in uploader.engine.get_results():
+      success = uploader.finish_upload(result)
+      if success:
+        backoff = 0.1
+      else:
+        cloudlog.info("backoff %r", backoff)
+        retry_time = time.time() + backoff + random.uniform(0, backoff)
+        backoff = min(backoff*2, 120)
+      cloudlog.info("upload done, success=%r", success)
+
+    if time.time() - last_stats > STATS_INTERVAL:
+      cloudlog.event("upload_stats", **uploader.engine.metrics())
+      last_stats = time.time()
+
+    wait = retry_time - time.time()
+    if wait <= 0 and uploader.engine.idle():
+      d = uploader.next_file_to_upload(with_raw=allow_raw_upload and should_upload)
+      if d is not None:
+        key, fn, _ = d
+        cloudlog.event("uploader_netcheck", allow_cellular=allow_cellular, is_on_hotspot=on_hotspot, is_on_wifi=on_wifi)
+        cloudlog.info("to upload %r", d)
+        if not uploader.start_upload(key, fn):
+          retry_time = time.time() + backoff + random.uniform(0, backoff)
+          backoff = min(backoff*2, 120)
+        continue
 
-    cloudlog.event("uploader_netcheck", allow_cellular=allow_cellular, is_on_hotspot=on_hotspot, is_on_wifi=on_wifi)
-    cloudlog.info("to upload %r", d)
-    success = uploader.upload(key, fn)
-    if success:
-      backoff = 0.1
+    wait = min(max(wait, 0.1), 5) if wait > 0 else 5
+    if uploader.engine.in_flight:
+      # wakes up when an upload finishes
+      uploader.engine.wait(wait)
     else:
-      cloudlog.info("backoff %r", backoff)
-      time.sleep(backoff + random.uniform(0, backoff))
-      backoff = min(backoff*2, 120)
-    cloudlog.info("upload done, success=%r", success)
+      # wakes up early when a segment is closed
+      uploader.index.update(wait)
 
 def main(gctx=None):
   uploader_fn(threading.Event())
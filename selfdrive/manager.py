@@ -69,6 +69,7 @@ if __name__ == "__main__":
   unblock_stdout()
 
 import glob
+import time
 import shutil
 import hashlib
 import importlib
@@ -78,11 +79,11 @@ from multiprocessing import Process
 
 from setproctitle import setproctitle  #pylint: disable=no-name-in-module
 
+from common import startup_time
 from common.params import Params
 import cereal
 ThermalStatus = cereal.log.ThermalData.ThermalStatus
 
-from selfdrive.services import service_list
 from selfdrive.swaglog import cloudlog
 import selfdrive.messaging as messaging
 from selfdrive.registration import register
@@ -166,8 +167,11 @@ def register_managed_process(name, desc, car_started=False):
 # ****************** process management functions ******************
 def launcher(proc):
   try:
+    startup_time.mark_start()
+
     # import the process
     mod = importlib.import_module(proc)
+    startup_time.mark_imported()
 
     # rename the process
     setproctitle(proc)
@@ -214,7 +218,9 @@ def prepare_managed_process(p):
   if isinstance(proc, str):
     # import this python
     cloudlog.info("preimporting %s" % proc)
+    t = time.time()
     importlib.import_module(proc)
+    startup_time.record_preimport(p, time.time() - t)
   else:
     # build this process
     cloudlog.info("building %s" % (proc,))
@@ -313,7 +319,7 @@ def system(cmd):
 
 def manager_thread():
   # now loop
-  thermal_sock = messaging.sub_sock(service_list['thermal'].port)
+  thermal_sock = messaging.sub_sock('thermal')
 
   cloudlog.info("manager start")
   cloudlog.info({"environ": os.environ})
@@ -476,28 +482,20 @@ def main():
   params.manager_start()
 
   # set unset params
-  if params.get("IsMetric") is None:
-    params.put("IsMetric", "0")
-  if params.get("RecordFront") is None:
-    params.put("RecordFront", "0")
-  if params.get("IsFcwEnabled") is None:
-    params.put("IsFcwEnabled", "1")
-  if params.get("HasAcceptedTerms") is None:
-    params.put("HasAcceptedTerms", "0")
-  if params.get("IsUploadRawEnabled") is None:
-    params.put("IsUploadRawEnabled", "1")
-  if params.get("IsUploadVideoOverCellularEnabled") is None:
-    params.put("IsUploadVideoOverCellularEnabled", "1")
-  if params.get("IsDriverMonitoringEnabled") is None:
-    params.put("IsDriverMonitoringEnabled", "1")
-  if params.get("IsGeofenceEnabled") is None:
-    params.put("IsGeofenceEnabled", "-1")
-  if params.get("SpeedLimitOffset") is None:
-    params.put("SpeedLimitOffset", "0")
-  if params.get("LongitudinalControl") is None:
-    params.put("LongitudinalControl", "0")
-  if params.get("LimitSetSpeed") is None:
-    params.put("LimitSetSpeed", "0")
+  default_params = {
+    "IsMetric": "0",
+    "RecordFront": "0",
+    "IsFcwEnabled": "1",
+    "HasAcceptedTerms": "0",
+    "IsUploadRawEnabled": "1",
+    "IsUploadVideoOverCellularEnabled": "1",
+    "IsDriverMonitoringEnabled": "1",
+    "IsGeofenceEnabled": "-1",
+    "SpeedLimitOffset": "0",
+    "LongitudinalControl": "0",
+    "LimitSetSpeed": "0",
+  }
+  params.put_many({k: v for k, v in default_params.items() if params.get(k) is None})
 
   # is this chffrplus?
   if os.getenv("PASSIVE") is not None:
@@ -1,8 +1,19 @@
 import zmq
+import numpy as np
 
 from cereal import log
+from common import startup_time
 from common.realtime import sec_since_boot
-from selfdrive.services import service_list
+from selfdrive.services import service_list, get_service
+from selfdrive.messaging_shm import ShmPubSock, ShmSubSock, Poller
+from selfdrive.messaging_stats import MessagingStats
+
+# frames below zmq's receive batch size share the decoder buffer and can't be read in place
+ZERO_COPY_MIN_SIZE = 8192
+
+# receive statistics of every socket created by sub_sock
+stats = MessagingStats()
+sock_services = {}
 
 def new_message():
   dat = log.Event.new_message()
@@ -10,24 +21,84 @@ def new_message():
   dat.valid = True
   return dat
 
-def pub_sock(port, addr="*"):
+def pub_sock(service, addr="*"):
+  """Publisher for a service name (or its port), bound to every endpoint of its transport."""
+  srv = get_service(service)
   context = zmq.Context.instance()
   sock = context.socket(zmq.PUB)
-  sock.bind("tcp://%s:%d" % (addr, port))
+  if srv is None:
+    sock.bind("tcp://%s:%d" % (addr, service))
+    return sock
+
+  for endpoint in srv.bind_endpoints(addr):
+    sock.bind(endpoint)
+  if srv.transport == "shm":
+    sock = ShmPubSock(srv.name, sock)
   return sock
 
-def sub_sock(port, poller=None, addr="127.0.0.1", conflate=False):
-  context = zmq.Context.instance()
-  sock = context.socket(zmq.SUB)
-  if conflate:
-    sock.setsockopt(zmq.CONFLATE, 1)
-  sock.connect("tcp://%s:%d" % (addr, port))
-  sock.setsockopt(zmq.SUBSCRIBE, b"")
+def sub_sock(service, poller=None, addr="127.0.0.1", conflate=False):
+  """Subscriber for a service name (or its port), over the transport resolved in services."""
+  srv = get_service(service)
+  if srv is not None and srv.uses_shm(addr):
+    sock = ShmSubSock(srv.name, conflate=conflate)
+  else:
+    context = zmq.Context.instance()
+    sock = context.socket(zmq.SUB)
+    if conflate:
+      sock.setsockopt(zmq.CONFLATE, 1)
+    sock.connect(srv.connect_endpoint(addr) if srv is not None else "tcp://%s:%d" % (addr, service))
+    sock.setsockopt(zmq.SUBSCRIBE, b"")
+
+  if srv is not None:
+    sock_services[sock] = srv.name
   if poller is not None:
     poller.register(sock, zmq.POLLIN)
   return sock
 
-def drain_sock(sock, wait_for_one=False):
+def record_recv(sock, msg, conflated=0):
+  service = sock_services.get(sock)
+  if service is not None:
+    if isinstance(sock, ShmSubSock):
+      conflated += sock.dropped
+      sock.dropped = 0
+    stats.record(service, msg.logMonoTime, conflated)
+  return msg
+
+def from_frame(dat):
+  """Builds an event reader over a received message.
+
+  Takes bytes or a zmq.Frame from recv(copy=False). A frame is read in place, without copying it
+  into a bytes object first. The reader keeps the frame's memoryview, which keeps the frame alive
+  for as long as the reader is held.
+
+  capnp needs word aligned segments. zmq packs messages smaller than its 8 KiB receive batch back
+  to back in the decoder buffer, so those are practically never aligned and are still copied.
+  """
+  if isinstance(dat, zmq.Frame):
+    buf = dat.buffer
+    if len(buf) >= ZERO_COPY_MIN_SIZE and np.frombuffer(buf, dtype=np.uint8).ctypes.data % 8 == 0:
+      dat = buf
+    else:
+      dat = dat.bytes
+  return log.Event.from_bytes(dat)
+
+def drain_sock(sock, wait_for_one=False, zero_copy=False):
+  ret = []
+  while 1:
+    try:
+      if wait_for_one and len(ret) == 0:
+        dat = sock.recv(copy=not zero_copy)
+      else:
+        dat = sock.recv(zmq.NOBLOCK, copy=not zero_copy)
+      dat = record_recv(sock, from_frame(dat))
+      ret.append(dat)
+    except zmq.error.Again:
+      break
+  return ret
+
+
+def drain_sock_raw(sock, wait_for_one=False):
+  """Receives all pending messages as bytes, for consumers that parse them in C++ like CANParser."""
   ret = []
   while 1:
     try:
@@ -35,54 +106,105 @@ def drain_sock(sock, wait_for_one=False):
         dat = sock.recv()
       else:
         dat = sock.recv(zmq.NOBLOCK)
-      dat = log.Event.from_bytes(dat)
       ret.append(dat)
     except zmq.error.Again:
       break
   return ret
 
 
-# TODO: print when we drop packets?
-def recv_sock(sock, wait=False):
+# only the last message is kept, the ones before are counted as conflated in stats
+def recv_sock(sock, wait=False, zero_copy=False):
   dat = None
+  n = 0
   while 1:
     try:
       if wait and dat is None:
-        dat = sock.recv()
+        dat = sock.recv(copy=not zero_copy)
       else:
-        dat = sock.recv(zmq.NOBLOCK)
+        dat = sock.recv(zmq.NOBLOCK, copy=not zero_copy)
+      n += 1
     except zmq.error.Again:
       break
   if dat is not None:
-    dat = log.Event.from_bytes(dat)
+    dat = record_recv(sock, from_frame(dat), conflated=n - 1)
   return dat
 
-def recv_one(sock):
-  return log.Event.from_bytes(sock.recv())
+def recv_one(sock, zero_copy=False):
+  return record_recv(sock, from_frame(sock.recv(copy=not zero_copy)))
 
-def recv_one_or_none(sock):
+def recv_one_or_none(sock, zero_copy=False):
   try:
-    return log.Event.from_bytes(sock.recv(zmq.NOBLOCK))
+    return record_recv(sock, from_frame(sock.recv(zmq.NOBLOCK, copy=not zero_copy)))
   except zmq.error.Again:
     return None
 
 
+class ServiceValues(object):
+  """Per-service values in one flat list, indexed by service name like a dict."""
+  __slots__ = ('index', 'values')
+
+  def __init__(self, index, value):
+    self.index = index
+    self.values = [value] * len(index)
+
+  def __getitem__(self, s):
+    return self.values[self.index[s]]
+
+  def __setitem__(self, s, value):
+    self.values[self.index[s]] = value
+
+  def __contains__(self, s):
+    return s in self.index
+
+  def __iter__(self):
+    return iter(self.index)
+
+  def __len__(self):
+    return len(self.values)
+
+  def keys(self):
+    return self.index.keys()
+
+  def items(self):
+    return [(s, self.values[i]) for s, i in self.index.items()]
+
+  def reset(self, value):
+    self.values = [value] * len(self.values)
+
+
 class SubMaster():
-  def __init__(self, services, addr="127.0.0.1"):
-    self.poller = zmq.Poller()
+  """Keeps the latest message of every service in services.
+
+  With lazy=True the union of an event is only dereferenced on the first sm[service] of a frame,
+  services that are only checked through updated/alive/valid never get decoded.
+  """
+  def __init__(self, services, addr="127.0.0.1", zero_copy=False, lazy=False):
+    self.zero_copy = zero_copy
+    self.lazy = lazy
+    self.poller = Poller()
     self.frame = -1
-    self.updated = {s : False for s in services}
-    self.rcv_time = {s : 0. for s in services}
-    self.rcv_frame = {s : 0 for s in services}
-    self.alive = {s : False for s in services}
+    self.services = list(services)
+    index = {s: i for i, s in enumerate(self.services)}
+    self.updated = ServiceValues(index, False)
+    self.rcv_time = ServiceValues(index, 0.)
+    self.rcv_frame = ServiceValues(index, 0)
+    self.alive = ServiceValues(index, False)
+    self.logMonoTime = ServiceValues(index, 0)
+    self.valid = ServiceValues(index, True)
     self.sock = {}
     self.freq = {}
     self.data = {}
-    self.logMonoTime = {}
-    self.valid = {}
-    for s in services:
-      # TODO: get address automatically from service_list
-      self.sock[s] = sub_sock(service_list[s].port, poller=self.poller, addr=addr, conflate=True)
+    self.events = {}
+    self.pending = set()
+    self.sock_service = {}
+    self.trigger_pollers = {}
+    # alive if delay is within 10x the expected frequency, services with freq 0 are always alive
+    # (arbitrary small number to avoid float comparison)
+    self.alive_timeout = [10. / service_list[s].frequency if service_list[s].frequency > 1e-5 else float('inf')
+                          for s in self.services]
+    for s in self.services:
+      self.sock[s] = sub_sock(s, poller=self.poller, addr=addr, conflate=True)
+      self.sock_service[self.sock[s]] = s
       self.freq[s] = service_list[s].frequency
       data = new_message()
       data.init(s)
@@ -91,42 +213,104 @@ class SubMaster():
       self.valid[s] = data.valid
 
   def __getitem__(self, s):
+    if s in self.pending:
+      self.data[s] = getattr(self.events[s], s)
+      self.pending.discard(s)
     return self.data[s]
 
-  def update(self, timeout=-1):
-    # TODO: add optional input that specify the service to wait for
+  def update(self, timeout=-1, wait_for=None):
+    """Receives the latest message of every service that has one waiting.
+
+    timeout is in ms, -1 blocks. With wait_for, a set of services, it keeps polling until one of
+    those arrives or timeout expires, and then picks up whatever else is waiting without blocking.
+    A planning cycle then lines up with fresh data from its trigger instead of waking up for every
+    higher rate service in between.
+    """
     self.frame += 1
-    self.updated = dict.fromkeys(self.updated, False)
+    if self.frame == 1:
+      startup_time.mark_first_iteration()
+    self.updated.reset(False)
+
+    if wait_for is None:
+      self._recv(self.poller.poll(timeout))
+    else:
+      # only the trigger sockets can wake us up
+      key = frozenset(wait_for)
+      if key not in self.trigger_pollers:
+        self.trigger_pollers[key] = Poller()
+        for s in key:
+          self.trigger_pollers[key].register(self.sock[s], zmq.POLLIN)
+      self._recv(self.trigger_pollers[key].poll(timeout))
+      # the trigger is in (or we timed out), pick up the rest without waiting
+      self._recv(self.poller.poll(0))
+
+    cur_time = sec_since_boot()
+    self.alive.values = [(cur_time - t) < dt for t, dt in zip(self.rcv_time.values, self.alive_timeout)]
+
+  def _recv(self, events):
     cur_time = sec_since_boot()
-    for sock, _ in self.poller.poll(timeout):
-      msg = recv_one(sock)
-      s = msg.which()
+    for sock, _ in events:
+      msg = recv_one(sock, zero_copy=self.zero_copy)
+      # every socket carries a single service, no need for msg.which()
+      s = self.sock_service[sock]
       self.updated[s] = True
       self.rcv_time[s] = cur_time
       self.rcv_frame[s] = self.frame
-      self.data[s] = getattr(msg, s)
+      if self.lazy:
+        self.events[s] = msg
+        self.pending.add(s)
+      else:
+        self.data[s] = getattr(msg, s)
       self.logMonoTime[s] = msg.logMonoTime
       self.valid[s] = msg.valid
 
-    for s in self.data:
-      # arbitrary small number to avoid float comparison. If freq is 0, we can skip the check
-      if self.freq[s] > 1e-5:
-        # alive if delay is within 10x the expected frequency
-        self.alive[s] = (cur_time - self.rcv_time[s]) < (10. / self.freq[s])
-      else:
-        self.alive[s] = True
-
   def all_alive(self, service_list=None):
     if service_list is None:  # check all
-      service_list = self.alive.keys()
+      return all(self.alive.values)
     return all(self.alive[s] for s in service_list)
 
   def all_valid(self, service_list=None):
     if service_list is None:  # check all
-      service_list = self.valid.keys()
+      return all(self.valid.values)
     return all(self.valid[s] for s in service_list)
 
   def all_alive_and_valid(self, service_list=None):
-    if service_list is None:  # check all
-      service_list = self.alive.keys()
     return self.all_alive(service_list=service_list) and self.all_valid(service_list=service_list)
+
+
+class PubMaster():
+  """Publishes a fixed set of services.
+
+  send() serializes and publishes right away. queue() defers both to flush(), which serializes all
+  queued messages first and then hands them to zmq back to back, so a loop's messages leave in one
+  burst at the end of the cycle. serialize_time keeps the last to_bytes() time per service in ms,
+the periodic messaging stats report its average and max.
+  """
+  def __init__(self, services):
+    self.sock = {}
+    self.serialize_time = {}
+    self.queued = []
+    for s in services:
+      self.sock[s] = pub_sock(s)
+      self.serialize_time[s] = 0.
+
+  def _serialize(self, s, dat):
+    if isinstance(dat, bytes):
+      return dat
+    t = sec_since_boot()
+    dat = dat.to_bytes()
+    self.serialize_time[s] = (sec_since_boot() - t) * 1e3
+    stats.record_serialize(s, self.serialize_time[s])
+    return dat
+
+  def send(self, s, dat):
+    self.sock[s].send(self._serialize(s, dat))
+
+  def queue(self, s, dat):
+    self.queued.append((s, dat))
+
+  def flush(self):
+    msgs = [(s, self._serialize(s, dat)) for s, dat in self.queued]
+    self.queued = []
+    for s, dat in msgs:
+      self.sock[s].send(dat)
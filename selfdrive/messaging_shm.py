@@ -0,0 +1,331 @@
+"""Shared memory transport for services that are published and consumed on the same device.
+
+Each service gets a ring buffer of fixed size slots in <SHM_DIR>/op_<service>. The publisher
+copies every message once into the next slot, subscribers read it straight from their own mapping
+of the same file. A slot is stamped with the sequence number of the message it holds, so a reader
+that falls more than a full ring behind notices the overwrite and skips ahead instead of reading a
+torn message.
+
+Wakeups go through one named pipe per subscriber in <SHM_DIR>/op_<service>.sub/. The publisher
+writes a single byte to every pipe after each message, which lets subscribers block in recv() and
+be registered in a zmq.Poller next to regular zmq sockets. Subscribers bump a generation counter
+in the ring header when they come or go, the publisher rescans the pipes when it changes.
+
+Python has no memory fences, so slot updates rely on the seq/length/payload stores becoming
+visible in program order. That holds on x86 but is not guaranteed on ARM, where a reader could in
+theory see a new sequence number before the payload. Readers re-check the sequence number and
+validate the length, which catches overwrites and garbage lengths but not a stale payload.
+
+zmq.Poller reports native fds back as plain integers, use the Poller below to get the socket
+objects back like for zmq sockets.
+
+The publisher keeps its zmq PUB socket bound as well, so loggerd, the ui and other consumers that
+only speak zmq keep working unchanged.
+"""
+import os
+import mmap
+import errno
+import fcntl
+import select
+import struct
+import itertools
+from contextlib import contextmanager
+
+import zmq
+
+SHM_DIR = os.getenv("SHM_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else "/tmp")
+SLOT_COUNT = 32
+SLOT_SIZE = 64 * 1024
+
+MAGIC = 0x514d504f  # "OPMQ"
+HEADER = struct.Struct("<IIIIQ")  # magic, slot count, slot size, subscriber generation, write sequence
+HEADER_SIZE = 64
+GENERATION_OFFSET = 12
+WRITE_SEQ_OFFSET = 16
+SLOT_HEADER_SIZE = 16  # sequence, length, padding
+SEQ = struct.Struct("<Q")
+LENGTH = struct.Struct("<I")
+GENERATION = struct.Struct("<I")
+
+_fifo_ids = itertools.count()
+
+
+def shm_path(service):
+  return os.path.join(SHM_DIR, "op_" + service)
+
+
+def _mkdirs_exists_ok(path):
+  try:
+    os.makedirs(path)
+  except OSError:
+    if not os.path.isdir(path):
+      raise
+
+
+class ShmRing(object):
+  """Memory mapped ring of message slots, shared by the publisher and all subscribers of a service."""
+  def __init__(self, service, slot_count=SLOT_COUNT, slot_size=SLOT_SIZE):
+    self.path = shm_path(service)
+    _mkdirs_exists_ok(SHM_DIR)
+
+    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+      with self.lock():
+        # whoever gets here first (publisher or subscriber) initializes the header
+        header = os.read(fd, HEADER.size)
+        if len(header) == HEADER.size and HEADER.unpack(header)[0] == MAGIC:
+          _, slot_count, slot_size, _, _ = HEADER.unpack(header)
+          init = False
+        else:
+          init = True
+
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.slot_stride = SLOT_HEADER_SIZE + slot_size
+        size = HEADER_SIZE + slot_count * self.slot_stride
+        if os.fstat(fd).st_size < size:
+          os.ftruncate(fd, size)
+
+        self.mm = mmap.mmap(fd, size)
+        if init:
+          HEADER.pack_into(self.mm, 0, MAGIC, slot_count, slot_size, 0, 0)
+    finally:
+      os.close(fd)
+
+  @contextmanager
+  def lock(self):
+    # separate lock file: mmap dups the ring fd, so a lock taken on it would live as long as the mapping
+    fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+      fcntl.flock(fd, fcntl.LOCK_EX)
+      yield
+    finally:
+      os.close(fd)
+
+  @property
+  def subscriber_generation(self):
+    return GENERATION.unpack_from(self.mm, GENERATION_OFFSET)[0]
+
+  def bump_subscriber_generation(self):
+    with self.lock():
+      gen = (self.subscriber_generation + 1) & 0xffffffff
+      GENERATION.pack_into(self.mm, GENERATION_OFFSET, gen)
+
+  @property
+  def write_seq(self):
+    return SEQ.unpack_from(self.mm, WRITE_SEQ_OFFSET)[0]
+
+  def _slot_offset(self, seq):
+    return HEADER_SIZE + (seq % self.slot_count) * self.slot_stride
+
+  def write(self, dat):
+    length = len(dat)
+    if length > self.slot_size:
+      raise ValueError("message of %d bytes does not fit in a %d byte slot of %s" % (length, self.slot_size, self.path))
+
+    seq = self.write_seq + 1
+    off = self._slot_offset(seq)
+
+    # invalidate the slot while it is being rewritten
+    SEQ.pack_into(self.mm, off, 0)
+    LENGTH.pack_into(self.mm, off + 8, length)
+    self.mm[off + SLOT_HEADER_SIZE:off + SLOT_HEADER_SIZE + length] = dat
+    SEQ.pack_into(self.mm, off, seq)
+
+    SEQ.pack_into(self.mm, WRITE_SEQ_OFFSET, seq)
+    return seq
+
+  def read(self, seq):
+    """Returns the message with sequence number seq, or None if it was already overwritten."""
+    off = self._slot_offset(seq)
+    if SEQ.unpack_from(self.mm, off)[0] != seq:
+      return None
+    length = LENGTH.unpack_from(self.mm, off + 8)[0]
+    if length > self.slot_size:
+      return None
+    dat = self.mm[off + SLOT_HEADER_SIZE:off + SLOT_HEADER_SIZE + length]
+    if SEQ.unpack_from(self.mm, off)[0] != seq:
+      return None
+    return dat
+
+  def close(self):
+    self.mm.close()
+
+
+class ShmPubSock(object):
+  """Drop-in for a zmq PUB socket. Messages go to the ring and to the wrapped zmq socket."""
+  def __init__(self, service, sock):
+    self.service = service
+    self.sock = sock
+    self.ring = ShmRing(service)
+    self.sub_dir = self.ring.path + ".sub"
+    _mkdirs_exists_ok(self.sub_dir)
+    self._fifos = {}
+    self._subscriber_generation = None
+
+  def _scan_subscribers(self):
+    names = set(n for n in os.listdir(self.sub_dir) if not n.startswith("."))
+    for name in set(self._fifos) - names:
+      os.close(self._fifos.pop(name))
+
+    for name in names - set(self._fifos):
+      path = os.path.join(self.sub_dir, name)
+      try:
+        self._fifos[name] = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+      except OSError as e:
+        # no reader on the other end, the subscriber is gone
+        if e.errno != errno.ENXIO:
+          raise
+        self._remove_fifo(path)
+
+  def _remove_fifo(self, path):
+    try:
+      os.unlink(path)
+    except OSError:
+      pass
+
+  def _notify(self):
+    gen = self.ring.subscriber_generation
+    if gen != self._subscriber_generation:
+      self._subscriber_generation = gen
+      self._scan_subscribers()
+
+    for name, fd in list(self._fifos.items()):
+      try:
+        os.write(fd, b"\0")
+      except OSError as e:
+        if e.errno == errno.EAGAIN:
+          # pipe is full, subscriber already has a pending wakeup
+          continue
+        elif e.errno == errno.EPIPE:
+          os.close(self._fifos.pop(name))
+          self._remove_fifo(os.path.join(self.sub_dir, name))
+          self.ring.bump_subscriber_generation()
+        else:
+          raise
+
+  def send(self, dat, flags=0):
+    self.ring.write(dat)
+    self._notify()
+    self.sock.send(dat, flags)
+
+  def close(self):
+    for fd in self._fifos.values():
+      os.close(fd)
+    self._fifos = {}
+    self.ring.close()
+    self.sock.close()
+
+
+class ShmSubSock(object):
+  """Drop-in for a zmq SUB socket connected to a shared memory service.
+
+  recv() follows zmq semantics: it blocks by default, raises zmq.error.Again with zmq.NOBLOCK and
+  only returns the newest message when conflate is set. fileno() makes it usable with zmq.Poller.
+  """
+  def __init__(self, service, conflate=False):
+    self.service = service
+    self.conflate = conflate
+    self.ring = ShmRing(service)
+    sub_dir = self.ring.path + ".sub"
+    _mkdirs_exists_ok(sub_dir)
+
+    # create under a hidden name and rename once the read end is open, so the publisher never
+    # sees a pipe without reader and mistakes it for a dead subscriber
+    name = "%d_%d" % (os.getpid(), next(_fifo_ids))
+    tmp_path = os.path.join(sub_dir, "." + name)
+    self.fifo_path = os.path.join(sub_dir, name)
+    os.mkfifo(tmp_path, 0o666)
+    self._rfd = os.open(tmp_path, os.O_RDONLY | os.O_NONBLOCK)
+    self._wfd = os.open(tmp_path, os.O_WRONLY | os.O_NONBLOCK)
+    os.rename(tmp_path, self.fifo_path)
+    self.ring.bump_subscriber_generation()
+
+    # like a zmq SUB socket, only messages published after connecting are received
+    self.read_seq = self.ring.write_seq + 1
+    # messages skipped because of conflate or because the reader fell a full ring behind
+    self.dropped = 0
+
+  def fileno(self):
+    return self._rfd
+
+  def _drain_wakeups(self):
+    try:
+      while len(os.read(self._rfd, 4096)) == 4096:
+        pass
+    except OSError as e:
+      if e.errno != errno.EAGAIN:
+        raise
+
+  def _rearm(self):
+    try:
+      os.write(self._wfd, b"\0")
+    except OSError as e:
+      if e.errno != errno.EAGAIN:
+        raise
+
+  def _read(self):
+    while True:
+      write_seq = self.ring.write_seq
+      if self.read_seq > write_seq:
+        return None
+
+      if self.conflate:
+        self.dropped += write_seq - self.read_seq
+        self.read_seq = write_seq
+      elif write_seq - self.read_seq >= self.ring.slot_count:
+        self.dropped += write_seq - self.ring.slot_count + 1 - self.read_seq
+        self.read_seq = write_seq - self.ring.slot_count + 1
+
+      dat = self.ring.read(self.read_seq)
+      self.read_seq += 1
+      if dat is None:
+        self.dropped += 1
+      else:
+        # stay readable for the poller while there are unread messages
+        if self.read_seq <= write_seq:
+          self._rearm()
+        return dat
+
+  def recv(self, flags=0, copy=True):
+    # copy is accepted for zmq compatibility, the slot is always copied out since the
+    # publisher reuses it once the ring wraps around
+    while True:
+      # drain before reading so a message published after the read always leaves a wakeup behind
+      self._drain_wakeups()
+      dat = self._read()
+      if dat is not None:
+        return dat
+      if flags & zmq.NOBLOCK:
+        raise zmq.error.Again(errno.EAGAIN)
+      select.select([self._rfd], [], [])
+
+  def close(self):
+    try:
+      os.unlink(self.fifo_path)
+    except OSError:
+      pass
+    self.ring.bump_subscriber_generation()
+    os.close(self._rfd)
+    os.close(self._wfd)
+    self.ring.close()
+
+
+class Poller(zmq.Poller):
+  """zmq.Poller that returns shared memory subscribers instead of their file descriptors."""
+  def __init__(self):
+    super(Poller, self).__init__()
+    self._fd_socks = {}
+
+  def register(self, socket, flags=zmq.POLLIN | zmq.POLLOUT):
+    if isinstance(socket, ShmSubSock):
+      self._fd_socks[socket.fileno()] = socket
+    return super(Poller, self).register(socket, flags)
+
+  def unregister(self, socket):
+    if isinstance(socket, ShmSubSock):
+      self._fd_socks.pop(socket.fileno(), None)
+    return super(Poller, self).unregister(socket)
+
+  def poll(self, timeout=None):
+    return [(self._fd_socks.get(s, s), ev) for s, ev in super(Poller, self).poll(timeout)]
@@ -0,0 +1,133 @@
+"""Receive and publish statistics for every service of a process.
+
+The recv helpers in selfdrive.messaging record every message they parse: how many were received,
+how many were thrown away by recv_sock or overrun in a shared memory ring (conflated), how many
+the publisher sent that never made it here (missed, estimated from logMonoTime gaps since CONFLATE
+sockets drop silently), the inter-arrival jitter against the service frequency and the
+logMonoTime to receive latency. PubMaster adds the time spent serializing each published service.
+
+Every REPORT_INTERVAL seconds the current window is logged as a "messaging_stats" event at debug
+level. It only goes through logmessaged into the logMessage service and the rlog, not to stderr,
+so a unit in the field shows which daemon is falling behind without attaching a profiler.
+"""
+import os
+import multiprocessing
+
+from common.realtime import sec_since_boot
+from selfdrive.services import service_list
+from selfdrive.swaglog import cloudlog
+
+REPORT_INTERVAL = 30.
+# upper edges of the histogram bins in ms, the last bin counts everything above
+HIST_BINS_MS = [0.5, 1., 2., 5., 10., 20., 50., 100.]
+
+
+def _hist_bin(ms):
+  for i, edge in enumerate(HIST_BINS_MS):
+    if ms <= edge:
+      return i
+  return len(HIST_BINS_MS)
+
+
+class ServiceStats(object):
+  def __init__(self, service):
+    self.service = service
+    freq = service_list[service].frequency if service in service_list else 0.
+    self.period = 1. / freq if freq > 1e-5 else None
+    self.last_rcv_time = None
+    self.last_log_mono_time = None
+    self.reset()
+
+  def reset(self):
+    self.received = 0
+    self.conflated = 0
+    self.missed = 0
+    self.latency_sum_ms = 0.
+    self.latency_max_ms = 0.
+    self.latency_hist = [0] * (len(HIST_BINS_MS) + 1)
+    self.jitter_hist = [0] * (len(HIST_BINS_MS) + 1)
+    self.serialized = 0
+    self.serialize_sum_ms = 0.
+    self.serialize_max_ms = 0.
+
+  def record_serialize(self, ms):
+    self.serialized += 1
+    self.serialize_sum_ms += ms
+    self.serialize_max_ms = max(self.serialize_max_ms, ms)
+
+  def record(self, log_mono_time, rcv_time, conflated=0):
+    self.received += 1
+    self.conflated += conflated
+
+    latency_ms = max(rcv_time * 1e3 - log_mono_time / 1e6, 0.)
+    self.latency_sum_ms += latency_ms
+    self.latency_max_ms = max(self.latency_max_ms, latency_ms)
+    self.latency_hist[_hist_bin(latency_ms)] += 1
+
+    if self.period is not None:
+      if self.last_rcv_time is not None:
+        jitter_ms = abs(rcv_time - self.last_rcv_time - self.period * (conflated + 1)) * 1e3
+        self.jitter_hist[_hist_bin(jitter_ms)] += 1
+      if self.last_log_mono_time is not None:
+        # every message the publisher sent in between but we never saw
+        sent = int(round((log_mono_time - self.last_log_mono_time) / 1e9 / self.period))
+        self.missed += max(sent - 1 - conflated, 0)
+
+    self.last_rcv_time = rcv_time
+    self.last_log_mono_time = log_mono_time
+
+  def to_dict(self):
+    return {
+      'received': self.received,
+      'conflated': self.conflated,
+      'missed': self.missed,
+      'latencyAvgMs': self.latency_sum_ms / self.received if self.received else 0.,
+      'latencyMaxMs': self.latency_max_ms,
+      'latencyHist': self.latency_hist,
+      'jitterHist': self.jitter_hist,
+      'serialized': self.serialized,
+      'serializeAvgMs': self.serialize_sum_ms / self.serialized if self.serialized else 0.,
+      'serializeMaxMs': self.serialize_max_ms,
+    }
+
+
+class MessagingStats(object):
+  def __init__(self, report_interval=REPORT_INTERVAL):
+    self.report_interval = report_interval
+    self.services = {}
+    self.last_report_time = sec_since_boot()
+
+  def __getitem__(self, service):
+    return self.services[service]
+
+  def _get(self, service):
+    if service not in self.services:
+      self.services[service] = ServiceStats(service)
+    return self.services[service]
+
+  def _maybe_report(self, cur_time):
+    if self.report_interval is not None and cur_time - self.last_report_time > self.report_interval:
+      self.report(cur_time)
+
+  def record(self, service, log_mono_time, conflated=0):
+    rcv_time = sec_since_boot()
+    self._get(service).record(log_mono_time, rcv_time, conflated)
+    self._maybe_report(rcv_time)
+
+  def record_serialize(self, service, ms):
+    self._get(service).record_serialize(ms)
+    self._maybe_report(sec_since_boot())
+
+  def report(self, cur_time=None):
+    cur_time = sec_since_boot() if cur_time is None else cur_time
+    cloudlog.debug({
+      'event': 'messaging_stats',
+      'proc': multiprocessing.current_process().name,
+      'pid': os.getpid(),
+      'window': cur_time - self.last_report_time,
+      'histBinsMs': HIST_BINS_MS,
+      'services': {s: st.to_dict() for s, st in self.services.items()},
+    }, extra={'no_stderr': True})
+    for st in self.services.values():
+      st.reset()
+    self.last_report_time = cur_time
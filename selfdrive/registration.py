@@ -52,12 +52,14 @@ def get_subscriber_info():
 
 def register():
   params = Params()
-  params.put("Version", version)
-  params.put("TrainingVersion", training_version)
-  params.put("GitCommit", get_git_commit())
-  params.put("GitBranch", get_git_branch())
-  params.put("GitRemote", get_git_remote())
-  params.put("SubscriberInfo", get_subscriber_info())
+  params.put_many({
+    "Version": version,
+    "TrainingVersion": training_version,
+    "GitCommit": get_git_commit(),
+    "GitBranch": get_git_branch(),
+    "GitRemote": get_git_remote(),
+    "SubscriberInfo": get_subscriber_info(),
+  })
 
   # create a key for auth
   # your private key is kept on your device persist partition and never sent to our servers
@@ -1,15 +1,55 @@
 import os
 import yaml
 
+# tcp: zmq over loopback, reachable from C code and other devices
+# ipc: zmq over a unix socket, the tcp port stays bound for C consumers and remote subscribers
+# shm: shared memory ring (selfdrive.messaging_shm), the tcp port stays bound as well
+TRANSPORTS = ("tcp", "ipc", "shm")
+IPC_DIR = "/tmp"
+
 class Service(object):
-  def __init__(self, port, should_log, frequency):
+  def __init__(self, name, port, should_log, frequency, decimation=None, transport="tcp"):
+    if transport not in TRANSPORTS:
+      raise ValueError("unknown transport %s for service %s" % (transport, name))
+    self.name = name
     self.port = port
     self.should_log = should_log
     self.frequency = frequency
+    self.decimation = decimation
+    self.transport = transport
+
+  def is_local(self, addr):
+    return addr in ("127.0.0.1", "localhost")
+
+  def bind_endpoints(self, addr="*"):
+    endpoints = ["tcp://%s:%d" % (addr, self.port)]
+    if self.transport == "ipc":
+      endpoints.append("ipc://%s/op_%s" % (IPC_DIR, self.name))
+    return endpoints
+
+  def connect_endpoint(self, addr="127.0.0.1"):
+    if self.transport == "ipc" and self.is_local(addr):
+      return "ipc://%s/op_%s" % (IPC_DIR, self.name)
+    return "tcp://%s:%d" % (addr, self.port)
+
+  def uses_shm(self, addr="127.0.0.1"):
+    return self.transport == "shm" and self.is_local(addr)
 
 service_list_path = os.path.join(os.path.dirname(__file__), "service_list.yaml")
 
 service_list = {}
 with open(service_list_path, "r") as f:
   for k, v in yaml.safe_load(f).items():
-    service_list[k] = Service(v[0], v[1], v[2])
+    decimation = v[3] if len(v) > 3 and v[3] else None
+    transport = v[5] if len(v) > 5 and v[5] else "tcp"
+    service_list[k] = Service(k, v[0], v[1], v[2], decimation, transport)
+
+services_by_port = {s.port: s for s in service_list.values()}
+
+def get_service(service):
+  """Resolves a service name or port to its Service, None for ports that aren't in the list."""
+  if isinstance(service, Service):
+    return service
+  if isinstance(service, int):
+    return services_by_port.get(service)
+  return service_list[service]
@@ -29,10 +29,16 @@ class LogMessageHandler(logging.Handler):
       # drop :/
       pass
 
+class NoStderrFilter(logging.Filter):
+  # records logged with extra={'no_stderr': True} only go to logmessaged
+  def filter(self, record):
+    return not getattr(record, 'no_stderr', False)
+
 cloudlog = log = SwagLogger()
 log.setLevel(logging.DEBUG)
 
 outhandler = logging.StreamHandler()
+outhandler.addFilter(NoStderrFilter())
 log.addHandler(outhandler)
 
 log.addHandler(LogMessageHandler(SwagFormatter(log)))
@@ -0,0 +1,281 @@
+import time
+import logging
+import unittest
+
+import zmq
+
+import selfdrive.messaging as messaging
+import selfdrive.services as services
+from selfdrive.messaging_stats import MessagingStats, ServiceStats, HIST_BINS_MS
+from selfdrive.swaglog import cloudlog, NoStderrFilter
+
+
+def send_thermal(sock, freeSpace=0.5):
+  dat = messaging.new_message()
+  dat.init('thermal')
+  dat.thermal.freeSpace = freeSpace
+  sock.send(dat.to_bytes())
+
+
+class TestMessaging(unittest.TestCase):
+  # zmq unbinds asynchronously, rebinding the port in every test races with the close
+  @classmethod
+  def setUpClass(cls):
+    cls.pub = messaging.pub_sock('thermal')
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.pub.close()
+
+  def _sub(self, **kwargs):
+    sock = messaging.sub_sock('thermal', **kwargs)
+    # zmq slow joiner
+    time.sleep(0.2)
+    return sock
+
+  def test_zero_copy_recv_one(self):
+    sock = self._sub()
+    send_thermal(self.pub, 0.25)
+    msg = messaging.recv_one(sock, zero_copy=True)
+    self.assertEqual(msg.which(), 'thermal')
+    self.assertAlmostEqual(msg.thermal.freeSpace, 0.25)
+    sock.close()
+
+  def test_zero_copy_drain_sock(self):
+    sock = self._sub()
+    for i in range(3):
+      send_thermal(self.pub, i / 10.)
+    time.sleep(0.1)
+    msgs = messaging.drain_sock(sock, zero_copy=True)
+    self.assertEqual([round(m.thermal.freeSpace, 3) for m in msgs], [0., 0.1, 0.2])
+    sock.close()
+
+  def test_zero_copy_recv_sock_keeps_last(self):
+    sock = self._sub()
+    for i in range(3):
+      send_thermal(self.pub, i / 10.)
+    time.sleep(0.1)
+    msg = messaging.recv_sock(sock, zero_copy=True)
+    self.assertAlmostEqual(msg.thermal.freeSpace, 0.2)
+    self.assertIsNone(messaging.recv_sock(sock, zero_copy=True))
+    sock.close()
+
+  def test_zero_copy_submaster(self):
+    sm = messaging.SubMaster(['thermal'], zero_copy=True)
+    time.sleep(0.2)
+    send_thermal(self.pub, 0.75)
+    sm.update(1000)
+    self.assertTrue(sm.updated['thermal'])
+    self.assertAlmostEqual(sm['thermal'].freeSpace, 0.75)
+
+  def test_lazy_submaster(self):
+    sm = messaging.SubMaster(['thermal', 'health'], lazy=True)
+    time.sleep(0.2)
+    send_thermal(self.pub, 0.75)
+    sm.update(1000)
+    self.assertTrue(sm.updated['thermal'])
+    self.assertFalse(sm.updated['health'])
+    self.assertIn('thermal', sm.pending)
+    self.assertAlmostEqual(sm['thermal'].freeSpace, 0.75)
+    self.assertNotIn('thermal', sm.pending)
+
+    # updated is cleared on the next frame, the last message is kept
+    sm.update(0)
+    self.assertFalse(sm.updated['thermal'])
+    self.assertAlmostEqual(sm['thermal'].freeSpace, 0.75)
+
+  def test_submaster_alive_valid(self):
+    sm = messaging.SubMaster(['thermal', 'health'])
+    time.sleep(0.2)
+    sm.update(0)
+    self.assertFalse(sm.all_alive())
+    self.assertTrue(sm.all_valid())
+
+    send_thermal(self.pub)
+    sm.update(1000)
+    self.assertTrue(sm.alive['thermal'])
+    self.assertFalse(sm.alive['health'])
+    self.assertTrue(sm.all_alive_and_valid(service_list=['thermal']))
+    self.assertFalse(sm.all_alive_and_valid())
+    self.assertEqual(sorted(sm.alive.keys()), ['health', 'thermal'])
+
+  def test_submaster_wait_for(self):
+    health = messaging.pub_sock('health')
+    sm = messaging.SubMaster(['thermal', 'health'])
+    time.sleep(0.2)
+
+    # a non trigger service doesn't end the wait
+    dat = messaging.new_message()
+    dat.init('health')
+    health.send(dat.to_bytes())
+    t = time.time()
+    sm.update(200, wait_for=['thermal'])
+    self.assertGreater(time.time() - t, 0.15)
+    self.assertTrue(sm.updated['health'])
+    self.assertFalse(sm.updated['thermal'])
+
+    # the trigger wakes it up and the rest is drained along with it
+    health.send(dat.to_bytes())
+    send_thermal(self.pub)
+    t = time.time()
+    sm.update(1000, wait_for=['thermal'])
+    self.assertLess(time.time() - t, 0.5)
+    self.assertTrue(sm.updated['thermal'])
+    self.assertTrue(sm.updated['health'])
+    health.close()
+
+  def test_zero_copy_large_message(self):
+    sock = self._sub()
+    # pad past the zmq receive batch so the frame gets its own allocation
+    msg = messaging.new_message()
+    msg.init('can', 1)
+    msg.can[0].dat = b"\x00" * (2 * messaging.ZERO_COPY_MIN_SIZE)
+    self.pub.send(msg.to_bytes())
+    msg = messaging.recv_one(sock, zero_copy=True)
+    self.assertEqual(len(msg.can[0].dat), 2 * messaging.ZERO_COPY_MIN_SIZE)
+    sock.close()
+
+  def test_recv_sock_counts_conflated(self):
+    sock = self._sub()
+    for i in range(3):
+      send_thermal(self.pub, i / 10.)
+    time.sleep(0.1)
+    messaging.stats.services.pop('thermal', None)
+    messaging.recv_sock(sock)
+    st = messaging.stats['thermal']
+    self.assertEqual(st.received, 1)
+    self.assertEqual(st.conflated, 2)
+    self.assertEqual(st.missed, 0)
+    sock.close()
+
+  def test_drain_sock_raw(self):
+    sock = self._sub()
+    for i in range(3):
+      send_thermal(self.pub, i / 10.)
+    time.sleep(0.1)
+    dats = messaging.drain_sock_raw(sock, wait_for_one=True)
+    self.assertEqual(len(dats), 3)
+    self.assertAlmostEqual(messaging.log.Event.from_bytes(dats[-1]).thermal.freeSpace, 0.2)
+    self.assertEqual(messaging.drain_sock_raw(sock), [])
+    sock.close()
+
+  def test_from_frame(self):
+    dat = messaging.new_message()
+    dat.init('thermal')
+    dat.thermal.freeSpace = 0.5
+    frame = zmq.Frame(dat.to_bytes())
+    self.assertAlmostEqual(messaging.from_frame(frame).thermal.freeSpace, 0.5)
+
+
+class TestPubMaster(unittest.TestCase):
+  def test_queue_flush(self):
+    pm = messaging.PubMaster(['clocks', 'gpsNMEA'])
+    clocks = messaging.sub_sock('clocks')
+    gps_nmea = messaging.sub_sock('gpsNMEA')
+    time.sleep(0.2)
+
+    dat = messaging.new_message()
+    dat.init('clocks')
+    pm.queue('clocks', dat)
+    dat = messaging.new_message()
+    dat.init('gpsNMEA')
+    pm.queue('gpsNMEA', dat.to_bytes())
+    self.assertIsNone(messaging.recv_one_or_none(clocks))
+
+    pm.flush()
+    self.assertEqual(messaging.recv_one(clocks).which(), 'clocks')
+    self.assertEqual(messaging.recv_one(gps_nmea).which(), 'gpsNMEA')
+    self.assertGreater(pm.serialize_time['clocks'], 0.)
+    self.assertEqual(pm.queued, [])
+
+    for sock in [clocks, gps_nmea] + list(pm.sock.values()):
+      sock.close()
+
+
+class TestServices(unittest.TestCase):
+  def test_get_service(self):
+    thermal = services.service_list['thermal']
+    self.assertIs(services.get_service('thermal'), thermal)
+    self.assertIs(services.get_service(thermal.port), thermal)
+    self.assertIs(services.get_service(thermal), thermal)
+    self.assertIsNone(services.get_service(1))
+    with self.assertRaises(KeyError):
+      services.get_service('notAService')
+
+  def test_endpoints(self):
+    srv = services.Service('test', 9999, False, 10., transport='ipc')
+    self.assertEqual(srv.bind_endpoints(), ['tcp://*:9999', 'ipc://%s/op_test' % services.IPC_DIR])
+    self.assertEqual(srv.connect_endpoint(), 'ipc://%s/op_test' % services.IPC_DIR)
+    self.assertEqual(srv.connect_endpoint('192.168.5.11'), 'tcp://192.168.5.11:9999')
+    self.assertFalse(srv.uses_shm())
+    self.assertTrue(services.service_list['controlsState'].uses_shm())
+    self.assertFalse(services.service_list['controlsState'].uses_shm('192.168.5.11'))
+
+  def test_unknown_transport(self):
+    with self.assertRaises(ValueError):
+      services.Service('test', 9999, False, 10., transport='udp')
+
+  def test_ipc_pub_sub(self):
+    srv = services.Service('test', 9999, False, 10., transport='ipc')
+    services.service_list['test'] = services.services_by_port[9999] = srv
+    try:
+      pub = messaging.pub_sock('test')
+      sub = messaging.sub_sock('test')
+      time.sleep(0.2)
+      send_thermal(pub, 0.5)
+      self.assertAlmostEqual(messaging.recv_one(sub).thermal.freeSpace, 0.5)
+      pub.close()
+      sub.close()
+    finally:
+      del services.service_list['test'], services.services_by_port[9999]
+
+
+class TestServiceStats(unittest.TestCase):
+  def test_missed_and_jitter(self):
+    st = ServiceStats('controlsState')  # 100Hz
+    t = 100.
+    for i in range(10):
+      st.record(int((t + i * 0.01) * 1e9), t + i * 0.01 + 0.001)
+    self.assertEqual(st.received, 10)
+    self.assertEqual(st.missed, 0)
+    self.assertEqual(sum(st.jitter_hist), 9)
+    self.assertEqual(st.jitter_hist[0], 9)
+    self.assertAlmostEqual(st.latency_max_ms, 1., places=3)
+
+    # publisher sent 4 messages in between that never arrived
+    t += 0.14
+    st.record(int(t * 1e9), t + 0.001)
+    self.assertEqual(st.missed, 4)
+    self.assertEqual(st.jitter_hist[HIST_BINS_MS.index(50.)], 1)
+
+  def test_no_frequency(self):
+    st = ServiceStats('logMessage')
+    st.record(int(1e9), 5.)
+    st.record(int(2e9), 10.)
+    self.assertEqual(st.missed, 0)
+    self.assertEqual(sum(st.jitter_hist), 0)
+    self.assertEqual(st.latency_hist[-1], 2)
+
+  def test_report_not_on_stderr(self):
+    class ListHandler(logging.Handler):
+      def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+      def emit(self, record):
+        self.records.append(record)
+
+    log_handler, stderr_handler = ListHandler(), ListHandler()
+    stderr_handler.addFilter(NoStderrFilter())
+    handlers = cloudlog.handlers
+    cloudlog.handlers = [log_handler, stderr_handler]
+    try:
+      MessagingStats(report_interval=None).report()
+    finally:
+      cloudlog.handlers = handlers
+    self.assertEqual(log_handler.records[0].msg['event'], 'messaging_stats')
+    self.assertEqual(stderr_handler.records, [])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+import unittest
+
+import zmq
+
+import selfdrive.messaging_shm as messaging_shm
+from selfdrive.messaging_shm import ShmPubSock, ShmSubSock, Poller
+
+
+class TestShmMessaging(unittest.TestCase):
+  def setUp(self):
+    self.shm_dir = tempfile.mkdtemp()
+    self.orig_shm_dir = messaging_shm.SHM_DIR
+    messaging_shm.SHM_DIR = self.shm_dir
+    self.zmq_sock = zmq.Context.instance().socket(zmq.PUB)
+    self.pub = ShmPubSock("test", self.zmq_sock)
+
+  def tearDown(self):
+    self.pub.close()
+    messaging_shm.SHM_DIR = self.orig_shm_dir
+    shutil.rmtree(self.shm_dir)
+
+  def test_send_recv_in_order(self):
+    sub = ShmSubSock("test")
+    for i in range(10):
+      self.pub.send(b"msg%d" % i)
+    for i in range(10):
+      self.assertEqual(sub.recv(zmq.NOBLOCK), b"msg%d" % i)
+    with self.assertRaises(zmq.error.Again):
+      sub.recv(zmq.NOBLOCK)
+    sub.close()
+
+  def test_multiple_subscribers(self):
+    subs = [ShmSubSock("test"), ShmSubSock("test", conflate=True)]
+    for i in range(3):
+      self.pub.send(b"msg%d" % i)
+    self.assertEqual([subs[0].recv(zmq.NOBLOCK) for _ in range(3)], [b"msg0", b"msg1", b"msg2"])
+    self.assertEqual(subs[1].recv(zmq.NOBLOCK), b"msg2")
+    self.assertEqual(len(self.pub._fifos), 2)
+    for sub in subs:
+      sub.close()
+
+  def test_subscriber_before_publisher(self):
+    sub = ShmSubSock("early")
+    poller = Poller()
+    poller.register(sub, zmq.POLLIN)
+    pub = ShmPubSock("early", zmq.Context.instance().socket(zmq.PUB))
+    pub.send(b"a")
+    self.assertEqual(poller.poll(100), [(sub, zmq.POLLIN)])
+    self.assertEqual(sub.recv(zmq.NOBLOCK), b"a")
+    sub.close()
+    pub.close()
+
+  def test_subscriber_joins_later(self):
+    self.pub.send(b"a")
+    sub = ShmSubSock("test")
+    poller = Poller()
+    poller.register(sub, zmq.POLLIN)
+    self.pub.send(b"b")
+    self.assertEqual(poller.poll(100), [(sub, zmq.POLLIN)])
+    self.assertEqual(sub.recv(zmq.NOBLOCK), b"b")
+    sub.close()
+
+  def test_conflate(self):
+    sub = ShmSubSock("test", conflate=True)
+    for i in range(5):
+      self.pub.send(b"msg%d" % i)
+    self.assertEqual(sub.recv(), b"msg4")
+    self.assertEqual(sub.dropped, 4)
+    with self.assertRaises(zmq.error.Again):
+      sub.recv(zmq.NOBLOCK)
+    sub.close()
+
+  def test_overrun_skips_to_oldest(self):
+    sub = ShmSubSock("test")
+    n = self.pub.ring.slot_count * 2
+    for i in range(n):
+      self.pub.send(b"msg%d" % i)
+    self.assertEqual(sub.recv(), b"msg%d" % (n - self.pub.ring.slot_count))
+    self.assertEqual(sub.dropped, n - self.pub.ring.slot_count)
+    sub.close()
+
+  def test_poller(self):
+    poller = Poller()
+    sub = ShmSubSock("test")
+    poller.register(sub, zmq.POLLIN)
+    self.assertEqual(poller.poll(0), [])
+
+    self.pub.send(b"a")
+    self.pub.send(b"b")
+    # stays readable until every message is consumed
+    for expected in [b"a", b"b"]:
+      self.assertEqual(poller.poll(100), [(sub, zmq.POLLIN)])
+      self.assertEqual(sub.recv(zmq.NOBLOCK), expected)
+    self.assertEqual(poller.poll(0), [])
+    sub.close()
+
+  def test_dead_subscriber_removed(self):
+    sub = ShmSubSock("test")
+    self.pub.send(b"a")
+    self.assertEqual(len(self.pub._fifos), 1)
+    sub.close()
+    self.pub.send(b"b")
+    self.assertEqual(len(self.pub._fifos), 0)
+
+  def test_message_too_large(self):
+    with self.assertRaises(ValueError):
+      self.pub.send(b"\0" * (self.pub.ring.slot_size + 1))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -5,7 +5,6 @@ from cereal import log
 from selfdrive.version import training_version
 from selfdrive.swaglog import cloudlog
 import selfdrive.messaging as messaging
-from selfdrive.services import service_list
 from selfdrive.loggerd.config import get_available_percent
 from common.params import Params
 from common.realtime import sec_since_boot
@@ -127,9 +126,9 @@ def thermald_thread():
   BATT_PERC_OFF = 10 if LEON else 3
 
   # now loop
-  thermal_sock = messaging.pub_sock(service_list['thermal'].port)
-  health_sock = messaging.sub_sock(service_list['health'].port)
-  location_sock = messaging.sub_sock(service_list['gpsLocation'].port)
+  thermal_sock = messaging.pub_sock('thermal')
+  health_sock = messaging.sub_sock('health')
+  location_sock = messaging.sub_sock('gpsLocation')
   fan_speed = 0
   count = 0
 